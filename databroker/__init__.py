@@ -16,7 +16,8 @@ except AttributeError:
 from ._core import (Broker, BrokerES, Header, ALL,
                     lookup_config, list_configs, describe_configs, temp_config,
                     wrap_in_doct,
-                    DeprecatedDoct, wrap_in_deprecated_doct)
+                    DeprecatedDoct, wrap_in_deprecated_doct,
+                    ReadOnlyDoc, wrap_in_read_only_doc)
 
 # set version string using versioneer
 from ._version import get_versions
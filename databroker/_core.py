@@ -6,26 +6,37 @@ from datetime import datetime
 from pims import FramesSequence, Frame
 import logging
 import attr
+import boltons.cacheutils
 from warnings import warn
 from importlib import import_module
 import itertools
+import heapq
+import json
+import threading
 import warnings
 import numbers
+import operator
 import doct
+import numpy as np
 import pandas as pd
 import sys
 import os
 import yaml
 import glob
 import tempfile
+import shutil
 import copy
+from multiprocessing.pool import ThreadPool
+from toolz import partition_all
 from .eventsource import EventSourceShim, check_fields_exist
-from .headersource import HeaderSourceShim, safe_get_stop
+from .eventsource.cache import ColumnCache
+from .headersource import HeaderSourceShim, safe_get_stop, bulk_get_stops
 import humanize
 import jinja2
 import time
+import uuid
 
-from .utils import ALL, normalize_human_friendly_time
+from .utils import ALL, normalize_human_friendly_time, ensure_path_exists
 
 
 try:
@@ -141,6 +152,15 @@ class Header(object):
     def __iter__(self):
         return self.keys()
 
+    def __reduce__(self):
+        # A Header pickles to its Broker (which pickles to its
+        # configuration) and the documents already fetched, so the receiving
+        # process does not have to search for the run again.
+        stop = _raw_doc(self.stop) if self.stop else {}
+        cache = {k: v for k, v in self._cache.items() if k == 'desc'}
+        return (_unpickle_header,
+                (self.db, _raw_doc(self.start), stop, cache))
+
     # ## convenience methods and properties, encapsulating one-liners ## #
 
     @property
@@ -149,8 +169,14 @@ class Header(object):
             self._cache['desc'] = sum((es.descriptors_given_header(self)
                                        for es in self.db.event_sources),
                                       [])
-        prepare = partial(self.db.prepare_hook, 'descriptor')
-        return list(map(prepare, self._cache['desc']))
+        # Wrap once per Header (and per prepare_hook, which can be swapped).
+        hook = self.db.prepare_hook
+        cached = self._cache.get('prepared_desc')
+        if cached is None or cached[0] is not hook:
+            cached = (hook, [hook('descriptor', d)
+                             for d in self._cache['desc']])
+            self._cache['prepared_desc'] = cached
+        return list(cached[1])
 
     @property
     def stream_names(self):
@@ -274,7 +300,8 @@ class Header(object):
                 result[d['name']].append(config['data'])
         return dict(result)  # strip off defaultdict behavior
 
-    def documents(self, stream_name=ALL, fields=None, fill=False):
+    def documents(self, stream_name=ALL, fields=None, fill=False,
+                  ordered=None):
         """
         Load all documents from the run.
 
@@ -288,6 +315,9 @@ class Header(object):
         fill : bool, optional
             Whether externally-stored data should be filled in. False by
             default.
+        ordered : {None, 'time'}, optional
+            If 'time', interleave the Events of all streams in time order.
+            By default, the streams are yielded one after another.
 
         Yields
         ------
@@ -303,7 +333,7 @@ class Header(object):
         """
         gen = self.db.get_documents(self, fields=fields,
                                     stream_name=stream_name,
-                                    fill=fill)
+                                    fill=fill, ordered=ordered)
         for payload in gen:
             yield payload
 
@@ -313,7 +343,8 @@ class Header(object):
         for payload in self.documents(*args, **kwargs):
             yield payload
 
-    def events(self, stream_name='primary', fields=None, fill=False):
+    def events(self, stream_name='primary', fields=None, fill=False,
+               prefetch=0, seq_num=None, time=None):
         """
         Load all Event documents from one event stream.
 
@@ -340,6 +371,24 @@ class Header(object):
 
             Default is False
 
+        prefetch : int, optional
+            If non-zero (and filling), fill up to this many upcoming events
+            on background threads while the current one is being processed.
+
+            Default is 0
+
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with
+            ``start <= seq_num < stop``. Either end may be None.
+
+            Default is None
+
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``
+            (in seconds since the epoch). Either end may be None.
+
+            Default is None
+
         Yields
         ------
         doc : dict
@@ -359,12 +408,15 @@ class Header(object):
         >>> events = list(h.events())
         """
         ev_gen = self.db.get_events([self], stream_name=stream_name,
-                                    fields=fields, fill=fill)
+                                    fields=fields, fill=fill,
+                                    prefetch=prefetch, seq_num=seq_num,
+                                    time=time)
         for ev in ev_gen:
             yield ev
 
     def table(self, stream_name='primary', fields=None, fill=False,
-              timezone=None, convert_times=True, localize_times=True):
+              timezone=None, convert_times=True, localize_times=True,
+              seq_num=None, time=None):
         '''
         Load the data from one event stream as a table (``pandas.DataFrame``).
 
@@ -416,6 +468,18 @@ class Header(object):
 
             Defaults to True to preserve back-compatibility.
 
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with
+            ``start <= seq_num < stop``. Either end may be None.
+
+            Default is None
+
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``
+            (in seconds since the epoch). Either end may be None.
+
+            Default is None
+
         Returns
         -------
         table : pandas.DataFrame
@@ -445,9 +509,77 @@ class Header(object):
                                  stream_name=stream_name, fill=fill,
                                  timezone=timezone,
                                  convert_times=convert_times,
-                                 localize_times=localize_times)
+                                 localize_times=localize_times,
+                                 seq_num=seq_num, time=time)
 
-    def data(self, field, stream_name='primary', fill=True):
+    def event_pages(self, stream_name='primary', fields=None, page_size=1000,
+                    as_dataframe=False, seq_num=None, time=None):
+        """
+        Load the data from one event stream in columnar pages.
+
+        Only one page is held in memory at a time, so this is suited to runs
+        that are too large to load with :meth:`Header.table`. Externally
+        stored data is not filled.
+
+        Parameters
+        ----------
+        stream_name : str, optional
+            Get events from only "event stream" with this name.
+
+            Default is 'primary'
+
+        fields : List[str], optional
+            whitelist of field names of interest; if None, all are returned
+
+            Default is None
+
+        page_size : int, optional
+            The maximum number of events per page
+
+            Default is 1000
+
+        as_dataframe : bool, optional
+            If True, yield one ``pandas.DataFrame`` per page, indexed by
+            seq_num, with the times as float seconds since 1970.
+
+            Default is False
+
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with
+            ``start <= seq_num < stop``. Either end may be None.
+
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``
+            (in seconds since the epoch). Either end may be None.
+
+        Yields
+        ------
+        page : dict or pandas.DataFrame
+            'data' and 'timestamps' map each field to a numpy array with one
+            entry per event; 'seq_num', 'time' and 'uid' are arrays and
+            'descriptor' is the uid of their descriptor.
+
+        Examples
+        --------
+        Compute the mean of a field without loading the whole run.
+
+        >>> h = db[-1]
+        >>> total = count = 0
+        >>> for page in h.event_pages(fields=['intensity'], page_size=10000):
+        ...     total += page['data']['intensity'].sum()
+        ...     count += len(page['seq_num'])
+        """
+        for es in self.db.event_sources:
+            pages = es.event_pages_given_header(
+                self, stream_name, fields=fields, page_size=page_size,
+                seq_num=seq_num, time=time)
+            for page in pages:
+                if as_dataframe:
+                    page = _page_to_dataframe(page)
+                yield page
+
+    def data(self, field, stream_name='primary', fill=True, prefetch=0,
+             seq_num=None, time=None):
         """
         Extract data for one field. This is convenient for loading image data.
 
@@ -462,6 +594,14 @@ class Header(object):
         fill : bool, optional
              If the data should be filled.
 
+        prefetch : int, optional
+            Number of upcoming values to load on background threads while
+            the current one is being processed. Default is 0 (no read-ahead).
+
+        seq_num, time : tuple, optional
+            Half-open ``(start, stop)`` ranges restricting which Events are
+            read; see `Header.events`.
+
         Yields
         ------
         data
@@ -470,9 +610,64 @@ class Header(object):
             fill = {field}
         for event in self.events(stream_name=stream_name,
                                  fields=[field],
-                                 fill=fill):
+                                 fill=fill,
+                                 prefetch=prefetch,
+                                 seq_num=seq_num,
+                                 time=time):
             yield event['data'][field]
 
+    def array(self, field, stream_name='primary', cache_size=64):
+        """
+        Return a lazy array over one field of one event stream.
+
+        The shape and dtype are taken from the descriptor. Indexing the
+        array reads only the Events and, for externally stored data, only
+        the region of each datum that is needed. Recently read frames are
+        kept in a bounded cache.
+
+        Parameters
+        ----------
+        field : string
+            such as 'image' or 'intensity'
+
+        stream_name : string, optional
+            Get data from a single "event stream." Default is 'primary'
+
+        cache_size : int, optional
+            The maximum number of frames (or regions of frames) to cache.
+            Default is 64.
+
+        Returns
+        -------
+        arr : FieldArray
+            The first axis is the Event and the remaining axes follow the
+            ``shape`` of the field in the descriptor.
+
+        Examples
+        --------
+        Read part of a stack of images without loading all of them.
+
+        >>> h = db[-1]
+        >>> arr = h.array('image')
+        >>> arr.shape
+        (1000, 2048, 2048)
+        >>> roi = arr[100:200, :, 512:1024]
+        """
+        for d in self.descriptors:
+            if (d.get('name', 'primary') == stream_name and
+                    field in d['data_keys']):
+                data_key = d['data_keys'][field]
+                break
+        else:
+            raise ValueError("The field %r was not found in the %r stream."
+                             % (field, stream_name))
+        values = [page['data'][field]
+                  for page in self.event_pages(stream_name=stream_name,
+                                               fields=[field])
+                  if field in page['data']]
+        return FieldArray(self.db.reg, data_key, values,
+                          cache_size=cache_size)
+
 
 def register_builtin_handlers(reg):
     "Register all the handlers built in to databroker."
@@ -541,6 +736,23 @@ def get_images(db, headers, name, handler_registry=None,
                   handler_override, stream_name='primary')
 
 
+def _raw_doc(doc):
+    "Undo a prepare_hook, returning a plain dict"
+    try:
+        return doc.to_name_dict_pair()[1]
+    except AttributeError:
+        return dict(doc)
+
+
+def _unpickle_header(db, start, stop, cache):
+    d = {'start': db.prepare_hook('start', start)}
+    if stop:
+        d['stop'] = db.prepare_hook('stop', stop)
+    h = Header(db, **d)
+    h._cache.update(cache)
+    return h
+
+
 class Images(FramesSequence):
     def __init__(self, mds, reg, es, headers, name, handler_registry=None,
                  handler_override=None, stream_name='primary'):
@@ -585,8 +797,11 @@ class Images(FramesSequence):
         else:
             # mock a handler registry
             self.handler_registry = defaultdict(lambda: handler_override)
-        with self.reg.handler_context(self.handler_registry) as reg:
-            example_frame = reg.retrieve(first_uid)
+        self._handler_override = handler_override
+        # The handlers are kept in a cache of our own, so they stay open
+        # between frames and the registry's shared cache is not touched.
+        self._handler_cache = {}
+        example_frame = self._retrieve(first_uid)
         # Try to duck-type as a numpy array, but fall back as a general
         # Python object.
         try:
@@ -615,15 +830,229 @@ class Images(FramesSequence):
     def __len__(self):
         return self._len
 
+    def _handler_reg(self):
+        if self._handler_override is not None:
+            # A lookup in a ChainMap would find the registered handler first.
+            return self.handler_registry
+        return self.reg.handler_reg.new_child(self.handler_registry or {})
+
+    def _retrieve(self, datum_id):
+        return self.reg.retrieve(datum_id, handler_reg=self._handler_reg(),
+                                 handler_cache=self._handler_cache)
+
     def get_frame(self, i):
-        with self.reg.handler_context(self.handler_registry) as reg:
-            img = reg.retrieve(self._datum_ids[i])
+        img = self._retrieve(self._datum_ids[i])
         if hasattr(img, '__array__'):
             return Frame(img, frame_no=i)
         else:
             # some non-numpy-like type
             return img
 
+    def get_frames(self, key):
+        """
+        Read many frames at once into one array.
+
+        The frames are retrieved in bulk, with one handler call per
+        resource where the handler supports it, and copied into a
+        preallocated array.
+
+        Parameters
+        ----------
+        key : slice or iterable of int
+            Which frames to read
+
+        Returns
+        -------
+        frames : numpy.ndarray
+            Stacked along a new first axis
+        """
+        if isinstance(key, slice):
+            indices = range(*key.indices(self._len))
+        else:
+            indices = [operator.index(i) for i in key]
+        if self._shape is None:
+            raise TypeError("get_frames requires array-like frames")
+        datum_ids = [self._datum_ids[i] for i in indices]
+        data = self.reg.bulk_retrieve(datum_ids,
+                                      handler_reg=self._handler_reg(),
+                                      handler_cache=self._handler_cache)
+        out = np.empty((len(datum_ids),) + tuple(self._shape),
+                       dtype=self._dtype)
+        for j, datum_id in enumerate(datum_ids):
+            out[j] = data[datum_id]
+        return out
+
+
+class FieldArray(object):
+    """
+    A lazy, read-only array over one field of an event stream.
+
+    This is usually created by :meth:`Header.array`. The first axis is the
+    Event. Integers, slices and integer or boolean arrays may be used on the
+    first axis; integers and slices on the others. Externally stored data is
+    read through the handlers only for the Events that are indexed, and
+    slices of the other axes are passed to the handlers so that those which
+    support it (see ``HandlerBase``) read only that region.
+
+    Parameters
+    ----------
+    reg : Registry
+        Used to retrieve externally stored data
+    data_key : dict
+        The entry for this field in the descriptor's ``data_keys``
+    values : list of arrays
+        The (unfilled) values of the field, one array per page of Events
+    cache_size : int, optional
+        The maximum number of frames (or regions of frames) to cache
+    """
+    def __init__(self, reg, data_key, values, cache_size=64):
+        self._reg = reg
+        self._external = bool(data_key.get('external'))
+        self._frame_shape = tuple(int(n) for n in data_key.get('shape') or ())
+        self._dtype = _data_key_dtype(data_key)
+        if self._external:
+            self._datum_ids = [d_id for page in values for d_id in page]
+            self._len = len(self._datum_ids)
+            self._cache = boltons.cacheutils.LRU(max_size=cache_size)
+        else:
+            # Stored in the Events themselves, so already in memory.
+            values = [np.asarray(list(page)) if self._frame_shape
+                      else np.asarray(page) for page in values]
+            self._values = (np.concatenate(values) if values
+                            else np.empty((0,) + self._frame_shape))
+            self._len = len(self._values)
+
+    @property
+    def shape(self):
+        return (self._len,) + self._frame_shape
+
+    @property
+    def ndim(self):
+        return 1 + len(self._frame_shape)
+
+    @property
+    def dtype(self):
+        if self._dtype is None:
+            # Not given in the descriptor: look at the first frame.
+            self._dtype = self[0].dtype
+        return self._dtype
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return '<FieldArray shape={!r}>'.format(self.shape)
+
+    def __array__(self, dtype=None):
+        out = self[...]
+        if dtype is not None:
+            out = out.astype(dtype)
+        return out
+
+    def __getitem__(self, key):
+        if not self._external:
+            return self._values[key]
+        if not isinstance(key, tuple):
+            key = (key,)
+        ellipses = [j for j, k in enumerate(key) if k is Ellipsis]
+        if len(ellipses) > 1:
+            raise IndexError("an index can only have a single ellipsis")
+        if ellipses:
+            i, = ellipses
+            fill = (slice(None),) * (self.ndim - len(key) + 1)
+            key = key[:i] + fill + key[i + 1:]
+        if len(key) > self.ndim:
+            raise IndexError("too many indices for array")
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        indices, scalar = _event_indices(key[0], self._len)
+        region, post = [], [slice(None)]
+        for k, n in zip(key[1:], self._frame_shape):
+            if isinstance(k, slice):
+                start, stop, step = k.indices(n)
+                if step > 0:
+                    region.append(slice(start, stop, step))
+                    post.append(slice(None))
+                else:
+                    # Read the whole axis; leave the reversal to numpy.
+                    region.append(slice(0, n, 1))
+                    post.append(k)
+            elif isinstance(k, (numbers.Integral, np.integer)):
+                k = _wrap_index(k, n)
+                region.append(slice(k, k + 1, 1))
+                post.append(0)
+            else:
+                raise IndexError("Only integers and slices may be used to "
+                                 "index the axes after the first.")
+        out = self._read(indices, tuple(region))[tuple(post)]
+        if scalar:
+            out = out[0]
+        return out
+
+    def _read(self, indices, region):
+        shape = tuple(len(range(s.start, s.stop, s.step)) for s in region)
+        region_key = tuple((s.start, s.stop, s.step) for s in region)
+        found = {}
+        missing = []
+        for i in indices:
+            if i in found:
+                continue
+            try:
+                found[i] = self._cache[(i, region_key)]
+            except KeyError:
+                found[i] = None
+                missing.append(i)
+        if missing:
+            # One bulk call, so contiguous frames are read together.
+            datum_ids = [self._datum_ids[i] for i in missing]
+            data = self._reg.bulk_retrieve(datum_ids, region=region or None)
+            for i, d_id in zip(missing, datum_ids):
+                frame = np.asarray(data[d_id])
+                if frame.shape != shape:
+                    raise ValueError(
+                        "datum {} read as shape {}, expected {} from the "
+                        "descriptor".format(d_id, frame.shape, shape))
+                if self._dtype is None:
+                    self._dtype = frame.dtype
+                found[i] = self._cache[(i, region_key)] = frame
+        out = np.empty((len(indices),) + shape, dtype=self._dtype)
+        for j, i in enumerate(indices):
+            out[j] = found[i]
+        return out
+
+
+def _data_key_dtype(data_key):
+    if 'dtype_str' in data_key:
+        return np.dtype(data_key['dtype_str'])
+    # JSON types of scalars; arrays have to be read to learn their dtype.
+    return {'number': np.dtype(float),
+            'integer': np.dtype(int),
+            'boolean': np.dtype(bool),
+            'string': np.dtype(object)}.get(data_key.get('dtype'))
+
+
+def _wrap_index(i, n):
+    i = operator.index(i)
+    if not -n <= i < n:
+        raise IndexError("index {} is out of bounds for axis with size {}"
+                         .format(i, n))
+    return i % n
+
+
+def _event_indices(key, n):
+    "Return the Event indices selected by key and whether it was scalar."
+    if isinstance(key, (numbers.Integral, np.integer)):
+        return [_wrap_index(key, n)], True
+    if isinstance(key, slice):
+        return list(range(*key.indices(n))), False
+    key = np.asarray(key)
+    if key.dtype == bool:
+        if key.shape != (n,):
+            raise IndexError("boolean index did not match the number of "
+                             "Events ({})".format(n))
+        return list(np.flatnonzero(key)), False
+    return [_wrap_index(i, n) for i in key.ravel()], False
+
 
 class DocBuffer:
     '''Buffer a (name, document) sequence into parts
@@ -815,7 +1244,36 @@ def _(key, db):
 def _(key, db):
     logger.info('Interpreting key = {} as a set, tuple or MutableSequence'
                 ''.format(key))
-    return sum((search(k, db) for k in key), [])
+    key = list(key)
+    # Full uids and scan_ids are looked up together, with one more query
+    # for all of their RunStops. Anything else (partial uids, negative
+    # indexes, keys that do not match) goes through the one-key path.
+    uids = [k for k in key
+            if isinstance(k, six.string_types) and len(k) == 36]
+    scan_ids = [k for k in key
+                if isinstance(k, numbers.Integral) and k > -1]
+    by_uid = {}
+    by_scan_id = {}
+    if uids:
+        for start in db.hs.find_run_starts(uid={'$in': uids}):
+            by_uid[start['uid']] = start
+    if scan_ids:
+        # newest first, so the first match is the most recent
+        for start in db.hs.find_run_starts(scan_id={'$in': scan_ids}):
+            by_scan_id.setdefault(start['scan_id'], start)
+    stops = bulk_get_stops(db.hs, (list(by_uid.values()) +
+                                   list(by_scan_id.values())))
+    results = []
+    for k in key:
+        if isinstance(k, six.string_types) and k in by_uid:
+            start = by_uid[k]
+        elif isinstance(k, numbers.Integral) and k in by_scan_id:
+            start = by_scan_id[k]
+        else:
+            results.extend(search(k, db))
+            continue
+        results.append((start, stops.get(start['uid'])))
+    return results
 
 
 class Results(object):
@@ -827,29 +1285,41 @@ class Results(object):
     res : iterable
         Iterable of ``(start_doc, stop_doc)`` pairs
     db : :class:`Broker`
-    data_key : string or None
-        Special query parameter that filters results
     """
-    def __init__(self, res, db, data_key):
+    # number of headers whose descriptors are looked up together
+    page_size = 100
+
+    def __init__(self, res, db):
         self._db = db
         self._res = res
-        self._data_key = data_key
 
     def __iter__(self):
         self._res, res = itertools.tee(self._res)
-        for start, stop in res:
-            header = Header(start=self._db.prepare_hook('start', start),
-                            stop=self._db.prepare_hook('stop', stop),
-                            db=self._db)
-            if self._data_key is None:
+        for page in partition_all(self.page_size, res):
+            headers = [Header(start=self._db.prepare_hook('start', start),
+                              stop=self._db.prepare_hook('stop', stop),
+                              db=self._db)
+                       for start, stop in page]
+            _prefetch_descriptors(headers, self._db.event_sources)
+            for header in headers:
                 yield header
-            else:
-                # Only include this header in the result if `data_key` is found
-                # in one of its descriptors' data_keys.
-                for descriptor in header['descriptors']:
-                    if self._data_key in descriptor['data_keys']:
-                        yield header
-                        break
+
+
+def _prefetch_descriptors(headers, event_sources):
+    """Fill the descriptor cache of many headers with one query per source
+
+    Headers are left alone (to be loaded lazily) unless every event source
+    supports the bulk lookup.
+    """
+    if not all(hasattr(es, 'descriptors_given_headers')
+               for es in event_sources):
+        return
+    descs = [[] for h in headers]
+    for es in event_sources:
+        for acc, found in zip(descs, es.descriptors_given_headers(headers)):
+            acc.extend(found)
+    for header, found in zip(headers, descs):
+        header._cache['desc'] = found
 
 # Search order is (for unix):
 #   ~/.config/databroker
@@ -1043,6 +1513,77 @@ def wrap_in_deprecated_doct(name, doc):
     return DeprecatedDoct(DOCT_NAMES[name], doc)
 
 
+class ReadOnlyDoc(dict):
+    """
+    Lightweight, read-only document with deprecated dot access.
+
+    Unlike :class:`DeprecatedDoct`, this does not override
+    :meth:`__getattribute__`, so item access and the ordinary dict methods
+    run at native speed. Dot access falls back to :meth:`__getattr__`,
+    which warns and returns the item. The document name is kept in a slot
+    rather than under a ``'_name'`` key, so iteration is that of a plain
+    dict.
+    """
+    __slots__ = ('_name',)
+
+    def __init__(self, name, *args, **kwargs):
+        super(ReadOnlyDoc, self).__init__(*args, **kwargs)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, key):
+        # Only reached when normal attribute lookup fails.
+        try:
+            res = self[key]
+        except KeyError:
+            raise AttributeError(key)
+        warnings.warn("Dot access may be removed in a future version."
+                      "Use [{0}] instead of .{0}".format(key))
+        return res
+
+    def __setattr__(self, key, value):
+        raise doct.DocumentIsReadOnly()
+
+    def __delattr__(self, key):
+        raise doct.DocumentIsReadOnly()
+
+    def __setitem__(self, key, value):
+        raise doct.DocumentIsReadOnly('{}, {}'.format(key, value))
+
+    def __delitem__(self, key):
+        raise doct.DocumentIsReadOnly()
+
+    def _read_only(self, *args, **kwargs):
+        raise doct.DocumentIsReadOnly()
+
+    update = pop = popitem = setdefault = clear = _read_only
+
+    def __reduce__(self):
+        return (type(self), (self._name, dict(self)))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return type(self)(self._name, copy.deepcopy(dict(self), memo))
+
+    def to_name_dict_pair(self):
+        """Convert to (name, dict) pair"""
+        return self._name, dict(self)
+
+    def __repr__(self):
+        return '{}({!r}, {})'.format(type(self).__name__, self._name,
+                                     dict.__repr__(self))
+
+
+def wrap_in_read_only_doc(name, doc):
+    """
+    Put document contents into a ReadOnlyDoc object.
+
+    This is the default ``prepare_hook``. See :class:`ReadOnlyDoc`.
+    """
+    return ReadOnlyDoc(DOCT_NAMES[name], doc)
+
+
 class BrokerES(object):
     """
     Unified interface to data sources
@@ -1053,6 +1594,11 @@ class BrokerES(object):
     *event_sources :
         zero, one or more EventSource objects
     """
+    # Set by Broker.from_config; otherwise map derives the configuration
+    # from the components. Class attributes because __getattr__ is taken.
+    _config = None
+    _auto_register = True
+
     def __init__(self, hs, event_sources, assets):
         self.hs = hs
         self.event_sources = event_sources
@@ -1063,7 +1609,98 @@ class BrokerES(object):
         self.aliases = {}
         self.event_source_for_insert = self.event_sources[0]
         self.registry_for_insert = self.event_sources[0]
-        self.prepare_hook = wrap_in_deprecated_doct
+        self.prepare_hook = wrap_in_read_only_doc
+        # Number of events filled together by get_documents. Larger batches
+        # amortize datum lookups but hold more filled data in memory.
+        self.fill_batch_size = 32
+
+    def _get_config(self):
+        "The configuration a Broker can be rebuilt from by from_config"
+        if self._config is not None:
+            return self._config
+        config = {}
+        for key, component in (('metadatastore', self.mds),
+                               ('assets', self.reg)):
+            cls = type(component)
+            config[key] = {'module': cls.__module__,
+                           'class': cls.__name__,
+                           'config': dict(component.config)}
+        return config
+
+    def __reduce__(self):
+        # Connections and handler caches are not pickled: the Broker is
+        # rebuilt from its configuration and its components connect lazily.
+        # Aliases, which are often closures, are not carried over.
+        state = {'prepare_hook': self.prepare_hook,
+                 'fill_batch_size': self.fill_batch_size}
+        return (_unpickle_broker,
+                (self._get_config(), self._auto_register, self.filters,
+                 state))
+
+    def map(self, headers, func, executor=None, fields=None, fill=False):
+        """
+        Apply a function to the documents of each of many runs.
+
+        Only the start uid of each run is sent to the workers. Each worker
+        rebuilds the Broker from its configuration (once per worker and
+        call) and looks the run up itself, so ``executor`` may be a pool of
+        processes as well as threads.
+
+        Parameters
+        ----------
+        headers : Header or iterable of Headers
+            The runs to process
+        func : callable
+            Called as ``func(docs)`` for each run, where ``docs`` is a
+            generator of its ``(name, doc)`` pairs. It must be picklable
+            (e.g. defined at module level) to be used with processes.
+        executor : object, optional
+            Anything with a ``map(function, iterable)`` method that returns
+            results in order, such as a ``concurrent.futures`` executor or a
+            ``multiprocessing.Pool``. If None (default), the runs are
+            processed one after another in this process.
+        fields : list, optional
+            whitelist of field names of interest; if None, all are returned
+        fill : bool or Iterable[str], optional
+            Which fields to fill. False by default.
+
+        Returns
+        -------
+        results : list
+            The return value of ``func`` for each run, in input order
+
+        Examples
+        --------
+        >>> from concurrent.futures import ProcessPoolExecutor
+        >>> def count_events(docs):
+        ...     return sum(1 for name, doc in docs if name == 'event')
+        >>> with ProcessPoolExecutor(4) as executor:
+        ...     counts = db.map(db(plan_name='count'), count_events,
+        ...                     executor=executor)
+
+        See Also
+        --------
+        :meth:`Broker.process`
+        """
+        try:
+            headers.items()
+        except AttributeError:
+            pass
+        else:
+            headers = [headers]
+        if executor is None:
+            return [func(self.get_documents(h, fields=fields, fill=fill))
+                    for h in headers]
+        config = self._get_config()
+        # identifies this call, so that workers do not reuse Brokers
+        # rebuilt for another one
+        token = uuid.uuid4().hex
+        tasks = [(token, config, self._auto_register, h['start']['uid'],
+                  func, fields, fill) for h in headers]
+        try:
+            return list(executor.map(_map_one, tasks))
+        finally:
+            _close_worker_brokers(token)
 
     def add_event_source(self, es):
         self.event_sources.append(es)
@@ -1083,6 +1720,13 @@ class BrokerES(object):
         doc : dict
             Document
         """
+        if name == 'stop':
+            # Registries that batch their writes (e.g. sqlite with
+            # write_mode='batched') commit the run's Datums first.
+            for reg in self.assets.values():
+                flush = getattr(reg, 'flush', None)
+                if flush is not None:
+                    flush()
         if name in {'start', 'stop'}:
             return self.hs.insert(name, doc)
         else:
@@ -1376,11 +2020,13 @@ class BrokerES(object):
         """
         data_key = kwargs.pop('data_key', None)
 
+        # the header source applies data_key itself
         res = self.hs(text_search=text_search,
                       filters=self.filters,
+                      data_key=data_key,
                       **kwargs)
 
-        return Results(res, self, data_key)
+        return Results(res, self)
 
     def fill_event(self, event, inplace=True, handler_registry=None):
         """
@@ -1418,7 +2064,8 @@ class BrokerES(object):
 
     def get_events(self,
                    headers, stream_name='primary', fields=None, fill=False,
-                   handler_registry=None):
+                   handler_registry=None, prefetch=0, seq_num=None,
+                   time=None):
         """
         Get Event documents from one or more runs.
 
@@ -1449,6 +2096,26 @@ class BrokerES(object):
         handler_registry : dict, optional
             mapping asset specs (strings) to handlers (callable classes)
 
+        prefetch : int, optional
+            If non-zero (and filling), fill up to this many upcoming events
+            on a pool of background threads while the consumer processes
+            the current one. They are filled in batches of at most
+            ``fill_batch_size``. Events are still yielded in order.
+
+            Default is 0
+
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with
+            ``start <= seq_num < stop``. Either end may be None.
+
+            Default is None
+
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``
+            (in seconds since the epoch). Either end may be None.
+
+            Default is None
+
         Yields
         ------
         event : Event
@@ -1459,17 +2126,53 @@ class BrokerES(object):
         ValueError if any key in `fields` is not in at least one descriptor
         pre header.
         """
+        if prefetch and fill:
+            gen = self._prefetch_events(headers, stream_name, fields, fill,
+                                        handler_registry, prefetch,
+                                        seq_num, time)
+            for ev in gen:
+                yield ev
+            return
         for name, doc in self.get_documents(headers,
                                             fields=fields,
                                             stream_name=stream_name,
                                             fill=fill,
-                                            handler_registry=handler_registry):
+                                            handler_registry=handler_registry,
+                                            seq_num=seq_num, time=time):
             if name == 'event':
                 yield doc
 
+    def _prefetch_events(self, headers, stream_name, fields, fill,
+                         handler_registry, prefetch, seq_num, time):
+        try:
+            headers.items()
+        except AttributeError:
+            pass
+        else:
+            headers = [headers]
+        headers = [h if isinstance(h, Header) else self[h['start']['uid']]
+                   for h in headers]
+        descriptors = [d for h in headers for d in h.descriptors]
+        fill_batch = self._events_filler(descriptors, fields=fill,
+                                         inplace=False)
+        # Fill whole batches on the workers, so that each still makes one
+        # bulk_retrieve call, while keeping about `prefetch` Events in
+        # flight.
+        batch_size = min(self.fill_batch_size, prefetch)
+        depth = max(1, prefetch // batch_size)
+        events = self.get_events(headers, stream_name=stream_name,
+                                 fields=fields, fill=False,
+                                 seq_num=seq_num, time=time)
+        batches = partition_all(batch_size, events)
+        with self.reg.handler_context(handler_registry):
+            for batch in _prefetch(batches, fill_batch, depth):
+                for ev in batch:
+                    yield ev
+
     def get_documents(self,
                       headers, stream_name=ALL, fields=None, fill=False,
-                      handler_registry=None):
+                      handler_registry=None, seq_num=None, time=None,
+                      ordered=None):
         """
         Get all documents from one or more runs.
 
@@ -1500,6 +2203,26 @@ class BrokerES(object):
         handler_registry : dict, optional
             mapping asset pecs (strings) to handlers (callable classes)
 
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with
+            ``start <= seq_num < stop``. Either end may be None.
+
+            Default is None
+
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``
+            (in seconds since the epoch). Either end may be None.
+
+            Default is None
+
+        ordered : {None, 'time'}, optional
+            If 'time', the Events of all streams -- and the documents of
+            all the ``headers`` -- are merged into one stream in time order
+            as they are read, holding one document per stream in memory.
+            Each EventDescriptor still precedes its Events.
+
+            Default is None, which yields the streams one after another
+
         Yields
         ------
         name : str
@@ -1520,31 +2243,64 @@ class BrokerES(object):
         else:
             headers = [headers]
 
+        if ordered not in (None, 'time'):
+            raise ValueError("ordered must be None or 'time', not "
+                             "{!r}".format(ordered))
         check_fields_exist(fields if fields else [], headers)
+        if ordered == 'time':
+            for name, doc in self._time_ordered_documents(
+                    headers, stream_name, fields, fill, handler_registry,
+                    seq_num, time):
+                yield name, doc
+            return
         # dirty hack!
         with self.reg.handler_context(handler_registry):
             for h in headers:
                 if not isinstance(h, Header):
                     h = self[h['start']['uid']]
                 # TODO filter fill by fields
-                proc_gen = self._fill_events_coro(h.descriptors,
-                                                  fields=fill,
-                                                  inplace=True)
-                proc_gen.send(None)
+                fill_batch = self._events_filler(h.descriptors,
+                                                 fields=fill,
+                                                 inplace=True)
+                # Only hold events back when there is filling to amortize.
+                batch_size = self.fill_batch_size if fill else 1
                 for es in self.event_sources:
                     gen = es.docs_given_header(
                         header=h, stream_name=stream_name,
-                        fields=fields)
-                    for name, doc in gen:
-                        if name == 'event':
-                            doc = proc_gen.send(doc)
+                        fields=fields, seq_num=seq_num, time=time)
+                    for name, doc in _fill_in_batches(gen, fill_batch,
+                                                      batch_size):
                         yield name, self.prepare_hook(name, doc)
-                proc_gen.close()
+
+    def _time_ordered_documents(self, headers, stream_name, fields, fill,
+                                handler_registry, seq_num, time):
+        "Documents of the headers merged in time order; see get_documents"
+        def header_docs(h):
+            fill_batch = self._events_filler(h.descriptors, fields=fill,
+                                             inplace=True)
+            batch_size = self.fill_batch_size if fill else 1
+            streams = []
+            for es in self.event_sources:
+                streams.extend(es.streams_given_header(
+                    header=h, stream_name=stream_name, fields=fields,
+                    seq_num=seq_num, time=time))
+            docs = itertools.chain([('start', h['start'])],
+                                   _merge_by_time(streams),
+                                   [('stop', h['stop'])])
+            return _fill_in_batches(docs, fill_batch, batch_size)
+
+        with self.reg.handler_context(handler_registry):
+            headers = [h if isinstance(h, Header) else self[h['start']['uid']]
+                       for h in headers]
+            for name, doc in _merge_by_time(header_docs(h)
+                                            for h in headers):
+                yield name, self.prepare_hook(name, doc)
 
     def get_table(self,
                   headers, stream_name='primary', fields=None, fill=False,
                   handler_registry=None,
-                  convert_times=True, timezone=None, localize_times=True):
+                  convert_times=True, timezone=None, localize_times=True,
+                  seq_num=None, time=None):
         """
         Load the data from one or more runs as a table (``pandas.DataFrame``).
 
@@ -1602,6 +2358,18 @@ class BrokerES(object):
 
             Defaults to True to preserve back-compatibility.
 
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with
+            ``start <= seq_num < stop``. Either end may be None.
+
+            Default is None
+
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``
+            (in seconds since the epoch). Either end may be None.
+
+            Default is None
+
         Returns
         -------
         table : pandas.DataFrame
@@ -1633,7 +2401,8 @@ class BrokerES(object):
                         stream_name=stream_name,
                         convert_times=convert_times,
                         timezone=timezone,
-                        localize_times=localize_times)
+                        localize_times=localize_times,
+                        seq_num=seq_num, time=time)
                     if len(table):
                         table = self.fill_table(table, desc, inplace=True)
                         dfs.append(table)
@@ -1696,17 +2465,19 @@ class BrokerES(object):
             for k, v in six.iteritems(d['data_keys']):
                 if 'external' in v:
                     external_keys.add(k)
+        if not external_keys:
+            return set()
         ev_gen = self.get_events(header, stream_name=ALL,
                                  fields=external_keys, fill=False)
-        resources = set()
+        datum_ids = set()
         for ev in ev_gen:
             for k, v in six.iteritems(ev['data']):
                 if k in external_keys:
-                    res = self.reg.resource_given_datum_id(v)
-                    resources.add(res['uid'])
-        return resources
+                    datum_ids.add(v)
+        resources = self.reg.resources_given_datum_ids(datum_ids)
+        return set(res['uid'] for res in resources.values())
 
-    def restream(self, headers, fields=None, fill=False):
+    def restream(self, headers, fields=None, fill=False, ordered=None):
         """
         Get all Documents from given run(s).
 
@@ -1719,6 +2490,10 @@ class BrokerES(object):
         fill : bool, optional
             Whether externally-stored data should be filled in. Defaults to
             False.
+        ordered : {None, 'time'}, optional
+            If 'time', merge the documents of all streams and all headers in
+            time order, as the bluesky RunEngine would have emitted them.
+            Defaults to None, which yields one stream after another.
 
         Yields
         ------
@@ -1744,7 +2519,8 @@ class BrokerES(object):
         --------
         :meth:`Broker.process`
         """
-        for payload in self.get_documents(headers, fields=fields, fill=fill):
+        for payload in self.get_documents(headers, fields=fields, fill=fill,
+                                          ordered=ordered):
             yield payload
 
     stream = restream  # compat
@@ -1788,10 +2564,20 @@ class BrokerES(object):
 
     get_fields = staticmethod(get_fields)  # for convenience
 
-    def export(self, headers, db, new_root=None, copy_kwargs=None):
+    def export(self, headers, db, new_root=None, copy_kwargs=None,
+               batch_size=1000, copy_workers=4, resume=False, progress=None):
         """
         Export a list of headers.
 
+        Events are inserted in batches of ``batch_size`` per descriptor and
+        the datums of each resource in one bulk insert. Resources that
+        describe the same file(s) are inserted once, and each file is copied
+        once, by a pool of ``copy_workers`` threads.
+
+        The RunStop of each run is inserted last, once its events, resources
+        and datums are in place, so that an interrupted export can be
+        completed with ``resume=True``.
+
         Parameters:
         -----------
         headers : databroker.header
@@ -1801,55 +2587,56 @@ class BrokerES(object):
             export info
         new_root : str
             optional. root directory of files that are going to
-            be exported
+            be exported. If None, files are not copied and the exported
+            resources keep their original root.
         copy_kwargs : dict or None
-            passed through to the ``copy_files`` method on Registry;
-            None by default
+            ``verify`` and ``file_rename_hook`` are handled as in the
+            ``copy_files`` method on Registry; None by default
+        batch_size : int, optional
+            number of Events inserted per bulk insert; 1000 by default
+        copy_workers : int, optional
+            number of threads copying files; 4 by default
+        resume : bool, optional
+            If True, skip runs that already have a RunStop in ``db`` and only
+            insert the documents, datums and files that are missing from
+            partially exported runs. False by default.
+        progress : callable, optional
+            called as ``progress(n, total, header)`` after each run is
+            exported; ``total`` is None if ``headers`` has no length
 
         Returns
         ------
         file_pairs : list
-            list of (old_file_path, new_file_path) pairs generated by
-            ``copy_files`` method on Registry.
+            list of (old_file_path, new_file_path) pairs of the files that
+            were copied.
         """
         if copy_kwargs is None:
             copy_kwargs = {}
+        if copy_kwargs.get('verify'):
+            raise NotImplementedError('Verification is not implemented yet')
+        file_rename_hook = copy_kwargs.get('file_rename_hook')
         try:
             headers.items()
         except AttributeError:
             pass
         else:
             headers = [headers]
-        file_pairs = []
-        for header in headers:
-            # insert mds
-            db.mds.insert_run_start(**_sanitize(header['start']))
-            events = self.get_events(header)
-            for descriptor in header['descriptors']:
-                db.mds.insert_descriptor(**_sanitize(descriptor))
-                for event in events:
-                    db.mds.insert_event(**_sanitize(event))
-            db.mds.insert_run_stop(**_sanitize(header['stop']))
-            # insert assets
-            res_uids = self.get_resource_uids(header)
-            for uid in res_uids:
-                fps = self.reg.copy_files(uid, new_root=new_root,
-                                          **copy_kwargs)
-                file_pairs.extend(fps)
-                res = self.reg.resource_given_uid(uid)
-                new_res = db.reg.insert_resource(res['spec'],
-                                                 res['resource_path'],
-                                                 res['resource_kwargs'],
-                                                 root=new_root)
-                # Note that new_res has a different resource id than res.
-                datums = self.reg.datum_gen_given_resource(uid)
-                for datum in datums:
-                    db.reg.insert_datum(new_res,
-                                       datum['datum_id'],
-                                       datum['datum_kwargs'])
-        return file_pairs
-
-    def export_size(self, headers):
+        try:
+            total = len(headers)
+        except TypeError:
+            total = None
+        exporter = _Exporter(self, db, new_root, batch_size, copy_workers,
+                             resume, file_rename_hook)
+        try:
+            for n, header in enumerate(headers):
+                exporter.export_header(header)
+                if progress is not None:
+                    progress(n + 1, total, header)
+        finally:
+            exporter.close()
+        return exporter.file_pairs
+
+    def export_size(self, headers, stat_workers=8):
         """
         Get the size of files associated with a list of headers.
 
@@ -1857,6 +2644,8 @@ class BrokerES(object):
         -----------
         headers : :class:databroker.Header:
             one or more headers that are going to be exported
+        stat_workers : int, optional
+            number of threads used to stat the files; 8 by default
 
         Returns
         ------
@@ -1869,18 +2658,25 @@ class BrokerES(object):
             pass
         else:
             headers = [headers]
-        total_size = 0
+        res_uids = set()
         for header in headers:
+            res_uids.update(self.get_resource_uids(header))
+        files = set()
+        for uid in res_uids:
             # get files from assets
-            res_uids = self.get_resource_uids(header)
-            for uid in res_uids:
-                datum_gen = self.reg.datum_gen_given_resource(uid)
-                datum_kwarg_gen = (datum['datum_kwargs'] for datum in
-                                   datum_gen)
-                files = self.reg.get_file_list(uid, datum_kwarg_gen)
-                for file in files:
-                    total_size += os.path.getsize(file)
-
+            datum_gen = self.reg.datum_gen_given_resource(uid)
+            datum_kwarg_gen = (datum['datum_kwargs'] for datum in
+                               datum_gen)
+            files.update(self.reg.get_file_list(uid, datum_kwarg_gen))
+        if not files:
+            return 0.
+        # stat calls mostly wait on the (often network) file system
+        pool = ThreadPool(min(stat_workers, len(files)))
+        try:
+            total_size = sum(pool.map(os.path.getsize, sorted(files)))
+        finally:
+            pool.close()
+            pool.join()
         return total_size * 1e-9
 
     def fill_events(self, events, descriptors, fields=True, inplace=False):
@@ -1948,19 +2744,29 @@ class BrokerES(object):
             proc_gen.close()
 
     def _fill_events_coro(self, descriptors, fields=True, inplace=False):
+        fill_batch = self._events_filler(descriptors, fields=fields,
+                                         inplace=inplace)
+        ev = yield
+        while True:
+            ev, = fill_batch([ev])
+            ev = yield ev
+
+    def _events_filler(self, descriptors, fields=True, inplace=False):
+        """Build a function that fills a list of events
+
+        All of the datum ids referenced by one list of events are retrieved
+        with a single ``bulk_retrieve`` call per registry.
+        """
         if fields is True:
             fields = None
         elif fields is False:
             # if no fields, we got nothing to do!
-            # just yield back as-is
-            ev = yield
-            while True:
-                ev = yield ev
-            return
-        elif fields:
+            # just give back the events as-is
+            return list
+        elif fields is not None:
             fields = set(fields)
         registry_map = {}
-        fill_map = defaultdict(list)
+        fill_map = defaultdict(set)
         for d in descriptors:
             fill_keys = set()
             desc_id = d['uid']
@@ -1970,29 +2776,39 @@ class BrokerES(object):
                     # TODO sort this out!
                     # _, _, reg_name = ext.partition(':')
                     reg_name = ''
-                    registry_map[(desc_id, k)] = self.assets[reg_name]
+                    registry_map[(desc_id, k)] = reg_name
                     fill_keys.add(k)
             if fields is not None:
                 fill_keys &= fields
             fill_map[desc_id] = fill_keys
-        ev = yield
 
-        while True:
+        def fill_batch(events):
             if not inplace:
-                ev = _sanitize(ev)
-                ev = copy.deepcopy(ev)
-                ev = self.prepare_hook('event', ev)
-            data = ev['data']
-            filled = ev['filled']
-            desc_id = ev['descriptor']
-            for k, v in six.iteritems(fill_map):
-                for dk in v:
-                    d_id = data[dk]
-                    data[dk] = (registry_map[(desc_id, dk)]
-                                .retrieve(d_id))
-                    filled[dk] = d_id
-
-            ev = yield ev
+                events = [self.prepare_hook('event',
+                                            copy.deepcopy(_sanitize(ev)))
+                          for ev in events]
+            # collect the datum ids to retrieve, grouped by registry
+            to_fill = []
+            datum_ids = defaultdict(set)
+            for ev in events:
+                desc_id = ev['descriptor']
+                data = ev['data']
+                filled = ev['filled']
+                for dk in fill_map[desc_id]:
+                    if dk not in data or filled.get(dk):
+                        continue
+                    reg_name = registry_map[(desc_id, dk)]
+                    datum_ids[reg_name].add(data[dk])
+                    to_fill.append((data, filled, dk, reg_name))
+            retrieved = {reg_name: self.assets[reg_name].bulk_retrieve(ids)
+                         for reg_name, ids in six.iteritems(datum_ids)}
+            for data, filled, dk, reg_name in to_fill:
+                d_id = data[dk]
+                data[dk] = retrieved[reg_name][d_id]
+                filled[dk] = d_id
+            return events
+
+        return fill_batch
 
     def fill_table(self, table, descriptor, fields=None, inplace=False):
         """Fill a table
@@ -2025,8 +2841,12 @@ class BrokerES(object):
 
         for k in fill_keys:
             reg = registry_map[k]
-            # TODO someday we will have bulk retrieve on assets.Registry
-            table[k] = [reg.retrieve(value) for value in table[k]]
+            datum_ids = list(table[k])
+            # The datums are looked up in bulk, but each is read by calling
+            # its handler: a table holds a whole run, so values the handler
+            # returns lazily (e.g. image stacks) must stay lazy.
+            retrieved = reg.bulk_retrieve(datum_ids, batch=False)
+            table[k] = [retrieved[d_id] for d_id in datum_ids]
 
         return table
 
@@ -2065,6 +2885,7 @@ class Broker(BrokerES):
                                      [EventSourceShim(mds, reg)],
                                      {'': reg})
         self.filters = filters
+        self._auto_register = auto_register
         if auto_register:
             register_builtin_handlers(self.reg)
 
@@ -2119,10 +2940,16 @@ class Broker(BrokerES):
         assets = assets_cls(config['assets']['config'])
         # Instantiate Broker.
         db = cls(mds, assets, auto_register=auto_register)
+        db._config = config
         # Register handlers included in the config, if any.
         for spec, handler in config.get('handlers', {}).items():
             cls = load_cls(handler)
             db.assets.reg.register_handler(spec, cls)
+        # Opt in to caching the tables of completed runs on local disk.
+        if config.get('column_cache'):
+            cache = ColumnCache(**config['column_cache'])
+            for es in db.event_sources:
+                es.column_cache = cache
         return db
 
     @classmethod
@@ -2155,6 +2982,285 @@ class Broker(BrokerES):
         return db
 
 
+def _unpickle_broker(config, auto_register, filters, state):
+    db = Broker.from_config(config, auto_register=auto_register)
+    db.add_filter(**filters)
+    for key, value in state.items():
+        setattr(db, key, value)
+    return db
+
+
+# Brokers rebuilt by _map_one, keyed on (process, thread) so that neither
+# connections nor handler caches are shared between threads or inherited
+# across a fork. Each holds the Broker of the Broker.map call it last ran a
+# task for; those in this process are closed when that call returns and
+# those in worker processes when the worker starts on another call.
+_worker_brokers = {}
+_worker_brokers_lock = threading.Lock()
+
+
+def _map_one(task):
+    "Run one Broker.map task in a worker"
+    token, config, auto_register, start_uid, func, fields, fill = task
+    key = (os.getpid(), threading.current_thread().ident)
+    with _worker_brokers_lock:
+        entry = _worker_brokers.get(key)
+    if entry is not None and entry[0] == token:
+        db = entry[1]
+    else:
+        if entry is not None:
+            _close_broker(entry[1])
+        db = Broker.from_config(config, auto_register=auto_register)
+        with _worker_brokers_lock:
+            _worker_brokers[key] = (token, db)
+    return func(db.get_documents(db[start_uid], fields=fields, fill=fill))
+
+
+def _close_worker_brokers(token):
+    "Close the Brokers rebuilt in this process for one Broker.map call"
+    with _worker_brokers_lock:
+        keys = [key for key, (t, _) in _worker_brokers.items()
+                if t == token]
+        dbs = [_worker_brokers.pop(key)[1] for key in keys]
+    for db in dbs:
+        _close_broker(db)
+
+
+def _close_broker(db):
+    "Drop the connections and cached handlers of a Broker"
+    for reg in db.assets.values():
+        reg.disconnect()
+        reg.clear_process_cache()
+    disconnect = getattr(db.mds, 'disconnect', None)
+    if disconnect is not None:
+        disconnect()
+
+
+def _merge_by_time(streams):
+    """Merge (name, doc) streams, each in time order, into one
+
+    This is a k-way merge on a heap holding the next document of each
+    stream. Ties go to the stream listed first and documents without a
+    time (e.g. the empty stop of an unfinished run) sort last.
+    """
+    heap = []
+    for i, stream in enumerate(streams):
+        it = iter(stream)
+        for name, doc in it:
+            heap.append((doc.get('time', _INF), i, name, doc, it))
+            break
+    heapq.heapify(heap)
+    while heap:
+        _, i, name, doc, it = heap[0]
+        yield name, doc
+        for next_name, next_doc in it:
+            heapq.heapreplace(heap, (next_doc.get('time', _INF), i,
+                                     next_name, next_doc, it))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+_INF = float('inf')
+
+
+def _fill_in_batches(doc_gen, fill_batch, batch_size):
+    """Pass the Events of a (name, doc) stream through fill_batch in chunks
+
+    Other documents are passed through in order, flushing any pending
+    Events first.
+    """
+    batch = []
+    for name, doc in doc_gen:
+        if name == 'event':
+            batch.append(doc)
+            if len(batch) < batch_size:
+                continue
+        if batch:
+            for ev in fill_batch(batch):
+                yield 'event', ev
+            batch = []
+        if name != 'event':
+            yield name, doc
+    if batch:
+        for ev in fill_batch(batch):
+            yield 'event', ev
+
+
+def _prefetch(items, func, depth):
+    """Lazily map func over items, keeping up to depth calls in flight
+
+    The calls run on a pool of ``depth`` threads; results are yielded in
+    the order of ``items``. Items are only pulled from the source as
+    results are consumed, and the pool is shut down when the generator
+    is exhausted or closed.
+    """
+    pool = ThreadPool(depth)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(pool.apply_async(func, (item,)))
+            if len(pending) > depth:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class _Exporter(object):
+    """Copy runs, with their assets, from one Broker into another
+
+    State shared across the runs of one `BrokerES.export` call (resources
+    already inserted, files already copied) lives here.
+    """
+    def __init__(self, source, target, new_root, batch_size, copy_workers,
+                 resume, file_rename_hook=None):
+        self.source = source
+        self.target = target
+        self.new_root = new_root
+        self.batch_size = batch_size
+        self.resume = resume
+        self.file_rename_hook = file_rename_hook
+        self.file_pairs = []
+        # source resource uid -> target resource uid
+        self._resources = {}
+        # resource identity (spec, root, path, kwargs) -> target resource uid
+        self._resource_files = {}
+        self._copied = set()
+        self._pool = ThreadPool(copy_workers)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def export_header(self, header):
+        mds = self.target.mds
+        start = _sanitize(header['start'])
+        stop = header['stop']
+        if self.resume:
+            existing = list(mds.find_run_starts(uid=start['uid']))
+            if existing and list(mds.find_run_stops(run_start=start['uid'])):
+                # already completely exported
+                return
+        else:
+            existing = []
+        if not existing:
+            mds.insert_run_start(**start)
+
+        known_descriptors = set()
+        if existing:
+            known_descriptors = set(
+                d['uid'] for d in mds.find_descriptors(run_start=start['uid']))
+        # Events already in the target, by descriptor (when resuming)
+        done = {}
+        batches = defaultdict(list)
+        for name, doc in self.source.get_documents(header, fill=False):
+            if name == 'descriptor':
+                if doc['uid'] in known_descriptors:
+                    done[doc['uid']] = set(
+                        mds.get_events_columns(doc['uid'], fields=[])['uid'])
+                else:
+                    mds.insert_descriptor(**_sanitize(doc))
+                    known_descriptors.add(doc['uid'])
+            elif name == 'event':
+                desc_uid = doc['descriptor']
+                if doc['uid'] in done.get(desc_uid, ()):
+                    continue
+                batch = batches[desc_uid]
+                batch.append(doc)
+                if len(batch) >= self.batch_size:
+                    mds.bulk_insert_events(desc_uid, batch, validate=False)
+                    del batch[:]
+        for desc_uid, batch in batches.items():
+            if batch:
+                mds.bulk_insert_events(desc_uid, batch, validate=False)
+
+        self._export_assets(header)
+        if stop:
+            mds.insert_run_stop(**_sanitize(stop))
+
+    def _export_assets(self, header):
+        reg = self.source.reg
+        target_reg = self.target.reg
+        to_copy = []
+        to_insert = []
+        for uid in self.source.get_resource_uids(header):
+            if uid in self._resources:
+                continue
+            res = reg.resource_given_uid(uid)
+            datums = list(reg.datum_gen_given_resource(uid))
+            if self.resume and datums:
+                try:
+                    self._resources[uid] = target_reg.resource_given_datum_id(
+                        datums[0]['datum_id'])['uid']
+                except target_reg.DatumNotFound:
+                    pass
+                else:
+                    continue
+            if self.new_root is not None:
+                for pair in reg.file_pairs(res, self.new_root):
+                    if pair[0] not in self._copied:
+                        self._copied.add(pair[0])
+                        to_copy.append(pair)
+            to_insert.append((uid, res, datums))
+
+        # Copy before inserting, so that exported datums imply copied files.
+        self._copy(to_copy)
+        for uid, res, datums in to_insert:
+            self._insert_resource(uid, res, datums)
+
+    def _copy(self, pairs):
+        total = len(pairs)
+
+        def copy(item):
+            n, (fin, fout) = item
+            if self.file_rename_hook is not None:
+                # As in Registry.copy_files, a failing hook does not stop
+                # the copy, but it is reported.
+                try:
+                    self.file_rename_hook(n, total, fin, fout)
+                except Exception:
+                    logger.exception("file_rename_hook failed for %s -> %s",
+                                     fin, fout)
+            ensure_path_exists(os.path.dirname(fout))
+            shutil.copy2(fin, fout)
+
+        self._pool.map(copy, enumerate(pairs))
+        self.file_pairs.extend(pairs)
+
+    def _insert_resource(self, uid, res, datums):
+        root = res.get('root', '') if self.new_root is None else self.new_root
+        key = (res['spec'], root, res['resource_path'],
+               repr(sorted(res['resource_kwargs'].items())))
+        new_uid = self._resource_files.get(key)
+        if new_uid is None:
+            new_res = self.target.reg.insert_resource(res['spec'],
+                                                      res['resource_path'],
+                                                      res['resource_kwargs'],
+                                                      root=root)
+            # Note that new_res has a different resource id than res.
+            new_uid = self._resource_files[key] = new_res['uid']
+        self._resources[uid] = new_uid
+        if datums:
+            self.target.reg.bulk_insert_datum(
+                new_uid,
+                [datum['datum_id'] for datum in datums],
+                [datum['datum_kwargs'] for datum in datums])
+
+
+def _page_to_dataframe(page):
+    "Make a DataFrame, indexed by seq_num, from a page of event columns"
+    df = pd.DataFrame({'time': page['time']}, index=page['seq_num'])
+    for field, values in page['data'].items():
+        if values.ndim > 1 or values.dtype == object:
+            # one array (or arbitrary object) per row
+            values = list(values)
+        df[field] = values
+    return df
+
+
 def _sanitize(doc):
     # Make this a plain dict and strip off doct.Document artifacts.
     d = dict(doc)
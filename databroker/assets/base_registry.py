@@ -3,6 +3,7 @@ from __future__ import (absolute_import, division, print_function,
 
 import six
 from contextlib import contextmanager
+from functools import partial
 import logging
 import os.path
 import shutil
@@ -88,6 +89,9 @@ class BaseRegistryRO(object):
 
     # ## Configuration management
 
+    # id of the process that opened the connections and handlers
+    _pid = None
+
     # required configuration, sub-classes can over-ride this to do validation
     REQ_CONFIG = ()
     # optional configuration, mostly for documentation
@@ -130,6 +134,31 @@ class BaseRegistryRO(object):
         self._handler_cache.clear()
         self._resource_cache.clear()
 
+    def _check_pid(self):
+        """Drop connections and handlers inherited from a parent process
+
+        Neither database connections nor the open files held by handlers
+        are safe to share across a fork; they are re-opened lazily.
+        """
+        pid = os.getpid()
+        if self._pid != pid:
+            if self._pid is not None:
+                self.disconnect()
+                self._handler_cache.clear()
+            self._pid = pid
+
+    def __getstate__(self):
+        # Connections and caches are rebuilt lazily after unpickling.
+        return (self.config, dict(self.handler_reg), self.root_map,
+                self.known_spec)
+
+    def __setstate__(self, state):
+        config, handler_reg, root_map, known_spec = state
+        self.__init__(config)
+        self.handler_reg = _ChainMap(handler_reg)
+        self.root_map = root_map
+        self.known_spec = known_spec
+
     # ## INIT
     def __init__(self, config, handler_reg=None, root_map=None):
         # set up configuration + version
@@ -175,11 +204,67 @@ class BaseRegistryRO(object):
 
     # ## Hi-level API
     # Users typically should not need anything outside of these methods
-    def retrieve(self, datum_id):
+    def retrieve(self, datum_id, handler_reg=None, handler_cache=None):
+        '''Retrieve the data for a datum id
+
+        Parameters
+        ----------
+        datum_id : str
+            The datum id to retrieve
+        handler_reg : Mapping, optional
+            spec -> Handler mapping to use instead of ``self.handler_reg``
+        handler_cache : MutableMapping, optional
+            Where to keep the Handler instances instead of the shared
+            cache. Use together with ``handler_reg`` to override handlers
+            for a long time without evicting the shared handlers.
+
+        Returns
+        -------
+        data
+        '''
         return self._api.retrieve(self._datum_col, datum_id,
-                                  self._datum_cache, self.get_spec_handler,
+                                  self._datum_cache,
+                                  partial(self.get_spec_handler,
+                                          handler_reg=handler_reg,
+                                          handler_cache=handler_cache),
                                   logger)
 
+    def bulk_retrieve(self, datum_ids, handler_reg=None, handler_cache=None,
+                      region=None, batch=True):
+        '''Retrieve the data for many datum ids at once
+
+        The datum documents are resolved in bulk and grouped by
+        resource so that each resource's handler is looked up once.
+
+        Parameters
+        ----------
+        datum_ids : iterable
+            The datum ids to retrieve
+        handler_reg : Mapping, optional
+            See :meth:`retrieve`
+        handler_cache : MutableMapping, optional
+            See :meth:`retrieve`
+        region : tuple of slice, optional
+            Only read this part of each datum. The slices apply to the
+            trailing axes of the data; handlers that provide
+            ``get_hyperslab`` read just that region.
+        batch : bool, optional
+            If False, call each handler once per datum, as `retrieve` does,
+            instead of through its ``get_many``. Handlers whose calls return
+            lazy objects (e.g. image stacks) then stay lazy. True by default.
+
+        Returns
+        -------
+        ret : dict
+            Mapping of datum id -> data
+        '''
+        return self._api.bulk_retrieve(self._datum_col, datum_ids,
+                                       self._datum_cache,
+                                       partial(self.get_spec_handler,
+                                               handler_reg=handler_reg,
+                                               handler_cache=handler_cache),
+                                       logger, region=region, batch=batch)
+
     def get_datum(self, datum_id):
         warnings.warn('get_datum is deprecated, use retrieve instead',
                       stacklevel=2)
@@ -198,11 +283,13 @@ class BaseRegistryRO(object):
 
     def deregister_handler(self, key):
         handler = self.handler_reg.pop(key, None)
-        if handler is not None:
-            name = handler.__name__
-            for k in list(self._handler_cache):
-                if k[1] == name:
-                    del self._handler_cache[k]
+        if handler is not None and handler not in self.handler_reg.values():
+            self._evict_handler(handler)
+
+    def _evict_handler(self, handler):
+        for k in list(self._handler_cache):
+            if k[1] is handler:
+                del self._handler_cache[k]
 
     @contextmanager
     def handler_context(self, temp_handlers):
@@ -213,15 +300,17 @@ class BaseRegistryRO(object):
         finally:
             popped_reg = self.handler_reg.maps[0]
             self.handler_reg = stash
+            # Only evict the instances of handlers that are no longer
+            # registered; the shared handlers stay cached.
+            registered = list(stash.values())
             for handler in popped_reg.values():
-                name = handler.__name__
-                for k in list(self._handler_cache):
-                    if k[1] == name:
-                        del self._handler_cache[k]
+                if handler not in registered:
+                    self._evict_handler(handler)
 
     # ## Mid-level API (for internal use)
     # Do mapping between a resource document -> a usable Handler object
-    def get_spec_handler(self, resource):
+    def get_spec_handler(self, resource, handler_reg=None,
+                         handler_cache=None):
         """
         Given a document from the registry_template FS collection return
         the proper Handler
@@ -233,6 +322,10 @@ class BaseRegistryRO(object):
         ----------
         resource : ObjectId
             ObjectId of a resource document
+        handler_reg : Mapping, optional
+            spec -> Handler mapping to use instead of ``self.handler_reg``
+        handler_cache : MutableMapping, optional
+            Where to cache the Handler instance instead of the shared cache
 
         Returns
         -------
@@ -242,14 +335,21 @@ class BaseRegistryRO(object):
             document returns the externally stored data
 
         """
+        self._check_pid()
         resource = self._resource_cache[resource]
 
-        h_cache = self._handler_cache
+        if handler_reg is None:
+            handler_reg = self.handler_reg
+        if handler_cache is None:
+            handler_cache = self._handler_cache
+        h_cache = handler_cache
 
         spec = resource['spec']
-        handler = self.handler_reg[spec]
+        handler = handler_reg[spec]
 
-        key = (str(resource['uid']), handler.__name__)
+        # Keyed on the Handler class itself so that two different classes
+        # with the same name never share instances.
+        key = (str(resource['uid']), handler)
 
         try:
             return h_cache[key]
@@ -309,6 +409,34 @@ class BaseRegistryRO(object):
                                            self._datum_cache, logger)
         return self._resource_cache[res]
 
+    def resources_given_datum_ids(self, datum_ids):
+        '''Given many datum ids return their Resource documents
+
+        The datum ids are resolved in bulk, and each distinct Resource is
+        looked up only once.
+
+        Parameters
+        ----------
+        datum_ids : iterable
+            The datum ids to resolve
+
+        Returns
+        -------
+        ret : dict
+            Mapping of datum id -> Resource document
+        '''
+        if self.version == 0:
+            raise NotImplementedError('V0 has no notion of root so can not '
+                                      'change it so no need for this method')
+
+        res_uids = self._api.resources_given_datum_ids(self._datum_col,
+                                                       datum_ids,
+                                                       self._datum_cache,
+                                                       logger)
+        resources = {uid: self._resource_cache[uid]
+                     for uid in set(res_uids.values())}
+        return {d_id: resources[uid] for d_id, uid in res_uids.items()}
+
     def resource_given_uid(self, uid):
         col = self._resource_col
         return self._api.resource_given_uid(col, uid)
@@ -391,6 +519,40 @@ class BaseRegistryRO(object):
 
         file_rename_hook = rename_hook_wrapper(file_rename_hook)
 
+        file_pairs = self.file_pairs(resource_or_uid, new_root)
+        N = len(file_pairs)
+        # copy the files to the new location
+        for n, (fin, fout) in enumerate(file_pairs):
+            # copy files
+            file_rename_hook(n, N, fin, fout)
+            ensure_path_exists(os.path.dirname(fout))
+            shutil.copy2(fin, fout)
+
+        return file_pairs
+
+    def file_pairs(self, resource_or_uid, new_root):
+        """
+        List where the files of a resource would go under a new root.
+
+        This is the planning half of `copy_files`; nothing is copied.
+
+        Parameters
+        ----------
+        resource_or_uid : Document or str
+            The resource to list the files of
+
+        new_root : str
+            The new 'root' for the files
+
+        Returns
+        -------
+        file_pairs : list
+            list of (old_file_path, new_file_path) pairs
+        """
+        if self.version == 0:
+            raise NotImplementedError('V0 has no notion of root so can not '
+                                      'change it')
+
         # get list of files
         resource = dict(self.resource_given_uid(resource_or_uid))
 
@@ -414,18 +576,8 @@ class BaseRegistryRO(object):
                                    'do not all share the same root, ABORT')
 
         # sort out where new files should go
-        new_file_list = [os.path.join(new_root,
-                                      os.path.relpath(f, old_root))
-                         for f in file_list]
-        N = len(new_file_list)
-        # copy the files to the new location
-        for n, (fin, fout) in enumerate(zip(file_list, new_file_list)):
-            # copy files
-            file_rename_hook(n, N, fin, fout)
-            ensure_path_exists(os.path.dirname(fout))
-            shutil.copy2(fin, fout)
-
-        return zip(file_list, new_file_list)
+        return [(f, os.path.join(new_root, os.path.relpath(f, old_root)))
+                for f in file_list]
 
 
 class RegistryTemplate(BaseRegistryRO):
@@ -12,6 +12,7 @@ except ImportError:
     from pathlib2 import Path
 import itertools
 import numpy as np
+from collections import defaultdict
 import hashlib
 
 # from .base_registry import BaseRegistry
@@ -23,7 +24,8 @@ from .sqlite import (ResourceCollection,
                      RegistryDatabase)
 from .core import (resource_given_uid, insert_resource,
                    update_resource, get_resource_history,
-                   doc_or_uid_to_uid, get_file_list)
+                   doc_or_uid_to_uid, get_file_list,
+                   retrieve_many, _unique)
 from ..headersource.hdf5 import append
 from ..utils import ensure_path_exists as makedirs
 
@@ -87,12 +89,7 @@ def bulk_register_datum_table(datum_col,
     return ['{}/{}'.format(resource_uid, d) for d in d_ids]
 
 
-def retrieve(col, datum_id, datum_cache, get_spec_handler, logger):
-    if '/' not in datum_id:
-        raise DatumNotFound
-    r_uid, _, d_uid = datum_id.partition('/')
-    d_uid = int(d_uid)
-    handler = get_spec_handler(r_uid)
+def _datum_table(col, r_uid, datum_cache):
     try:
         df = datum_cache[r_uid]
     except:
@@ -101,10 +98,42 @@ def retrieve(col, datum_id, datum_cache, get_spec_handler, logger):
             df = pd.DataFrame({k: fin[k][:] for k in fin})
             df = df.set_index('datum_id')
         datum_cache[r_uid] = df
+    return df
+
+
+def retrieve(col, datum_id, datum_cache, get_spec_handler, logger):
+    if '/' not in datum_id:
+        raise DatumNotFound
+    r_uid, _, d_uid = datum_id.partition('/')
+    d_uid = int(d_uid)
+    handler = get_spec_handler(r_uid)
+    df = _datum_table(col, r_uid, datum_cache)
 
     return handler(**dict(df.loc[d_uid]))
 
 
+def bulk_retrieve(col, datum_ids, datum_cache, get_spec_handler, logger,
+                  region=None, batch=True):
+    # The resource uid is encoded in the datum id, so grouping needs no
+    # database access at all.
+    by_resource = defaultdict(list)
+    for datum_id in _unique(datum_ids):
+        if '/' not in datum_id:
+            raise DatumNotFound
+        r_uid, _, d_uid = datum_id.partition('/')
+        by_resource[r_uid].append((datum_id, int(d_uid)))
+
+    ret = {}
+    for r_uid, d_ids in six.iteritems(by_resource):
+        handler = get_spec_handler(r_uid)
+        df = _datum_table(col, r_uid, datum_cache)
+        data = retrieve_many(handler,
+                             [dict(df.loc[d_uid]) for _, d_uid in d_ids],
+                             region=region, batch=batch)
+        ret.update(zip((datum_id for datum_id, _ in d_ids), data))
+    return ret
+
+
 def get_datum_by_res_gen(datum_col, resource_uid):
     path, fname = make_file_name(datum_col, resource_uid)
     fpath = Path(path) / Path(fname)
@@ -125,6 +154,16 @@ def resource_given_datum_id(col, datum_id, datum_cache, logger):
     return r_uid
 
 
+def resources_given_datum_ids(col, datum_ids, datum_cache, logger):
+    # The resource uid is encoded in the datum id.
+    ret = {}
+    for datum_id in datum_ids:
+        if '/' not in datum_id:
+            raise DatumNotFound
+        ret[datum_id] = datum_id.partition('/')[0]
+    return ret
+
+
 def bulk_insert_datum(col, resource, datum_ids,
                       datum_kwarg_list):
     d_uids = bulk_register_datum_table(col,
@@ -170,11 +209,13 @@ api = SimpleNamespace(
     bulk_register_datum_table=bulk_register_datum_table,
     resource_given_uid=resource_given_uid,
     retrieve=retrieve,
+    bulk_retrieve=bulk_retrieve,
     update_resource=update_resource,
     DatumNotFound=DatumNotFound,
     get_resource_history=get_resource_history,
     insert_datum=insert_datum,
     resource_given_datum_id=resource_given_datum_id,
+    resources_given_datum_ids=resources_given_datum_ids,
     get_datum_by_res_gen=get_datum_by_res_gen,
     get_file_list=get_file_list,
     bulk_insert_datum=bulk_insert_datum,
@@ -196,27 +237,37 @@ class RegistryRO(BaseRegistryRO):
         self.__db = None
         self.__resource_update_col = None
 
+    def disconnect(self):
+        self.__resource_col = None
+        self.__resource_update_col = None
+        if self.__db:
+            self.__db.disconnect()
+        self.__db = None
+
     @property
     def _datum_col(self):
         return self.config['dbpath']
 
     @property
     def _db(self):
+        self._check_pid()
         if self.__db is None:
             self.__db = RegistryDatabase(self.config['dbpath'] + '/r.sqlite')
         return self.__db
 
     @property
     def _resource_col(self):
+        self._check_pid()
         if self.__resource_col is None:
-            self.__resource_col = ResourceCollection(self._db.conn)
+            self.__resource_col = ResourceCollection(self._db)
         return self.__resource_col
 
     @property
     def _resource_update_col(self):
+        self._check_pid()
         if self.__resource_update_col is None:
             self.__resource_update_col = ResourceUpdatesCollection(
-                self._db.conn)
+                self._db)
         return self.__resource_update_col
 
     @property
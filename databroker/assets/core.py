@@ -5,9 +5,12 @@ import six
 from jsonschema import validate as js_validate
 import uuid
 import time as ttime
+import numpy as np
 import pandas as pd
+from collections import defaultdict
 from ..utils import sanitize_np, apply_to_dict_recursively
 
+
 class DatumNotFound(Exception):
     pass
 
@@ -65,6 +68,120 @@ def retrieve(col, datum_id, datum_cache, get_spec_handler, logger):
     return handler(**datum['datum_kwargs'])
 
 
+def bulk_retrieve(col, datum_ids, datum_cache, get_spec_handler, logger,
+                  region=None, batch=True):
+    '''Retrieve the data for many datum ids at once
+
+    All of the datum documents not already in the cache are fetched with
+    a single query and the handler for each resource is looked up only
+    once.
+
+    Parameters
+    ----------
+    col : Collection
+        The Datum collection
+
+    datum_ids : iterable
+        The datum ids to retrieve
+
+    region : tuple of slice, optional
+        Only return this part of each datum; see `retrieve_many`
+
+    batch : bool, optional
+        See `retrieve_many`
+
+    Returns
+    -------
+    ret : dict
+        Mapping of datum id -> data
+    '''
+    keys = ['datum_kwargs', 'resource']
+    datum_ids = list(datum_ids)
+    found = {}
+    missing = []
+    for d_id in set(datum_ids):
+        try:
+            found[d_id] = datum_cache[d_id]
+        except KeyError:
+            missing.append(d_id)
+    if missing:
+        for dd in col.find({'datum_id': {'$in': missing}}):
+            datum = {k: dd[k] for k in keys}
+            datum_cache[dd['datum_id']] = datum
+            found[dd['datum_id']] = datum
+
+    by_resource = defaultdict(list)
+    for d_id in _unique(datum_ids):
+        if d_id in found:
+            by_resource[found[d_id]['resource']].append(d_id)
+    for d_id in missing:
+        if d_id not in found:
+            raise DatumNotFound(
+                "No datum found with datum_id {!r}".format(d_id))
+
+    ret = {}
+    for res, d_ids in six.iteritems(by_resource):
+        handler = get_spec_handler(res)
+        data = retrieve_many(handler,
+                             [found[d_id]['datum_kwargs'] for d_id in d_ids],
+                             region=region, batch=batch)
+        ret.update(zip(d_ids, data))
+    return ret
+
+
+def retrieve_many(handler, datum_kwargs_list, region=None, batch=True):
+    '''Call a handler once for each set of datum kwargs
+
+    If the handler provides ``get_many`` (and ``batch`` is True) the whole
+    batch is handed to it in one call, otherwise the handler is called once
+    per datum.
+
+    If a ``region`` is given and the handler provides
+    ``get_hyperslab(datum_kwargs_list, region)`` only that region is read,
+    otherwise each datum is read in full and sliced afterwards.
+
+    Parameters
+    ----------
+    handler : callable
+        An instance of a Handler
+
+    datum_kwargs_list : list
+        The datum kwargs to pass to the handler
+
+    region : tuple of slice, optional
+        Slices applied to the trailing axes of each datum
+
+    batch : bool, optional
+        If False, call the handler once per datum even if it provides
+        ``get_many``, which keeps whatever it returns (e.g. lazy image
+        stacks) as it is. True by default.
+
+    Returns
+    -------
+    data : sequence
+        The data for each entry in ``datum_kwargs_list``, in order
+    '''
+    if region:
+        get_hyperslab = getattr(handler, 'get_hyperslab', None)
+        if get_hyperslab is not None and datum_kwargs_list:
+            return get_hyperslab(datum_kwargs_list, tuple(region))
+        index = (Ellipsis,) + tuple(region)
+        return [np.asarray(d)[index]
+                for d in retrieve_many(handler, datum_kwargs_list)]
+    get_many = getattr(handler, 'get_many', None) if batch else None
+    if get_many is not None and datum_kwargs_list:
+        return get_many(datum_kwargs_list)
+    return [handler(**kw) for kw in datum_kwargs_list]
+
+
+def _unique(seq):
+    seen = set()
+    for v in seq:
+        if v not in seen:
+            seen.add(v)
+            yield v
+
+
 def resource_given_datum_id(col, datum_id, datum_cache, logger):
     datum_id = doc_or_uid_to_uid(datum_id)
     datum = _get_datum_from_datum_id(col, datum_id, datum_cache, logger)
@@ -72,6 +189,42 @@ def resource_given_datum_id(col, datum_id, datum_cache, logger):
     return res
 
 
+def resources_given_datum_ids(col, datum_ids, datum_cache, logger):
+    '''Resolve many datum ids to the uids of their resources
+
+    Datum documents not already in the cache are fetched with a single
+    ``$in`` query.
+
+    Parameters
+    ----------
+    col : Collection
+        The Datum collection
+
+    datum_ids : iterable
+        The datum ids to resolve
+
+    Returns
+    -------
+    ret : dict
+        Mapping of datum id -> resource uid
+    '''
+    ret = {}
+    missing = []
+    for d_id in set(datum_ids):
+        try:
+            ret[d_id] = datum_cache[d_id]['resource']
+        except KeyError:
+            missing.append(d_id)
+    if missing:
+        for dd in col.find({'datum_id': {'$in': missing}}):
+            ret[dd['datum_id']] = dd['resource']
+    for d_id in missing:
+        if d_id not in ret:
+            raise DatumNotFound(
+                "No datum found with datum_id {!r}".format(d_id))
+    return ret
+
+
 def resource_given_uid(col, resource):
     uid = doc_or_uid_to_uid(resource)
     ret = col.find_one({'uid': uid})
@@ -111,6 +111,22 @@ class AreaDetectorTiffHandler(HandlerBase):
                 ret.append(tif.asarray())
         return np.array(ret).squeeze()
 
+    def get_many(self, datum_kwargs_list):
+        import tifffile
+        fnames = [fn for d_kw in datum_kwargs_list
+                  for fn in self._fnames_for_point(**d_kw)]
+        out = None
+        for j, fn in enumerate(fnames):
+            with tifffile.TiffFile(fn) as tif:
+                frame = tif.asarray()
+            if out is None:
+                out = np.empty((len(fnames),) + frame.shape, frame.dtype)
+            out[j] = frame
+        # match the squeezing done by __call__ for each point
+        point_shape = tuple(n for n in (self._fpp,) + out.shape[1:]
+                            if n != 1)
+        return out.reshape((len(datum_kwargs_list),) + point_shape)
+
     def get_file_list(self, datum_kwargs):
         ret = []
         for d_kw in datum_kwargs:
@@ -166,6 +182,37 @@ class HDF5DatasetSliceHandler(HandlerBase):
                                                           start, stop)
         return self._data_objects[point_number]
 
+    def get_many(self, datum_kwargs_list):
+        return self.get_hyperslab(datum_kwargs_list, ())
+
+    def get_hyperslab(self, datum_kwargs_list, region):
+        if not self._dataset:
+            self._dataset = self._file[self._key]
+        fpp = self._fpp
+        # The region applies to the trailing axes of each datum, whose
+        # shape is (frame_per_point,) + the shape of one frame.
+        region = tuple(region)
+        if len(region) > self._dataset.ndim:
+            raise IndexError("region {!r} has more axes than a datum of {} "
+                             "dimensions".format(region, self._dataset.ndim))
+        region = ((slice(None),) * (self._dataset.ndim - len(region)) +
+                  region)
+        frames, region = region[0], region[1:]
+        point_numbers = [d_kw['point_number'] for d_kw in datum_kwargs_list]
+        first = point_numbers[0]
+        if point_numbers == list(range(first, first + len(point_numbers))):
+            # contiguous points: read them with a single hyperslab
+            out = self._dataset[(slice(first * fpp,
+                                       (first + len(point_numbers)) * fpp),) +
+                                region]
+        else:
+            out = np.concatenate([self._dataset[(slice(p * fpp,
+                                                       (p + 1) * fpp),) +
+                                                region]
+                                  for p in point_numbers])
+        out = out.reshape((len(point_numbers), fpp) + out.shape[1:])
+        return out[:, frames]
+
     def open(self):
         import h5py
         if self._file:
@@ -233,6 +280,12 @@ class AreaDetectorHDF5SWMRHandler(AreaDetectorHDF5Handler):
 
         return rtn
 
+    def get_hyperslab(self, datum_kwargs_list, region):
+        if self._dataset is not None:
+            self._dataset.id.refresh()
+        return super(AreaDetectorHDF5SWMRHandler, self).get_hyperslab(
+            datum_kwargs_list, region)
+
 
 class AreaDetectorHDF5TimestampHandler(HandlerBase):
     """ Handler to retrieve timestamps from Areadetector HDF5 File
@@ -443,6 +496,9 @@ class NpyFrameWise(HandlerBase):
     def __call__(self, frame_no):
         return self._data[frame_no]
 
+    def get_many(self, datum_kwargs_list):
+        return self._data[[d_kw['frame_no'] for d_kw in datum_kwargs_list]]
+
     def get_file_list(self, datum_kwarg_gen):
         return [self._fpath]
 
@@ -10,6 +10,16 @@ class HandlerBase(object):
     Base-class for Handlers to provide the boiler plate to
     make them usable in context managers by provding stubs of
     ``__enter__``, ``__exit__`` and ``close``
+
+    Handlers may optionally provide a batch entry point,
+    ``get_many(datum_kwargs_list)``, which returns one array whose
+    ``j``-th element is the result of ``handler(**datum_kwargs_list[j])``.
+    The Registry uses it in place of per-datum calls when it is available.
+
+    Handlers that can read part of a datum may also provide
+    ``get_hyperslab(datum_kwargs_list, region)``, which is like
+    ``get_many`` but applies the tuple of slices ``region`` to the
+    trailing axes of each datum.
     """
     specs = set()
 
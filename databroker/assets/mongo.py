@@ -55,6 +55,7 @@ class RegistryRO(BaseRegistryRO):
 
     @property
     def _db(self):
+        self._check_pid()
         if self.__db is None:
             conn = self._connection
             self.__db = conn.get_database(self.config['database'])
@@ -76,6 +77,7 @@ class RegistryRO(BaseRegistryRO):
 
     @property
     def _resource_col(self):
+        self._check_pid()
         if self.__res_col is None:
             self.__res_col = self._db.get_collection('resource')
             self.__res_col.create_index('resource_id')
@@ -84,6 +86,7 @@ class RegistryRO(BaseRegistryRO):
 
     @property
     def _resource_update_col(self):
+        self._check_pid()
         if self.__res_update_col is None:
             self.__res_update_col = self._db.get_collection('resource_update')
             self.__res_update_col.create_index([
@@ -95,6 +98,7 @@ class RegistryRO(BaseRegistryRO):
 
     @property
     def _datum_col(self):
+        self._check_pid()
         if self.__datum_col is None:
             self.__datum_col = self._db.get_collection('datum')
             self.__datum_col.create_index('datum_id', unique=True)
@@ -104,6 +108,7 @@ class RegistryRO(BaseRegistryRO):
 
     @property
     def _connection(self):
+        self._check_pid()
         if self.__conn is None:
             self.__conn = MongoClient(self.config['host'],
                                       self.config.get('port', None))
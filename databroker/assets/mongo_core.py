@@ -6,6 +6,7 @@ import six
 import pymongo
 from collections import deque
 from .core import (DatumNotFound, _get_datum_from_datum_id, retrieve,
+                   bulk_retrieve,
                    resource_given_datum_id, insert_datum, insert_resource,
                    update_resource, get_datum_by_res_gen, get_file_list,
                    bulk_register_datum_table, register_datum)
@@ -37,6 +38,39 @@ def doc_or_uid_to_uid(doc_or_uid):
     return doc_or_uid
 
 
+def resources_given_datum_ids(col, datum_ids, datum_cache, logger,
+                              chunk_size=10000):
+    '''Resolve many datum ids to the uids of their resources
+
+    Only the datum_id and resource fields are fetched from the server,
+    with one ``$in`` query per ``chunk_size`` uncached datum ids.
+
+    Returns
+    -------
+    ret : dict
+        Mapping of datum id -> resource uid
+    '''
+    ret = {}
+    missing = []
+    for d_id in set(datum_ids):
+        try:
+            ret[d_id] = datum_cache[d_id]['resource']
+        except KeyError:
+            missing.append(d_id)
+    for i in range(0, len(missing), chunk_size):
+        chunk = missing[i:i + chunk_size]
+        cur = col.find({'datum_id': {'$in': chunk}},
+                       projection={'_id': False, 'datum_id': True,
+                                   'resource': True})
+        for dd in cur:
+            ret[dd['datum_id']] = dd['resource']
+    for d_id in missing:
+        if d_id not in ret:
+            raise DatumNotFound(
+                "No datum found with datum_id {!r}".format(d_id))
+    return ret
+
+
 def resource_given_uid(col, resource):
     uid = doc_or_uid_to_uid(resource)
 
@@ -2,7 +2,12 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 import six  # noqa
 import sqlite3
+import atexit
 import json
+import os
+import threading
+import time as ttime
+import weakref
 from contextlib import contextmanager
 from .base_registry import (RegistryTemplate, BaseRegistryRO, _ChainMap,
                             RegistryMovingTemplate)
@@ -45,6 +50,9 @@ VALUES (?, ?, ?, ?, ?, ?);"""
 SELECT_RESOURCE = "SELECT * FROM Resources WHERE uid=?;"
 SELECT_DATUM_BY_UID = "SELECT * FROM Datums WHERE datum_id=?;"
 SELECT_DATUM_BY_RESOURCE = "SELECT * FROM Datums WHERE resource=?;"
+SELECT_DATUMS_BY_UIDS = "SELECT * FROM Datums WHERE datum_id IN (%s);"
+# sqlite limits the number of host parameters in a single statement
+MAX_HOST_PARAMS = 999
 UPDATE_RESOURCE = """
 UPDATE Resources
 SET
@@ -60,18 +68,32 @@ SELECT_RESOURCE_UPDATES = """
 SELECT * FROM ResourceUpdates
 WHERE resource=?
 ORDER BY time;"""
+# applied to the connection when writes are batched
+BATCHED_PRAGMAS = ('PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL')
 
 
 @contextmanager
-def cursor(connection):
+def cursor(connection, lock=None):
     """
     a context manager for a sqlite cursor
 
+    Parameters
+    ----------
+    connection : sqlite3.Connection
+    lock : threading.RLock, optional
+        held while the cursor is in use, for connections shared with
+        worker threads
+
     Example
     -------
     >>> with cursor(conn) as c:
     ...     c.execute(query)
     """
+    if lock is not None:
+        with lock:
+            with cursor(connection) as c:
+                yield c
+        return
     c = connection.cursor()
     try:
         yield c
@@ -84,22 +106,80 @@ def cursor(connection):
         c.close()
 
 
+@contextmanager
+def savepoint(connection):
+    """
+    a context manager for a sqlite cursor that does not commit
+
+    The statements are added to the open transaction (beginning one if
+    needed) and all of them are undone if any fails, leaving the earlier
+    statements of the transaction in place.
+
+    Example
+    -------
+    >>> with savepoint(conn) as c:
+    ...     c.executemany(query, rows)
+    """
+    if not connection.in_transaction:
+        # Releasing a savepoint that began the transaction would commit.
+        connection.execute('BEGIN')
+    c = connection.cursor()
+    c.execute('SAVEPOINT batch')
+    try:
+        yield c
+    except:
+        c.execute('ROLLBACK TO batch')
+        raise
+    finally:
+        c.execute('RELEASE batch')
+        c.close()
+
+
 class RegistryDatabase(object):
-    def __init__(self, fp):
+    """
+    A sqlite database of Resources and Datums
+
+    With ``write_mode='safe'`` (the default) every insert is committed at
+    once. With ``write_mode='batched'`` the database uses a write-ahead
+    log with ``synchronous=NORMAL``, and Datums written through `write`
+    are committed together once ``flush_count`` are waiting or the oldest
+    has waited ``flush_interval`` seconds (checked on the next write).
+    `flush` commits whatever is waiting.
+    """
+    def __init__(self, fp, write_mode='safe', flush_count=1000,
+                 flush_interval=1.0):
+        if write_mode not in ('safe', 'batched'):
+            raise ValueError("write_mode must be 'safe' or 'batched', not "
+                             "{!r}".format(write_mode))
         self._fp = fp
+        self._batched = write_mode == 'batched'
+        self._flush_count = flush_count
+        self._flush_interval = flush_interval
+        # [number of writes waiting, time of the oldest], or None
+        self._pending = None
+        # The connection may be shared with worker threads (e.g. when
+        # prefetching filled events), so its use is serialized.
+        self.lock = threading.RLock()
         self.reconnect()
+        if self._batched:
+            atexit.register(_flush_at_exit, weakref.ref(self))
 
     def reconnect(self):
-        conn = sqlite3.connect(self._fp)
+        conn = sqlite3.connect(self._fp, check_same_thread=False)
         # Return rows as objects that support getitem.
         conn.row_factory = sqlite3.Row
+        if self._batched:
+            for pragma in BATCHED_PRAGMAS:
+                conn.execute(pragma)
         self.conn = conn
+        self._pending = None
+        self._pid = os.getpid()
 
-        with cursor(self.conn) as c:
+        with self.cursor() as c:
             c.execute(LIST_TABLES)
             tables = set([row['name'] for row in c.fetchall()])
         if tables == set():
-            with cursor(self.conn) as c:
+            with self.cursor() as c:
                 c.execute(CREATE_RESOURCES_TABLE)
                 c.execute(CREATE_DATUMS_TABLE)
                 c.execute(CREATE_RESOURCE_UPDATES_TABLE)
@@ -111,34 +191,77 @@ class RegistryDatabase(object):
                                    "tables: {}; found tables: {}".format(
                                        self._fp, EXPECTED_TABLES, tables))
 
+    def cursor(self):
+        "A cursor on the connection, holding the lock (see `cursor`)"
+        return cursor(self.conn, self.lock)
+
+    def write(self, statement, params, many=False):
+        """Execute an insert, committing it now or with the next batch"""
+        if not self._batched:
+            with self.cursor() as c:
+                if many:
+                    c.executemany(statement, params)
+                else:
+                    c.execute(statement, params)
+            return
+        if many:
+            params = list(params)
+        with self.lock:
+            with savepoint(self.conn) as c:
+                if many:
+                    c.executemany(statement, params)
+                else:
+                    c.execute(statement, params)
+            if self._pending is None:
+                self._pending = [0, ttime.time()]
+            self._pending[0] += len(params) if many else 1
+            if (self._pending[0] >= self._flush_count or
+                    ttime.time() - self._pending[1] >= self._flush_interval):
+                self.flush()
+
+    def flush(self):
+        """Commit any writes waiting to be committed"""
+        with self.lock:
+            # Writes made by the process that forked this one are not
+            # this process's to commit.
+            if self.conn is not None and self._pid == os.getpid():
+                self.conn.commit()
+            self._pending = None
+
     def disconnect(self):
+        self.flush()
         self.conn.close()
         self.conn = None
 
 
+def _flush_at_exit(ref):
+    db = ref()
+    if db is not None:
+        db.flush()
+
+
 def shadow_with_json(d, keys):
     """Shadow keys of a dict with JSON-string replacements."""
     return _ChainMap({key: json.dumps(d[key]) for key in keys}, d)
 
 
 class DatumCollection(object):
-    def __init__(self, conn):
-        self._conn = conn
+    def __init__(self, db):
+        self._db = db
 
     def insert_one(self, datum):
         datum = shadow_with_json(datum, ['datum_kwargs'])
         keys = ['datum_id', 'datum_kwargs', 'resource']
-        with cursor(self._conn) as c:
-            c.execute(INSERT_DATUM, [datum[k] for k in keys])
+        self._db.write(INSERT_DATUM, [datum[k] for k in keys])
 
     def insert(self, datums):
         datums = map(lambda d: shadow_with_json(d, ['datum_kwargs']), datums)
         keys = ['datum_id', 'datum_kwargs', 'resource']
-        with cursor(self._conn) as c:
-            c.executemany(INSERT_DATUM, ([d[k] for k in keys] for d in datums))
+        self._db.write(INSERT_DATUM, ([d[k] for k in keys] for d in datums),
+                       many=True)
 
     def find_one(self, query):
-        with cursor(self._conn) as c:
+        with self._db.cursor() as c:
             c.execute(SELECT_DATUM_BY_UID, (query['datum_id'],))
             raw = c.fetchone()
         if raw is None:
@@ -148,9 +271,20 @@ class DatumCollection(object):
         return doc
 
     def find(self, query):
-        with cursor(self._conn) as c:
-            c.execute(SELECT_DATUM_BY_RESOURCE, (query['resource'],))
-            raw = c.fetchall()
+        if 'resource' in query:
+            with self._db.cursor() as c:
+                c.execute(SELECT_DATUM_BY_RESOURCE, (query['resource'],))
+                raw = c.fetchall()
+        else:
+            # only {'datum_id': {'$in': [...]}} is supported
+            datum_ids = list(query['datum_id']['$in'])
+            raw = []
+            with self._db.cursor() as c:
+                for i in range(0, len(datum_ids), MAX_HOST_PARAMS):
+                    chunk = datum_ids[i:i + MAX_HOST_PARAMS]
+                    c.execute(SELECT_DATUMS_BY_UIDS %
+                              ', '.join('?' * len(chunk)), chunk)
+                    raw.extend(c.fetchall())
         for row in raw:
             doc = dict(row)
             doc['datum_kwargs'] = json.loads(doc['datum_kwargs'])
@@ -160,17 +294,17 @@ class DatumCollection(object):
 class ResourceUpdatesCollection(object):
     _JSONIFY_KEYS = ['old', 'new', 'cmd_kwargs']
 
-    def __init__(self, conn):
-        self._conn = conn
+    def __init__(self, db):
+        self._db = db
 
     def insert_one(self, log_object):
         log_object = shadow_with_json(log_object, self._JSONIFY_KEYS)
         keys = ['resource', 'old', 'new', 'time', 'cmd', 'cmd_kwargs']
-        with cursor(self._conn) as c:
+        with self._db.cursor() as c:
             c.execute(INSERT_RESOURCE_UPDATE, [log_object[k] for k in keys])
 
     def find(self, query):
-        with cursor(self._conn) as c:
+        with self._db.cursor() as c:
             c.execute(SELECT_RESOURCE_UPDATES, (query['resource'],))
             raw = c.fetchall()
         for row in raw:
@@ -181,24 +315,24 @@ class ResourceUpdatesCollection(object):
 
 
 class ResourceCollection(object):
-    def __init__(self, conn):
-        self._conn = conn
+    def __init__(self, db):
+        self._db = db
 
     def insert_one(self, resource):
         resource = shadow_with_json(resource, ['resource_kwargs'])
         keys = ['uid', 'spec', 'resource_path', 'root', 'path_semantics',
                 'resource_kwargs']
-        with cursor(self._conn) as c:
+        with self._db.cursor() as c:
             c.execute(INSERT_RESOURCE, [resource[k] for k in keys])
 
     def replace_one(self, query, resource):
         resource = shadow_with_json(resource, ['resource_kwargs'])
         keys = ['spec', 'resource_path', 'root', 'resource_kwargs', 'uid']
-        with cursor(self._conn) as c:
+        with self._db.cursor() as c:
             c.execute(UPDATE_RESOURCE, [resource[k] for k in keys])
 
     def find_one(self, query):
-        with cursor(self._conn) as c:
+        with self._db.cursor() as c:
             c.execute(SELECT_RESOURCE, (query['uid'],))
             raw = c.fetchone()
         if raw is None:
@@ -227,29 +361,43 @@ class RegistryRO(BaseRegistryRO):
             self.__db.disconnect()
         self.__db = None
 
+    def flush(self):
+        """Commit any Datums waiting to be written (see 'write_mode')"""
+        if self.__db is not None:
+            self.__db.flush()
+
     @property
     def _db(self):
+        self._check_pid()
         if self.__db is None:
-            self.__db = RegistryDatabase(self.config['dbpath'])
+            config = self.config
+            self.__db = RegistryDatabase(
+                config['dbpath'],
+                write_mode=config.get('write_mode', 'safe'),
+                flush_count=config.get('flush_count', 1000),
+                flush_interval=config.get('flush_interval', 1.0))
         return self.__db
 
     @property
     def _resource_col(self):
+        self._check_pid()
         if self.__resource_col is None:
-            self.__resource_col = ResourceCollection(self._db.conn)
+            self.__resource_col = ResourceCollection(self._db)
         return self.__resource_col
 
     @property
     def _resource_update_col(self):
+        self._check_pid()
         if self.__resource_update_col is None:
             self.__resource_update_col = ResourceUpdatesCollection(
-                self._db.conn)
+                self._db)
         return self.__resource_update_col
 
     @property
     def _datum_col(self):
+        self._check_pid()
         if self.__datum_col is None:
-            self.__datum_col = DatumCollection(self._db.conn)
+            self.__datum_col = DatumCollection(self._db)
         return self.__datum_col
 
     @property
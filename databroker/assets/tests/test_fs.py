@@ -4,11 +4,13 @@ from __future__ import (absolute_import, division, print_function,
 import pytest
 
 import os.path
+import pickle
 import uuid
 import numpy as np
 from numpy.testing import assert_array_equal
 
-from .utils import insert_syn_data, insert_syn_data_bulk
+from .utils import (insert_syn_data, insert_syn_data_bulk,
+                    insert_syn_data_with_resource, SynHandlerMod)
 
 
 @pytest.mark.parametrize('func', [insert_syn_data, insert_syn_data_bulk])
@@ -42,3 +44,184 @@ def test_root(fs):
         path = fs.retrieve(dm['datum_id'])
 
     assert path == os.path.join('bar', 'foo')
+
+
+@pytest.mark.parametrize('func', [insert_syn_data, insert_syn_data_bulk])
+def test_bulk_retrieve(func, fs):
+    shape = (25, 32)
+    mod_ids = func(fs, 'syn-mod', shape, 10)
+    mod_ids.extend(func(fs, 'syn-mod', shape, 5))
+
+    ret = fs.bulk_retrieve(mod_ids)
+    assert set(ret) == set(mod_ids)
+    for r_id in mod_ids:
+        assert_array_equal(ret[r_id], fs.retrieve(r_id))
+
+
+def test_bulk_retrieve_non_exist(fs):
+    with pytest.raises(fs.DatumNotFound):
+        fs.bulk_retrieve(['aardvark'])
+
+
+def test_bulk_retrieve_get_many(fs):
+    shape = (25, 32)
+    mod_ids = insert_syn_data(fs, 'syn-mod', shape, 10)
+    calls = []
+
+    class ManyHandler(SynHandlerMod):
+        def get_many(self, datum_kwargs_list):
+            calls.append(len(datum_kwargs_list))
+            return [self(**kw) for kw in datum_kwargs_list]
+
+    with fs.handler_context({'syn-mod': ManyHandler}):
+        ret = fs.bulk_retrieve(mod_ids)
+    assert calls == [len(mod_ids)]
+    for j, r_id in enumerate(mod_ids):
+        known_data = np.mod(np.arange(np.prod(shape)), j + 1).reshape(shape)
+        assert_array_equal(ret[r_id], known_data)
+
+    # batch=False calls the handler once per datum instead
+    with fs.handler_context({'syn-mod': ManyHandler}):
+        unbatched = fs.bulk_retrieve(mod_ids, batch=False)
+    assert calls == [len(mod_ids)]
+    for r_id in mod_ids:
+        assert_array_equal(unbatched[r_id], ret[r_id])
+
+
+def test_bulk_retrieve_region(fs):
+    shape = (25, 32)
+    mod_ids = insert_syn_data(fs, 'syn-mod', shape, 4)
+    region = (slice(2, 10), slice(0, 32, 3))
+    full = fs.bulk_retrieve(mod_ids)
+    # handlers without get_hyperslab are read in full and sliced
+    ret = fs.bulk_retrieve(mod_ids, region=region)
+    for r_id in mod_ids:
+        assert_array_equal(ret[r_id], full[r_id][region])
+
+    regions = []
+
+    class SlabHandler(SynHandlerMod):
+        def get_hyperslab(self, datum_kwargs_list, region):
+            regions.append(region)
+            return [self(**kw)[region] for kw in datum_kwargs_list]
+
+    with fs.handler_context({'syn-mod': SlabHandler}):
+        ret = fs.bulk_retrieve(mod_ids, region=region)
+    assert regions == [region]
+    for r_id in mod_ids:
+        assert_array_equal(ret[r_id], full[r_id][region])
+
+
+def test_resources_given_datum_ids(fs):
+    shape = (5, 5)
+    ids_a, res_a = insert_syn_data_with_resource(fs, 'syn-mod', shape, 5)
+    ids_b, res_b = insert_syn_data_with_resource(fs, 'syn-mod', shape, 3)
+
+    ret = fs.resources_given_datum_ids(ids_a + ids_b)
+    assert set(ret) == set(ids_a + ids_b)
+    for d_id in ids_a:
+        assert ret[d_id]['uid'] == res_a['uid']
+    for d_id in ids_b:
+        assert ret[d_id]['uid'] == res_b['uid']
+        assert ret[d_id] == fs.resource_given_datum_id(d_id)
+
+
+def test_resources_given_datum_ids_non_exist(fs):
+    with pytest.raises(fs.DatumNotFound):
+        fs.resources_given_datum_ids(['aardvark'])
+
+
+def test_handler_context_keeps_shared_handlers(fs):
+    shape = (25, 32)
+    mod_ids = insert_syn_data(fs, 'syn-mod', shape, 3)
+    fs.retrieve(mod_ids[0])
+    shared = list(fs._handler_cache)
+
+    class LocalHandler(SynHandlerMod):
+        pass
+
+    # re-registering the same handler does not evict it on exit
+    with fs.handler_context({'syn-mod': SynHandlerMod}) as fs:
+        fs.retrieve(mod_ids[1])
+    assert list(fs._handler_cache) == shared
+
+    # an override gets instances of its own, evicted on exit
+    with fs.handler_context({'syn-mod': LocalHandler}) as fs:
+        fs.retrieve(mod_ids[1])
+        assert len(fs._handler_cache) == 2
+    assert list(fs._handler_cache) == shared
+
+    # or kept in a separate cache, leaving the shared one alone
+    cache = {}
+    data = fs.retrieve(mod_ids[2], handler_reg={'syn-mod': LocalHandler},
+                       handler_cache=cache)
+    assert_array_equal(data, fs.retrieve(mod_ids[2]))
+    assert [type(h) for h in cache.values()] == [LocalHandler]
+    assert list(fs._handler_cache) == shared
+
+
+def test_pickle(fs):
+    shape = (25, 32)
+    mod_ids = insert_syn_data(fs, 'syn-mod', shape, 3)
+    fs.set_root_map({'a': 'b'})
+
+    fs2 = pickle.loads(pickle.dumps(fs))
+    assert fs2.config == fs.config
+    assert fs2.root_map == {'a': 'b'}
+    assert fs2.handler_reg['syn-mod'] is fs.handler_reg['syn-mod']
+    for r_id in mod_ids:
+        assert_array_equal(fs2.retrieve(r_id), fs.retrieve(r_id))
+
+
+def test_reconnect_after_fork(fs):
+    shape = (25, 32)
+    mod_ids = insert_syn_data(fs, 'syn-mod', shape, 3)
+    expected = [fs.retrieve(r_id) for r_id in mod_ids]
+    resource_col = fs._resource_col
+    assert len(fs._handler_cache)
+
+    # pretend that the connections and handlers were opened by a parent
+    # process
+    fs._pid = -1
+    assert fs._resource_col is not resource_col
+    assert not len(fs._handler_cache)
+    assert fs._pid == os.getpid()
+    fs.clear_process_cache()
+    for r_id, data in zip(mod_ids, expected):
+        assert_array_equal(fs.retrieve(r_id), data)
+
+
+def test_sqlite_batched_writes(tmpdir):
+    import sqlite3
+    from databroker.assets import sqlite as sqlfs
+
+    dbpath = str(tmpdir.join('registry.sqlite'))
+    fs = sqlfs.Registry({'dbpath': dbpath, 'write_mode': 'batched',
+                         'flush_count': 10, 'flush_interval': 1000})
+
+    def committed():
+        # what another process would see
+        conn = sqlite3.connect(dbpath)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM Datums').fetchone()[0]
+        finally:
+            conn.close()
+
+    res = fs.insert_resource('syn-mod', '', {})
+    for i in range(5):
+        fs.insert_datum(res, str(uuid.uuid4()), {'n': i})
+    assert committed() == 0
+    fs.flush()
+    assert committed() == 5
+    # flushed by count
+    fs.bulk_insert_datum(res, [str(uuid.uuid4()) for i in range(10)],
+                         [{'n': i} for i in range(10)])
+    assert committed() == 15
+    # a failed bulk insert leaves none of its Datums behind
+    datum_id = str(uuid.uuid4())
+    fs.insert_datum(res, datum_id, {'n': 0})
+    with pytest.raises(sqlite3.IntegrityError):
+        fs.bulk_insert_datum(res, [str(uuid.uuid4()), datum_id],
+                             [{'n': 1}, {'n': 2}])
+    fs.disconnect()
+    assert committed() == 16
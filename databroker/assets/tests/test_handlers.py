@@ -114,6 +114,13 @@ class Test_np_FW(_with_file):
                 known_data = i * np.ones((9, 8))
                 assert_array_equal(data, known_data)
 
+    def test_get_many(self):
+        hand = NpyFrameWise(self.filename + '.npy')
+        frames = [3, 0, 7]
+        data = hand.get_many([dict(frame_no=i) for i in frames])
+        for d, i in zip(data, frames):
+            assert_array_equal(d, hand(frame_no=i))
+
 
 class Test_AD_hdf5_files(_with_file):
     # test the HDF5 product emitted by the hdf5 plugin to area detector
@@ -144,6 +151,34 @@ class Test_AD_hdf5_files(_with_file):
             known_data = i * np.ones((1, 2, 2))
             assert_array_equal(data, known_data)
 
+    def test_get_many(self):
+        hand = self.handler(self.filename)
+        # contiguous and out-of-order point numbers take different paths
+        for points in ([1, 2, 3], [4, 0, 2]):
+            data = hand.get_many([dict(point_number=i) for i in points])
+            assert data.shape == (len(points), 1, 2, 2)
+            for d, i in zip(data, points):
+                assert_array_equal(d, hand(point_number=i))
+        hand.close()
+
+    def test_get_hyperslab(self):
+        hand = self.handler(self.filename)
+        for points in ([1, 2, 3], [4, 0, 2]):
+            kwargs = [dict(point_number=i) for i in points]
+            data = hand.get_hyperslab(kwargs, (slice(0, 2), slice(1, 2)))
+            assert data.shape == (len(points), 1, 2, 1)
+            full = hand.get_many(kwargs)
+            assert_array_equal(data, full[..., 1:2])
+            # a shorter region applies to the last axes
+            assert_array_equal(hand.get_hyperslab(kwargs, (slice(1, 2),)),
+                               data)
+            # a full region includes the frame_per_point axis
+            assert_array_equal(
+                hand.get_hyperslab(kwargs, (slice(0, 1), slice(0, 2),
+                                            slice(1, 2))),
+                data)
+        hand.close()
+
     def test_context_manager(self):
         # make sure context manager works
         with self.handler(self.filename) as hand:
@@ -322,6 +357,15 @@ class Test_ADTiff_files(_with_path):
                 assert np.all(fr == abs_count)
                 abs_count += 1
 
+    def test_get_many(self):
+        hand = AreaDetectorTiffHandler(self.filepath, self.template,
+                                       self.fname, self.fpp)
+        points = [2, 5, 3]
+        data = hand.get_many([{'point_number': j} for j in points])
+        assert data.shape == (len(points), self.fpp) + self.fr_shape
+        for d, j in zip(data, points):
+            assert_array_equal(d, hand(j))
+
     def test_filename_list(self):
         inp = sorted(self.fn_list)
         hand = AreaDetectorTiffHandler(self.filepath, self.template,
@@ -0,0 +1,148 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import six  # noqa
+import os
+import logging
+import tempfile
+import numpy as np
+from ..utils import ensure_path_exists
+
+logger = logging.getLogger(__name__)
+
+# os.replace is not available on Python 2; rename is atomic on POSIX.
+_replace = getattr(os, 'replace', os.rename)
+
+
+class ColumnCache(object):
+    """Local, on-disk cache of the event columns of completed runs.
+
+    The columns of each descriptor are stored in one ``.npz`` file named by
+    the descriptor uid. The total size of the cache is kept under
+    ``max_bytes`` by evicting the least recently used files first; recency
+    is tracked through the files' modification times, so it survives
+    restarts.
+
+    Only the data of runs with a RunStop document may be cached: the Events
+    of a completed run never change.
+
+    Parameters
+    ----------
+    directory : str
+        Where to keep the cache files. Created if it does not exist.
+    max_bytes : int, optional
+        Disk budget for the cache. Default is 1 GB.
+    """
+    SUFFIX = '.npz'
+
+    def __init__(self, directory, max_bytes=2 ** 30):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = int(max_bytes)
+        ensure_path_exists(self.directory)
+        # uids of descriptors whose columns `put` could not store
+        self.uncacheable = set()
+
+    def _path(self, descriptor_uid):
+        return os.path.join(self.directory, descriptor_uid + self.SUFFIX)
+
+    def get(self, descriptor_uid):
+        """Return the cached columns of a descriptor, or None.
+
+        Parameters
+        ----------
+        descriptor_uid : str
+
+        Returns
+        -------
+        columns : dict or None
+            Same structure as returned by ``get_events_columns``
+        """
+        path = self._path(descriptor_uid)
+        try:
+            with np.load(path) as f:
+                keys = list(f['keys'])
+                columns = {'uid': f['uid'],
+                           'seq_num': f['seq_num'],
+                           'time': f['time'],
+                           'data': {k: f['data_%d' % i]
+                                    for i, k in enumerate(keys)},
+                           'timestamps': {k: f['timestamps_%d' % i]
+                                          for i, k in enumerate(keys)}}
+        except (IOError, OSError, KeyError, ValueError):
+            # missing, or partially written by a crashed process
+            return None
+        try:
+            # mark as recently used
+            os.utime(path, None)
+        except OSError:
+            pass
+        return columns
+
+    def put(self, descriptor_uid, columns):
+        """Store the columns of a descriptor and enforce the disk budget.
+
+        Columns holding arbitrary Python objects are not cached.
+
+        Parameters
+        ----------
+        descriptor_uid : str
+        columns : dict
+            Same structure as returned by ``get_events_columns``
+
+        Returns
+        -------
+        stored : bool
+        """
+        keys = list(columns['data'])
+        arrays = {'keys': np.array(keys, dtype='U'),
+                  'uid': columns['uid'],
+                  'seq_num': columns['seq_num'],
+                  'time': columns['time']}
+        for i, k in enumerate(keys):
+            arrays['data_%d' % i] = columns['data'][k]
+            arrays['timestamps_%d' % i] = columns['timestamps'][k]
+        if any(np.asarray(v).dtype == object for v in arrays.values()):
+            self.uncacheable.add(descriptor_uid)
+            return False
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            _replace(tmp, self._path(descriptor_uid))
+        except Exception:
+            os.remove(tmp)
+            raise
+        self.evict()
+        if not os.path.exists(self._path(descriptor_uid)):
+            # larger than the whole budget
+            self.uncacheable.add(descriptor_uid)
+            return False
+        return True
+
+    def evict(self):
+        "Remove least recently used files until the cache fits its budget."
+        entries = []
+        for fn in os.listdir(self.directory):
+            if not fn.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, fn)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            logger.debug('evicted %s from the column cache', path)
+            total -= size
+
+    def clear(self):
+        "Remove every file from the cache."
+        for fn in os.listdir(self.directory):
+            if fn.endswith(self.SUFFIX):
+                os.remove(os.path.join(self.directory, fn))
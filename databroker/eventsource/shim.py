@@ -2,11 +2,13 @@ from __future__ import print_function
 import six  # noqa
 from collections import defaultdict
 from itertools import chain
+import numpy as np
 import pandas as pd
 import logging
 import boltons.cacheutils
 import re
 from ..utils import ALL
+from ..headersource.core import _as_column
 # Toolz and CyToolz have identical APIs -- same test suite, docstrings.
 try:
     from cytoolz.dicttoolz import merge
@@ -28,6 +30,9 @@ class EventSourceShim(object):
     def NoEventDescriptors(self):
         return self.mds.NoEventDescriptors
 
+    # optional ColumnCache serving the tables of completed runs
+    column_cache = None
+
     def __init__(self, mds, fs):
         self.mds = mds
         self.fs = fs
@@ -54,10 +59,24 @@ class EventSourceShim(object):
         except self.NoEventDescriptors:
             return []
 
+    def descriptors_given_headers(self, headers):
+        """Get the descriptors of many headers with a single query
+
+        Returns a list holding, for each header, what
+        ``descriptors_given_header`` would return.
+        """
+        uids = [h['start']['uid'] for h in headers]
+        by_start = {uid: [] for uid in uids}
+        if uids:
+            for d in self.mds.find_descriptors(run_start={'$in': uids}):
+                by_start[d['run_start']].append(d)
+        return [by_start[uid] for uid in uids]
+
     def descriptor_given_uid(self, desc_uid):
         return self.mds.descriptor_given_uid(desc_uid)
 
-    def docs_given_header(self, header, stream_name=ALL, fields=None):
+    def docs_given_header(self, header, stream_name=ALL, fields=None,
+                          seq_num=None, time=None):
         """Get documents for given Header.
 
         Parameters
@@ -71,6 +90,12 @@ class EventSourceShim(object):
         fields : list, optional
             whitelist of field names of interest or regular expression;
             if None, all are returned
+        seq_num : tuple, optional
+            ``(start, stop)``; only yield Events with ``start <= seq_num <
+            stop``. Either end may be None.
+        time : tuple, optional
+            ``(t0, t1)``; only yield Events with ``t0 <= time < t1``.
+            Either end may be None.
         Yields
         ------
         str : name
@@ -79,6 +104,27 @@ class EventSourceShim(object):
             The data payload
 
         """
+        yield 'start', header['start']
+        for stream in self.streams_given_header(header, stream_name,
+                                                fields=fields,
+                                                seq_num=seq_num, time=time):
+            for name, doc in stream:
+                yield name, doc
+        yield 'stop', header['stop']
+
+    def streams_given_header(self, header, stream_name=ALL, fields=None,
+                             seq_num=None, time=None):
+        """Get the documents of each descriptor of a Header separately.
+
+        Parameters are the same as for `docs_given_header`.
+
+        Returns
+        -------
+        streams : list
+            One generator per descriptor, yielding ``('descriptor', doc)``
+            and then ``('event', doc)`` for each of its Events, in time
+            order. No Events are read until a generator is advanced.
+        """
         no_fields_filter = False
         if fields is None:
             no_fields_filter = True
@@ -92,12 +138,17 @@ class EventSourceShim(object):
         start = header['start']
         stop = header['stop']
 
-        yield 'start', header['start']
+        streams = []
         for d in descs:
             (all_extra_dk, all_extra_data,
              all_extra_ts, discard_fields) = _extract_extra_data(
                  start, stop, d, fields, comp_re, no_fields_filter)
 
+            # only fetch the fields that survive the filter
+            keys = None
+            if discard_fields:
+                keys = [k for k in d['data_keys'] if k not in discard_fields]
+
             d = d.copy()
             dict.__setitem__(d, 'data_keys', d['data_keys'].copy())
             for k in discard_fields:
@@ -107,28 +158,31 @@ class EventSourceShim(object):
             if not len(d['data_keys']) and not len(all_extra_data):
                 continue
 
-            yield 'descriptor', d
-            ev_gen = self.mds.get_events_generator(d)
-            for ev in ev_gen:
-                event_data = ev['data']  # cache for perf
-                event_timestamps = ev['timestamps']
-                event_data.update(all_extra_data)
-                event_timestamps.update(all_extra_ts)
-                for field in discard_fields:
-                    del event_data[field]
-                    del event_timestamps[field]
-                if not event_data:
-                    # Skip events that are now empty because they had no
-                    # applicable fields.
-                    continue
-
-                yield 'event', ev
+            streams.append(self._stream_docs(d, keys, all_extra_data,
+                                             all_extra_ts, seq_num, time))
+        return streams
+
+    def _stream_docs(self, d, keys, all_extra_data, all_extra_ts,
+                     seq_num, time):
+        yield 'descriptor', d
+        ev_gen = self.mds.get_events_generator(d, fields=keys,
+                                               seq_num=seq_num,
+                                               time=time)
+        for ev in ev_gen:
+            event_data = ev['data']  # cache for perf
+            event_timestamps = ev['timestamps']
+            event_data.update(all_extra_data)
+            event_timestamps.update(all_extra_ts)
+            if not event_data:
+                # Skip events that are now empty because they had no
+                # applicable fields.
+                continue
 
-        yield 'stop', header['stop']
+            yield 'event', ev
 
     def table_given_header(self, header, stream_name,
                            fields=None, convert_times=True, timezone=None,
-                           localize_times=True):
+                           localize_times=True, seq_num=None, time=None):
         """Make a table (pandas.DataFrame) from given header.
 
         Parameters
@@ -164,6 +218,12 @@ class EventSourceShim(object):
             This implies convert_times.
 
             Defaults to True to preserve back-compatibility.
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with ``start <= seq_num
+            < stop``. Either end may be None.
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``.
+            Either end may be None.
 
         Returns
         -------
@@ -192,8 +252,10 @@ class EventSourceShim(object):
              all_extra_ts, discard_fields) = _extract_extra_data(
                  start, stop, d, fields, comp_re, no_fields_filter)
 
-            payload = self.mds.get_events_table(d)
-            _, data, seq_nums, times, uids, timestamps = payload
+            keys = [k for k in d['data_keys'] if k not in discard_fields]
+            columns = self._events_columns(header, d, keys, seq_num, time)
+            seq_nums = columns['seq_num']
+            times = columns['time']
             df = pd.DataFrame(index=seq_nums)
             # if converting to datetime64 (in utc or 'local' tz)
             if convert_times or localize_times:
@@ -210,10 +272,11 @@ class EventSourceShim(object):
                          )
 
             df['time'] = times
-            for field, values in six.iteritems(data):
-                if field in discard_fields:
-                    logger.debug('Discarding field %s', field)
-                    continue
+            for field in keys:
+                values = columns['data'][field]
+                if values.ndim > 1 or values.dtype == object:
+                    # one array (or arbitrary object) per row
+                    values = list(values)
                 df[field] = values
             if list(df.columns) == ['time']:
                 # no content
@@ -230,6 +293,81 @@ class EventSourceShim(object):
             # edge case: no data
             return pd.DataFrame()
 
+    def event_pages_given_header(self, header, stream_name, fields=None,
+                                 page_size=1000, seq_num=None, time=None):
+        """Yield the Events of a header as columnar pages.
+
+        Parameters
+        ----------
+        header : Header
+            The header to fetch the events for
+        stream_name : string
+            Get events from only one "event stream" with this name, or
+            `ALL`.
+        fields : list, optional
+            whitelist of field names of interest; if None, all are returned
+        page_size : int, optional
+            The maximum number of Events per page
+        seq_num : tuple, optional
+            ``(start, stop)``; only include Events with ``start <= seq_num
+            < stop``. Either end may be None.
+        time : tuple, optional
+            ``(t0, t1)``; only include Events with ``t0 <= time < t1``.
+            Either end may be None.
+
+        Yields
+        ------
+        page : dict
+            'data' and 'timestamps' map each field to an array with one
+            entry per Event; 'seq_num', 'time' and 'uid' are arrays and
+            'descriptor' is the uid of the descriptor of these Events.
+        """
+        no_fields_filter = False
+        if fields is None:
+            no_fields_filter = True
+            fields = []
+        fields = set(fields)
+
+        comp_re = _compile_re(fields)
+
+        start = header['start']
+        stop = header.get('stop', {})
+        descs = self.descriptors_given_header(header, stream_name)
+        for d in descs:
+            (all_extra_dk, all_extra_data,
+             all_extra_ts, discard_fields) = _extract_extra_data(
+                 start, stop, d, fields, comp_re, no_fields_filter)
+
+            keys = [k for k in d['data_keys'] if k not in discard_fields]
+            if not keys and not all_extra_data:
+                continue
+            pages = self.mds.get_event_pages(d, fields=keys,
+                                             page_size=page_size,
+                                             seq_num=seq_num, time=time)
+            for page in pages:
+                n = len(page['seq_num'])
+                for field, v in all_extra_data.items():
+                    page['data'][field] = _as_column([v] * n)
+                    page['timestamps'][field] = np.full(
+                        n, all_extra_ts[field], dtype=float)
+                page['descriptor'] = d['uid']
+                yield page
+
+    def _events_columns(self, header, descriptor, keys, seq_num, time):
+        """Get event columns, through the column cache for completed runs"""
+        cache = self.column_cache
+        uid = descriptor['uid']
+        if (cache is None or not header.get('stop') or
+                uid in cache.uncacheable):
+            return self.mds.get_events_columns(descriptor, fields=keys,
+                                               seq_num=seq_num, time=time)
+        columns = cache.get(uid)
+        if columns is None:
+            columns = self.mds.get_events_columns(descriptor)
+            # If this fails, later reads query only what they need.
+            cache.put(uid, columns)
+        return _select_columns(columns, keys, seq_num, time)
+
     def fill_event(self, ev, inplace=False, fields=None,
                    handler_registry=None, handler_overrides=None):
         """Fill by de-referencing
@@ -335,6 +473,24 @@ class EventSourceShim(object):
         return tab
 
 
+def _select_columns(columns, keys, seq_num=None, time=None):
+    """Restrict full event columns to some keys and seq_num/time ranges"""
+    mask = np.ones(len(columns['seq_num']), dtype=bool)
+    for name, bounds in (('seq_num', seq_num), ('time', time)):
+        if bounds is None:
+            continue
+        start, stop = bounds
+        if start is not None:
+            mask &= columns[name] >= start
+        if stop is not None:
+            mask &= columns[name] < stop
+    out = {k: columns[k][mask] for k in ('uid', 'seq_num', 'time')}
+    for field in ('data', 'timestamps'):
+        out[field] = {k: columns[field][k][mask]
+                      for k in keys if k in columns[field]}
+    return out
+
+
 def _extract_extra_data(start, stop, d, fields, comp_re,
                         no_fields_filter):
 
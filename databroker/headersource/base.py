@@ -163,7 +163,8 @@ class MDSROTemplate(object):
                                               self._descriptor_col,
                                               self._DESCRIPTOR_CACHE)
 
-    def get_events_generator(self, descriptor, convert_arrays=True):
+    def get_events_generator(self, descriptor, convert_arrays=True,
+                             fields=None, seq_num=None, time=None):
         """A generator which yields all events from the event stream
 
         Parameters
@@ -173,6 +174,14 @@ class MDSROTemplate(object):
             a Document/dict with a 'uid' key or a uid string
         convert_arrays : boolean
             convert 'array' type to numpy.ndarray; True by default
+        fields : iterable, optional
+            Only fetch these data keys; if None (default), all of them.
+        seq_num : tuple, optional
+            ``(start, stop)``; only return Events with ``start <= seq_num <
+            stop``. Either end may be None.
+        time : tuple, optional
+            ``(t0, t1)``; only return Events with ``t0 <= time < t1``.
+            Either end may be None.
 
         Yields
         ------
@@ -186,7 +195,10 @@ class MDSROTemplate(object):
                                              self._DESCRIPTOR_CACHE,
                                              self._runstart_col,
                                              self._RUNSTART_CACHE,
-                                             convert_arrays=convert_arrays)
+                                             convert_arrays=convert_arrays,
+                                             fields=fields,
+                                             seq_num=seq_num,
+                                             time=time)
 
         # when we drop 2.7, this can be
         # yield from evs
@@ -225,6 +237,78 @@ class MDSROTemplate(object):
                                           self._runstart_col,
                                           self._RUNSTART_CACHE)
 
+    def get_events_columns(self, descriptor, fields=None, seq_num=None,
+                           time=None):
+        """All event data as numpy arrays, one per field
+
+        Unlike `get_events_table`, the backend may read the columns
+        directly without building a dict per event.
+
+        Parameters
+        ----------
+        descriptor : dict or str
+            The EventDescriptor to get the Events for.  Can be either
+            a Document/dict with a 'uid' key or a uid string
+        fields : iterable, optional
+            The data keys to return; if None (default), all data keys in
+            the descriptor.
+        seq_num, time : tuple, optional
+            Half-open ``(start, stop)`` ranges restricting the Events
+            returned; see `get_events_generator`.
+
+        Returns
+        -------
+        columns : dict
+            'data' and 'timestamps' map each field to an array with one
+            entry per event; 'seq_num', 'time' and 'uid' are arrays.
+        """
+        return self._api.get_events_columns(descriptor,
+                                            self._event_col,
+                                            self._descriptor_col,
+                                            self._DESCRIPTOR_CACHE,
+                                            self._runstart_col,
+                                            self._RUNSTART_CACHE,
+                                            fields=fields,
+                                            seq_num=seq_num,
+                                            time=time)
+
+    def get_event_pages(self, descriptor, fields=None, page_size=1000,
+                        seq_num=None, time=None):
+        """Event data as numpy arrays, in pages of at most ``page_size``
+
+        Peak memory is bounded by the page size rather than the number of
+        events in the stream.
+
+        Parameters
+        ----------
+        descriptor : dict or str
+            The EventDescriptor to get the Events for.  Can be either
+            a Document/dict with a 'uid' key or a uid string
+        fields : iterable, optional
+            The data keys to return; if None (default), all data keys in
+            the descriptor.
+        page_size : int, optional
+            The maximum number of events per page
+        seq_num, time : tuple, optional
+            Half-open ``(start, stop)`` ranges restricting the Events
+            returned; see `get_events_generator`.
+
+        Yields
+        ------
+        columns : dict
+            Same structure as returned by `get_events_columns`.
+        """
+        return self._api.get_event_pages(descriptor,
+                                         self._event_col,
+                                         self._descriptor_col,
+                                         self._DESCRIPTOR_CACHE,
+                                         self._runstart_col,
+                                         self._RUNSTART_CACHE,
+                                         fields=fields,
+                                         page_size=page_size,
+                                         seq_num=seq_num,
+                                         time=time)
+
     def find_run_starts(self, **kwargs):
         """Given search criteria, locate RunStart Documents.
 
@@ -280,7 +364,8 @@ class MDSROTemplate(object):
         Parameters
         ----------
         run_start : doc.Document or str, optional
-            The RunStart document or uid to get the corresponding run end for
+            The RunStart document or uid to get the corresponding run end
+            for, or a query on the uid such as ``{'$in': [uid1, uid2]}``
         start_time : time-like, optional
             time-like representation of the earliest time that a RunStop
             was created. Valid options are:
@@ -318,7 +403,8 @@ class MDSROTemplate(object):
         Parameters
         ----------
         run_start : doc.Document or str, optional
-            The RunStart document or uid to get the corresponding run end for
+            The RunStart document or uid to get the corresponding run end
+            for, or a query on the uid such as ``{'$in': [uid1, uid2]}``
         start_time : time-like, optional
             time-like representation of the earliest time that an
             EventDescriptor was created. Valid options are:
@@ -346,6 +432,22 @@ class MDSROTemplate(object):
         for desc in gen:
             yield desc
 
+    def run_starts_with_data_key(self, data_key):
+        """The uids of the RunStarts with a descriptor containing a data key
+
+        Parameters
+        ----------
+        data_key : str
+            The data key (field name) to look for
+
+        Returns
+        -------
+        uids : list
+            The uids of the matching RunStarts, in no particular order
+        """
+        return self._api.run_starts_with_data_key(self._descriptor_col,
+                                                  data_key)
+
     def find_last(self, num=1):
         """Locate the last `num` RunStart Documents
 
@@ -10,11 +10,22 @@ import logging
 from requests import HTTPError
 from .mongo_core import (NoRunStart, NoEventDescriptors, NoRunStop,
                          BAD_KEYS_FMT)
+from .core import (_column_keys, _columns_from_events, _as_columns,
+                   _event_query)
+from mongoquery import Query
+from toolz import partition_all
 from ..utils import sanitize_np, apply_to_dict_recursively
 
 logger = logging.getLogger(__name__)
 
 
+def _range_filter(seq_num, time):
+    "Make a predicate matching events within the seq_num and time ranges"
+    query = _event_query(None, seq_num, time)
+    query.pop('descriptor')
+    return Query(query).match
+
+
 class MDSRO(object):
     """Read-only client for metadataservice
 
@@ -273,6 +284,23 @@ class MDSRO(object):
             yield r
 
 
+    def run_starts_with_data_key(self, data_key):
+        """The uids of the RunStarts with a descriptor containing a data key
+
+        Parameters
+        ----------
+        data_key : str
+            The data key (field name) to look for
+
+        Returns
+        -------
+        uids : list
+            The uids of the matching RunStarts, in no particular order
+        """
+        query = {'data_keys.' + data_key: {'$exists': True}}
+        return list(set(d['run_start']
+                        for d in self.find_descriptors(**query)))
+
     def find_run_stops(self, **kwargs):
         """Given search criteria, locate RunStop Documents.
         Parameters
@@ -403,7 +431,8 @@ class MDSRO(object):
         return response
         # return self._cache_run_stop(response, self._RUNSTOP_CACHE)
 
-    def get_events_generator(self, descriptor, convert_arrays=True):
+    def get_events_generator(self, descriptor, convert_arrays=True,
+                             fields=None, seq_num=None, time=None):
         """A generator which yields all events from the event stream
 
         Parameters
@@ -413,6 +442,14 @@ class MDSRO(object):
             a dict with a 'uid' key or a uid string
         convert_arrays : boolean
             convert 'array' type to numpy.ndarray; True by default
+        fields : iterable, optional
+            Only return these data keys; if None (default), all of them.
+        seq_num : tuple, optional
+            ``(start, stop)``; only return Events with ``start <= seq_num <
+            stop``. Either end may be None.
+        time : tuple, optional
+            ``(t0, t1)``; only return Events with ``t0 <= time < t1``.
+            Either end may be None.
 
         Yields
         ------
@@ -425,7 +462,16 @@ class MDSRO(object):
                                           'convert_arrays': convert_arrays},
                                    signature='get_events_generator')
         events = self._get(self._event_url, params=params)
+        # the server has no notion of fields or ranges, so filter here
+        if fields is not None:
+            fields = set(fields)
+        in_range = _range_filter(seq_num, time)
         for e in events:
+            if not in_range(e):
+                continue
+            if fields is not None:
+                for k in ('data', 'timestamps', 'filled'):
+                    e[k] = {f: v for f, v in e[k].items() if f in fields}
             yield e
 
     def get_events_table(self, descriptor):
@@ -464,6 +510,68 @@ class MDSRO(object):
         timestamps_table = self._transpose(all_events, keys, 'timestamps')
         return descriptor, data_table, seq_nums, times, uids, timestamps_table
 
+    def get_events_columns(self, descriptor, fields=None, seq_num=None,
+                           time=None):
+        """All event data as numpy arrays, one per field
+
+        Parameters
+        ----------
+        descriptor : dict or str
+            The EventDescriptor to get the Events for.  Can be either
+            a dict with a 'uid' key or a uid string
+        fields : iterable, optional
+            The data keys to return; if None (default), all data keys in
+            the descriptor.
+        seq_num, time : tuple, optional
+            Half-open ``(start, stop)`` ranges restricting the Events
+            returned; see `get_events_generator`.
+
+        Returns
+        -------
+        columns : dict
+            'data' and 'timestamps' map each field to an array with one
+            entry per event; 'seq_num', 'time' and 'uid' are arrays.
+        """
+        desc_uid = self.doc_or_uid_to_uid(descriptor)
+        descriptor = self.descriptor_given_uid(desc_uid)
+        keys = _column_keys(descriptor, fields)
+        events = self.get_events_generator(descriptor=descriptor,
+                                           fields=keys, seq_num=seq_num,
+                                           time=time)
+        return _as_columns(_columns_from_events(events, keys))
+
+    def get_event_pages(self, descriptor, fields=None, page_size=1000,
+                        seq_num=None, time=None):
+        """Event data as numpy arrays, in pages of at most ``page_size``
+
+        Parameters
+        ----------
+        descriptor : dict or str
+            The EventDescriptor to get the Events for.  Can be either
+            a dict with a 'uid' key or a uid string
+        fields : iterable, optional
+            The data keys to return; if None (default), all data keys in
+            the descriptor.
+        page_size : int, optional
+            The maximum number of events per page
+        seq_num, time : tuple, optional
+            Half-open ``(start, stop)`` ranges restricting the Events
+            returned; see `get_events_generator`.
+
+        Yields
+        ------
+        columns : dict
+            Same structure as returned by `get_events_columns`.
+        """
+        desc_uid = self.doc_or_uid_to_uid(descriptor)
+        descriptor = self.descriptor_given_uid(desc_uid)
+        keys = _column_keys(descriptor, fields)
+        events = self.get_events_generator(descriptor=descriptor,
+                                           fields=keys, seq_num=seq_num,
+                                           time=time)
+        for page in partition_all(page_size, events):
+            yield _as_columns(_columns_from_events(page, keys))
+
     def _transpose(self, in_data, keys, field):
         """Turn a list of dicts into dict of lists
         Parameters
@@ -6,6 +6,7 @@ import six
 import warnings
 import logging
 import numpy as np
+from toolz import partition_all
 from ..utils import (apply_to_dict_recursively, sanitize_np,
                      format_time as _format_time)
 
@@ -59,6 +60,22 @@ def doc_or_uid_to_uid(doc_or_uid):
     return doc_or_uid
 
 
+def _run_start_query(run_start):
+    """Normalize a run_start search parameter
+
+    A RunStart document or uid becomes the uid; an operator query such as
+    ``{'$in': [...]}`` is passed through, with the uids in an ``$in``
+    normalized as well.
+    """
+    if hasattr(run_start, 'items') and all(k.startswith('$')
+                                           for k in run_start):
+        query = dict(run_start)
+        if '$in' in query:
+            query['$in'] = [doc_or_uid_to_uid(rs) for rs in query['$in']]
+        return query
+    return doc_or_uid_to_uid(run_start)
+
+
 def _cache_run_start(run_start, run_start_cache):
     """Cache a RunStart document
 
@@ -326,7 +343,8 @@ def descriptors_by_start(run_start, descriptor_col, descriptor_cache):
 
 def get_events_generator(descriptor, event_col, descriptor_col,
                          descriptor_cache, run_start_col,
-                         run_start_cache, convert_arrays=True):
+                         run_start_cache, convert_arrays=True,
+                         fields=None, seq_num=None, time=None):
     """A generator which yields all events from the event stream
 
     Parameters
@@ -347,6 +365,17 @@ def get_events_generator(descriptor, event_col, descriptor_col,
     convert_arrays: boolean, optional
         convert 'array' type to numpy.ndarray; True by default
 
+    fields : iterable, optional
+        Only fetch these data keys; if None (default), all of them.
+
+    seq_num : tuple, optional
+        ``(start, stop)``; only return Events with ``start <= seq_num <
+        stop``. Either end may be None.
+
+    time : tuple, optional
+        ``(t0, t1)``; only return Events with ``t0 <= time < t1``. Either
+        end may be None.
+
     Yields
     ------
     event : dict
@@ -357,15 +386,24 @@ def get_events_generator(descriptor, event_col, descriptor_col,
     descriptor = descriptor_given_uid(descriptor_uid, descriptor_col,
                                       descriptor_cache)
     col = event_col
-    ev_cur = col.find({'descriptor': descriptor_uid},
-                      sort=[('time', ASCENDING)])
+    query = _event_query(descriptor_uid, seq_num, time)
+    if fields is None:
+        ev_cur = col.find(query, sort=[('time', ASCENDING)])
+    else:
+        fields = _column_keys(descriptor, fields)
+        ev_cur = col.find(query, sort=[('time', ASCENDING)],
+                          projection=_event_projection(fields))
 
     data_keys = descriptor['data_keys']
-    external_keys = [k for k in data_keys if 'external' in data_keys[k]]
+    external_keys = [k for k in data_keys if 'external' in data_keys[k]
+                     and (fields is None or k in fields)]
     for ev in ev_cur:
         # ditch the ObjectID
         ev.pop('_id', None)
         ev['descriptor'] = descriptor_uid
+        # a projection onto no data keys leaves these out entirely
+        ev.setdefault('data', {})
+        ev.setdefault('timestamps', {})
         for k, v in ev['data'].items():
             _dk = data_keys[k]
             # convert any arrays stored directly in mds into ndarray
@@ -478,6 +516,243 @@ def get_events_table(descriptor, event_col, descriptor_col,
     return descriptor, data_table, seq_nums, times, uids, timestamps_table
 
 
+def get_events_columns(descriptor, event_col, descriptor_col,
+                       descriptor_cache, run_start_col, run_start_cache,
+                       fields=None, seq_num=None, time=None):
+    """All event data as numpy arrays, one per field
+
+    Collections that provide a ``find_columns(query, keys)`` method are
+    asked for the columns directly; otherwise the events are transposed.
+
+    Parameters
+    ----------
+    descriptor : dict or str
+        The EventDescriptor to get the Events for.  Can be either
+        a Document/dict with a 'uid' key or a uid string
+
+    event_col
+        Collection we can search for events given descriptor in.
+
+    descriptor_col
+        Collection we can search for descriptors given a uid
+
+    descriptor_cache : dict
+        Dict[str, Document]
+
+    fields : iterable, optional
+        The data keys to return; if None (default), all data keys in the
+        descriptor.
+
+    seq_num : tuple, optional
+        ``(start, stop)``; only return Events with ``start <= seq_num <
+        stop``. Either end may be None.
+
+    time : tuple, optional
+        ``(t0, t1)``; only return Events with ``t0 <= time < t1``. Either
+        end may be None.
+
+    Returns
+    -------
+    columns : dict
+        'data' and 'timestamps' map each field to an array with one entry
+        per event; 'seq_num', 'time' and 'uid' are arrays.  Events are
+        ordered from oldest to newest.
+    """
+    desc_uid = doc_or_uid_to_uid(descriptor)
+    descriptor = descriptor_given_uid(desc_uid, descriptor_col,
+                                      descriptor_cache)
+    keys = _column_keys(descriptor, fields)
+    find_columns = getattr(event_col, 'find_columns', None)
+    if find_columns is not None:
+        columns = find_columns(_event_query(desc_uid, seq_num, time), keys)
+    else:
+        events = get_events_generator(desc_uid, event_col, descriptor_col,
+                                      descriptor_cache, run_start_col,
+                                      run_start_cache, fields=keys,
+                                      seq_num=seq_num, time=time)
+        columns = _columns_from_events(events, keys)
+    return _as_columns(columns)
+
+
+def get_event_pages(descriptor, event_col, descriptor_col,
+                    descriptor_cache, run_start_col, run_start_cache,
+                    fields=None, page_size=1000, seq_num=None, time=None):
+    """Event data as numpy arrays, in pages of at most ``page_size`` events
+
+    Collections that provide a ``find_column_pages(query, keys, page_size)``
+    method are read one page at a time natively; otherwise the events are
+    streamed from `get_events_generator` and transposed page by page.
+
+    Parameters
+    ----------
+    descriptor : dict or str
+        The EventDescriptor to get the Events for.  Can be either
+        a Document/dict with a 'uid' key or a uid string
+
+    event_col
+        Collection we can search for events given descriptor in.
+
+    descriptor_col
+        Collection we can search for descriptors given a uid
+
+    descriptor_cache : dict
+        Dict[str, Document]
+
+    fields : iterable, optional
+        The data keys to return; if None (default), all data keys in the
+        descriptor.
+
+    page_size : int, optional
+        The maximum number of events per page
+
+    seq_num, time : tuple, optional
+        Half-open ``(start, stop)`` ranges restricting the Events
+        returned; see `get_events_generator`.
+
+    Yields
+    ------
+    columns : dict
+        Same structure as returned by `get_events_columns`, for up to
+        ``page_size`` consecutive Events.
+    """
+    desc_uid = doc_or_uid_to_uid(descriptor)
+    descriptor = descriptor_given_uid(desc_uid, descriptor_col,
+                                      descriptor_cache)
+    keys = _column_keys(descriptor, fields)
+    find_column_pages = getattr(event_col, 'find_column_pages', None)
+    if find_column_pages is not None:
+        pages = find_column_pages(_event_query(desc_uid, seq_num, time),
+                                  keys, page_size)
+    else:
+        events = get_events_generator(desc_uid, event_col, descriptor_col,
+                                      descriptor_cache, run_start_col,
+                                      run_start_cache, fields=keys,
+                                      seq_num=seq_num, time=time)
+        pages = (_columns_from_events(page, keys)
+                 for page in partition_all(page_size, events))
+    for page in pages:
+        yield _as_columns(page)
+
+
+def _event_query(descriptor_uid, seq_num=None, time=None):
+    """Build the query for the Events of one descriptor
+
+    ``seq_num`` and ``time`` are half-open ``(start, stop)`` ranges, where
+    either end may be None.
+    """
+    query = {'descriptor': descriptor_uid}
+    for key, bounds in (('seq_num', seq_num), ('time', time)):
+        if bounds is None:
+            continue
+        start, stop = bounds
+        cond = {}
+        if start is not None:
+            cond['$gte'] = start
+        if stop is not None:
+            cond['$lt'] = stop
+        if cond:
+            query[key] = cond
+    return query
+
+
+def _event_projection(fields):
+    "Mongo-style projection selecting only some data keys of Events"
+    projection = {'_id': False, 'uid': True, 'seq_num': True, 'time': True}
+    for k in fields:
+        projection['data.' + k] = True
+        projection['timestamps.' + k] = True
+    return projection
+
+
+def _projected_keys(projection):
+    "The data keys selected by a projection made by `_event_projection`"
+    return [k[len('data.'):] for k, v in projection.items()
+            if v and k.startswith('data.')]
+
+
+def _project(doc, projection):
+    "Apply an inclusive mongo-style projection (dotted keys) to a dict"
+    out = {}
+    for key, include in projection.items():
+        if not include:
+            continue
+        src, dst = doc, out
+        parts = key.split('.')
+        for part in parts[:-1]:
+            src = src.get(part)
+            if not isinstance(src, dict):
+                break
+            dst = dst.setdefault(part, {})
+        else:
+            if parts[-1] in src:
+                dst[parts[-1]] = src[parts[-1]]
+    return out
+
+
+def _column_keys(descriptor, fields):
+    keys = list(descriptor['data_keys'])
+    if fields is not None:
+        fields = set(fields)
+        keys = [k for k in keys if k in fields]
+    return keys
+
+
+def _columns_from_events(events, keys):
+    """Turn an iterable of events into a dict of lists
+
+    Parameters
+    ----------
+    events : iterable
+        Event documents (or documents with the same structure)
+
+    keys : list
+        The data keys to extract
+
+    Returns
+    -------
+    columns : dict
+        Same structure as returned by `get_events_columns`, holding lists
+    """
+    columns = {'uid': [], 'seq_num': [], 'time': [],
+               'data': {k: [] for k in keys},
+               'timestamps': {k: [] for k in keys}}
+    data_cols = columns['data']
+    ts_cols = columns['timestamps']
+    for ev in events:
+        columns['uid'].append(ev['uid'])
+        columns['seq_num'].append(ev['seq_num'])
+        columns['time'].append(ev['time'])
+        data = ev['data']
+        ts = ev['timestamps']
+        for k in keys:
+            data_cols[k].append(data[k])
+            ts_cols[k].append(ts[k])
+    return columns
+
+
+def _as_columns(columns):
+    out = {k: _as_column(columns[k]) for k in ('uid', 'seq_num', 'time')}
+    for field in ('data', 'timestamps'):
+        out[field] = {k: _as_column(v) for k, v in columns[field].items()}
+    return out
+
+
+def _as_column(values):
+    "Convert a sequence of values into an array with one entry per value"
+    if isinstance(values, np.ndarray):
+        return values
+    try:
+        arr = np.asarray(values)
+    except ValueError:
+        # ragged sequences on newer numpy
+        arr = None
+    if arr is None or (arr.dtype == object and arr.ndim > 1):
+        arr = np.empty(len(values), dtype=object)
+        for j, v in enumerate(values):
+            arr[j] = v
+    return arr
+
+
 # database INSERTION ###################################################
 
 def insert_run_start(run_start_col, run_start_cache,
@@ -836,7 +1111,8 @@ def find_run_stops(stop_col, stop_cache, tz,
     Parameters
     ----------
     run_start : dict or str, optional
-        The RunStart document or uid to get the corresponding run end for
+        The RunStart document or uid to get the corresponding run end for,
+        or a query on the uid such as ``{'$in': [uid1, uid2]}``
     start_time : time-like, optional
         time-like representation of the earliest time that a RunStop
         was created. Valid options are:
@@ -864,8 +1140,7 @@ def find_run_stops(stop_col, stop_cache, tz,
     # if trying to find by run_start, there can be only one
     # normalize the input and get the run_start oid
     if run_start:
-        run_start_uid = doc_or_uid_to_uid(run_start)
-        kwargs['run_start'] = run_start_uid
+        kwargs['run_start'] = _run_start_query(run_start)
 
     _format_time(kwargs, tz)
     col = stop_col
@@ -883,7 +1158,8 @@ def find_descriptors(descriptor_col, descriptor_cache,
     Parameters
     ----------
     run_start : dict or str, optional
-        The RunStart document or uid to get the corresponding run end for
+        The RunStart document or uid to get the corresponding run end for,
+        or a query on the uid such as ``{'$in': [uid1, uid2]}``
     start_time : time-like, optional
         time-like representation of the earliest time that an EventDescriptor
         was created. Valid options are:
@@ -905,8 +1181,7 @@ def find_descriptors(descriptor_col, descriptor_cache,
         The requested EventDescriptor
     """
     if run_start:
-        run_start_uid = doc_or_uid_to_uid(run_start)
-        kwargs['run_start'] = run_start_uid
+        kwargs['run_start'] = _run_start_query(run_start)
 
     _format_time(kwargs, tz)
 
@@ -918,6 +1193,26 @@ def find_descriptors(descriptor_col, descriptor_cache,
         yield _cache_descriptor(event_descriptor, descriptor_cache)
 
 
+def run_starts_with_data_key(descriptor_col, data_key):
+    """The uids of the RunStarts with a descriptor containing a data key
+
+    Parameters
+    ----------
+    descriptor_col
+        Collection we can search for descriptors in.
+
+    data_key : str
+        The data key (field name) to look for
+
+    Returns
+    -------
+    uids : list
+        The distinct ``run_start`` of the matching descriptors
+    """
+    return list(descriptor_col.distinct(
+        'run_start', {'data_keys.' + data_key: {'$exists': True}}))
+
+
 def find_last(start_col, start_cache, num):
     """Locate the last `num` RunStart Documents
 
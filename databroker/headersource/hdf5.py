@@ -1,12 +1,81 @@
 import os
+import operator
 import h5py
 import numpy as np
 from collections import defaultdict
 from .mongoquery import JSONCollection
+from .mongoquery import DescriptorCollection as _JSONDescriptorCollection
 from .base import MDSTemplate, MDSROTemplate
+from .core import _projected_keys
 from ..utils import ensure_path_exists
 
 
+# mongo-style range operators supported in event queries
+_RANGE_OPS = {'$gte': operator.ge, '$gt': operator.gt,
+              '$lte': operator.le, '$lt': operator.lt}
+
+
+def _selection(group, query):
+    """Translate an event query into an index into a descriptor's datasets
+
+    Only the descriptor uid and ranges (``$gte``, ``$gt``, ``$lte``,
+    ``$lt``) on ``seq_num`` and ``time`` are supported. Contiguous matches
+    become a slice so they are read as a single hyperslab.
+    """
+    if 'descriptor' not in query or not (set(query) <=
+                                         {'descriptor', 'seq_num', 'time'}):
+        raise NotImplementedError("Only queries based on descriptor uid "
+                                  "and ranges of seq_num or time are "
+                                  "supported.")
+    mask = None
+    for key in ('seq_num', 'time'):
+        if key not in query:
+            continue
+        values = group[key][:]
+        key_mask = np.ones(len(values), dtype=bool)
+        for op, value in query[key].items():
+            key_mask &= _RANGE_OPS[op](values, value)
+        mask = key_mask if mask is None else mask & key_mask
+    if mask is None:
+        return slice(None)
+    idx = np.flatnonzero(mask)
+    if not len(idx):
+        return slice(0, 0)
+    if idx[-1] - idx[0] + 1 == len(idx):
+        return slice(idx[0], idx[-1] + 1)
+    return idx
+
+
+def _read_columns(group, sel, keys):
+    "Read the columns of the events at ``sel`` from a descriptor's group"
+    columns = {'uid': np.char.decode(group['uid'][sel], 'ascii'),
+               'seq_num': group['seq_num'][sel],
+               'time': group['time'][sel],
+               'data': {},
+               'timestamps': {}}
+    for key in keys:
+        if key not in group['data']:
+            # no events have been inserted yet
+            data = np.empty((0,))
+        else:
+            data = group['data'][key][sel]
+            if data.dtype.kind == 'S':
+                data = np.char.decode(data, 'utf-8')
+        columns['data'][key] = data
+        columns['timestamps'][key] = group['timestamps'][key][sel]
+    return columns
+
+
+def _reorder(columns, order):
+    "Apply an index (e.g. a sort order) to every column"
+    for k in ('uid', 'seq_num', 'time'):
+        columns[k] = columns[k][order]
+    for field in ('data', 'timestamps'):
+        for k, v in columns[field].items():
+            columns[field][k] = v[order]
+    return columns
+
+
 def append(dataset, data):
     data = np.asanyarray(data)
     cur_shape = dataset.shape
@@ -26,7 +95,7 @@ class RunStartCollection(JSONCollection):
         super(RunStartCollection, self).insert_one(doc, fk='uid')
 
 
-class DescriptorCollection(JSONCollection):
+class DescriptorCollection(_JSONDescriptorCollection):
     def __init__(self, event_col, *args, **kwargs):
         self._event_col = event_col
         super(DescriptorCollection, self).__init__(*args, **kwargs)
@@ -37,10 +106,36 @@ class DescriptorCollection(JSONCollection):
 
 
 class EventCollection(object):
-    def __init__(self, dirpath):
+    def __init__(self, dirpath, descriptor_col):
         self._runstarts = {}
         self._descriptors = {}
         self._dirpath = dirpath
+        # a callable, because the descriptor collection is built after us
+        self._descriptor_col = descriptor_col
+
+    def _runstart_path(self, uid):
+        try:
+            return self._runstarts[uid]
+        except KeyError:
+            # a run written earlier, possibly by another process
+            fp = os.path.join(self._dirpath, '{}.h5'.format(uid))
+            self._runstarts[uid] = fp
+            return fp
+
+    def _descriptor_path(self, uid):
+        try:
+            run_start_uid = self._descriptors[uid]
+        except KeyError:
+            col = self._descriptor_col()
+            doc = col.find_one({'uid': uid})
+            if doc is None:
+                # perhaps written since the collection was read
+                col.refresh()
+                doc = col.find_one({'uid': uid})
+            if doc is None:
+                raise KeyError(uid)
+            run_start_uid = self._descriptors[uid] = doc['run_start']
+        return self._runstart_path(run_start_uid)
 
     def new_runstart(self, doc):
         uid = doc['uid']
@@ -51,7 +146,7 @@ class EventCollection(object):
         uid = doc['uid']
         run_start_uid = doc['run_start']
         groupname = 'desc_' + uid.replace('-', '_')
-        fp = self._runstarts[run_start_uid]
+        fp = self._runstart_path(run_start_uid)
         with h5py.File(fp, 'a') as f:
             g = f.create_group(groupname)
             g.create_dataset('uid', shape=(0,), maxshape=(None,), dtype='S36')
@@ -67,23 +162,26 @@ class EventCollection(object):
                                                dtype='float64')
         self._descriptors[uid] = run_start_uid
 
-    def find(self, query, sort=None):
-        if list(query.keys()) != ['descriptor']:
-            raise NotImplementedError("Only queries based on descriptor uid "
-                                      "are supported.")
+    def find(self, query, sort=None, projection=None):
         desc_uid = query['descriptor']
         groupname = 'desc_' + desc_uid.replace('-', '_')
-        fp = self._runstarts[self._descriptors[desc_uid]]
+        fp = self._descriptor_path(desc_uid)
         with h5py.File(fp, 'r') as f:
             g = f[groupname]
-            transposed_uid = list(g['uid'][:])
-            transposed_seq_num = list(g['seq_num'][:])
-            transposed_time = list(g['time'][:])
+            sel = _selection(g, query)
+            if projection is None:
+                keys = list(g['data'])
+            else:
+                keys = [k for k in _projected_keys(projection)
+                        if k in g['data']]
+            transposed_uid = list(g['uid'][sel])
+            transposed_seq_num = list(g['seq_num'][sel])
+            transposed_time = list(g['time'][sel])
             transposed_data = {}
             transposed_ts = {}
-            for key in g['data']:
-                transposed_data[key] = list(g['data'][key][:])
-                transposed_ts[key] = list(g['timestamps'][key][:])
+            for key in keys:
+                transposed_data[key] = list(g['data'][key][sel])
+                transposed_ts[key] = list(g['timestamps'][key][sel])
         for _ in range(len(transposed_uid)):
             event = {}
             event['uid'] = transposed_uid.pop(0).decode()
@@ -99,6 +197,44 @@ class EventCollection(object):
                 event['timestamps'][key] = transposed_ts[key].pop(0)
             yield event
 
+    def find_columns(self, query, keys):
+        desc_uid = query['descriptor']
+        groupname = 'desc_' + desc_uid.replace('-', '_')
+        fp = self._descriptor_path(desc_uid)
+        with h5py.File(fp, 'r') as f:
+            g = f[groupname]
+            columns = _read_columns(g, _selection(g, query), keys)
+        # events are stored in insertion order
+        return _reorder(columns, np.argsort(columns['time'], kind='mergesort'))
+
+    def find_column_pages(self, query, keys, page_size):
+        desc_uid = query['descriptor']
+        groupname = 'desc_' + desc_uid.replace('-', '_')
+        fp = self._descriptor_path(desc_uid)
+        with h5py.File(fp, 'r') as f:
+            g = f[groupname]
+            sel = _selection(g, query)
+            # Work out the time order up front from the (small) time column
+            # so each page is a bounded read.
+            positions = np.arange(len(g['time']))[sel]
+            order = np.argsort(g['time'][sel], kind='mergesort')
+            positions = positions[order]
+        for start in range(0, len(positions), page_size):
+            page = positions[start:start + page_size]
+            # h5py needs increasing indices; contiguous pages are one slice.
+            sorted_page = np.sort(page)
+            if sorted_page[-1] - sorted_page[0] + 1 == len(sorted_page):
+                page_sel = slice(sorted_page[0], sorted_page[-1] + 1)
+            else:
+                page_sel = sorted_page
+            with h5py.File(fp, 'r') as f:
+                columns = _read_columns(f[groupname], page_sel, keys)
+            if not np.array_equal(page, sorted_page):
+                # back from storage order to time order
+                columns = _reorder(columns,
+                                   np.searchsorted(sorted_page, page))
+            yield columns
+
     def find_one(self, query):
         # not used on event_col
         raise NotImplementedError()
@@ -129,7 +265,7 @@ class EventCollection(object):
                 for k in keys:
                     transposed_data[k].append(data[k])
                     transposed_ts[k].append(ts[k])
-            fp = self._runstarts[self._descriptors[uid]]
+            fp = self._descriptor_path(uid)
             groupname = 'desc_' + uid.replace('-', '_')
             with h5py.File(fp, 'a') as f:
                 g = f[groupname]
@@ -170,6 +306,10 @@ class _CollectionMixin(object):
     @config.setter
     def config(self, val):
         self._config = val
+        self._reset_connections()
+
+    def _reset_connections(self):
+        "Drop the collections; they are reopened lazily."
         self.__event_col = None
         self.__descriptor_col = None
         self.__runstart_col = None
@@ -191,7 +331,6 @@ class _CollectionMixin(object):
 
     @property
     def _descriptor_col(self):
-        self._event_col
         if self.__descriptor_col is None:
             fp = os.path.join(self.config['directory'],
                               'event_descriptors.json')
@@ -201,7 +340,8 @@ class _CollectionMixin(object):
     @property
     def _event_col(self):
         if self.__event_col is None:
-            self.__event_col = EventCollection(self.config['directory'])
+            self.__event_col = EventCollection(
+                self.config['directory'], lambda: self._descriptor_col)
         return self.__event_col
 
 
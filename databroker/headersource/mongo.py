@@ -1,6 +1,7 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+import os
 import six
 import pymongo
 from pymongo import MongoClient
@@ -10,6 +11,8 @@ from .base import MDSROTemplate, MDSTemplate
 
 class MDSRO(MDSROTemplate):
     _API_MAP = {1: mongo_core}
+    # id of the process that opened the connection
+    _pid = None
 
     def __init__(self, config, auth=False):
         super(MDSRO, self).__init__(config)
@@ -35,6 +38,14 @@ class MDSRO(MDSROTemplate):
         self._api = None
         self.version, self.config = state
 
+    def _check_pid(self):
+        # MongoClient is not fork-safe; reconnect lazily in a child process.
+        pid = os.getpid()
+        if self._pid != pid:
+            if self._pid is not None:
+                self.disconnect()
+            self._pid = pid
+
     def disconnect(self):
         self.__conn = None
         self.__db = None
@@ -49,6 +60,7 @@ class MDSRO(MDSROTemplate):
 
     @property
     def _connection(self):
+        self._check_pid()
         if self.__conn is None:
             if self.auth:
                 uri = 'mongodb://{0}:{1}@{2}:{3}/'.format(
@@ -64,6 +76,7 @@ class MDSRO(MDSROTemplate):
 
     @property
     def _db(self):
+        self._check_pid()
         if self.__db is None:
             conn = self._connection
             self.__db = conn.get_database(self.config['database'])
@@ -71,6 +84,7 @@ class MDSRO(MDSROTemplate):
 
     @property
     def _runstart_col(self):
+        self._check_pid()
         if self.__runstart_col is None:
             self.__runstart_col = self._db.get_collection('run_start')
 
@@ -85,6 +99,7 @@ class MDSRO(MDSROTemplate):
 
     @property
     def _runstop_col(self):
+        self._check_pid()
         if self.__runstop_col is None:
             self.__runstop_col = self._db.get_collection('run_stop')
             self.__runstop_col.create_index('run_start',
@@ -99,6 +114,7 @@ class MDSRO(MDSROTemplate):
 
     @property
     def _descriptor_col(self):
+        self._check_pid()
         if self.__descriptor_col is None:
             # The name of the reference to the run start changed from
             # 'run_start_id' in v0 to 'run_start' in v1.
@@ -119,6 +135,7 @@ class MDSRO(MDSROTemplate):
 
     @property
     def _event_col(self):
+        self._check_pid()
         if self.__event_col is None:
             self.__event_col = self._db.get_collection('event')
 
@@ -7,6 +7,7 @@ import warnings
 import logging
 
 import pymongo
+from toolz import partition_all
 
 
 import numpy as np
@@ -18,7 +19,10 @@ from .core import (doc_or_uid_to_uid,   # noqa
                    run_start_given_uid, run_stop_given_uid,
                    descriptor_given_uid, stop_by_start, descriptors_by_start,
                    get_events_table, insert_run_start, insert_run_stop,
-                   insert_descriptor, insert_event, BAD_KEYS_FMT)
+                   insert_descriptor, insert_event, BAD_KEYS_FMT,
+                   _column_keys, _columns_from_events, _as_columns,
+                   _event_projection, _event_query, _run_start_query,
+                   run_starts_with_data_key)
 from ..utils import sanitize_np, apply_to_dict_recursively
 
 logger = logging.getLogger(__name__)
@@ -26,7 +30,8 @@ logger = logging.getLogger(__name__)
 
 def get_events_generator(descriptor, event_col, descriptor_col,
                          descriptor_cache, run_start_col,
-                         run_start_cache, convert_arrays=True):
+                         run_start_cache, convert_arrays=True,
+                         fields=None, seq_num=None, time=None):
     """A generator which yields all events from the event stream
 
     Parameters
@@ -36,6 +41,15 @@ def get_events_generator(descriptor, event_col, descriptor_col,
         a dict with a 'uid' key or a uid string
     convert_arrays: boolean, optional
         convert 'array' type to numpy.ndarray; True by default
+    fields : iterable, optional
+        Only fetch these data keys from the server; if None (default),
+        all of them.
+    seq_num : tuple, optional
+        ``(start, stop)``; only return Events with ``start <= seq_num <
+        stop``. Either end may be None.
+    time : tuple, optional
+        ``(t0, t1)``; only return Events with ``t0 <= time < t1``, using
+        the (descriptor, time) index. Either end may be None.
 
     Yields
     ------
@@ -47,15 +61,23 @@ def get_events_generator(descriptor, event_col, descriptor_col,
     descriptor = descriptor_given_uid(descriptor_uid, descriptor_col,
                                       descriptor_cache)
     col = event_col
-    ev_cur = col.find({'descriptor': descriptor_uid},
+    projection = None
+    if fields is not None:
+        fields = _column_keys(descriptor, fields)
+        projection = _event_projection(fields)
+    ev_cur = col.find(_event_query(descriptor_uid, seq_num, time),
+                      projection=projection,
                       sort=[('descriptor', pymongo.DESCENDING),
                             ('time', pymongo.ASCENDING)])
 
     data_keys = descriptor['data_keys']
-    external_keys = [k for k in data_keys if 'external' in data_keys[k]]
+    external_keys = [k for k in data_keys if 'external' in data_keys[k]
+                     and (fields is None or k in fields)]
     for ev in ev_cur:
         # ditch the ObjectID
-        del ev['_id']
+        ev.pop('_id', None)
+        ev.setdefault('data', {})
+        ev.setdefault('timestamps', {})
 
         # replace descriptor with the defererenced descriptor
         ev['descriptor'] = descriptor_uid
@@ -72,6 +94,82 @@ def get_events_generator(descriptor, event_col, descriptor_col,
         yield ev
 
 
+def get_events_columns(descriptor, event_col, descriptor_col,
+                       descriptor_cache, run_start_col, run_start_cache,
+                       fields=None, seq_num=None, time=None):
+    """All event data as numpy arrays, one per field
+
+    Only the requested fields are fetched from the server.
+
+    Parameters
+    ----------
+    descriptor : dict or str
+        The EventDescriptor to get the Events for.  Can be either
+        a dict with a 'uid' key or a uid string
+    fields : iterable, optional
+        The data keys to return; if None (default), all data keys in the
+        descriptor.
+    seq_num, time : tuple, optional
+        Half-open ``(start, stop)`` ranges restricting the Events
+        returned; see `get_events_generator`.
+
+    Returns
+    -------
+    columns : dict
+        'data' and 'timestamps' map each field to an array with one entry
+        per event; 'seq_num', 'time' and 'uid' are arrays.
+    """
+    descriptor_uid = doc_or_uid_to_uid(descriptor)
+    descriptor = descriptor_given_uid(descriptor_uid, descriptor_col,
+                                      descriptor_cache)
+    keys = _column_keys(descriptor, fields)
+    ev_cur = event_col.find(_event_query(descriptor_uid, seq_num, time),
+                            projection=_event_projection(keys),
+                            sort=[('descriptor', pymongo.DESCENDING),
+                                  ('time', pymongo.ASCENDING)])
+    return _as_columns(_columns_from_events(ev_cur, keys))
+
+
+def get_event_pages(descriptor, event_col, descriptor_col,
+                    descriptor_cache, run_start_col, run_start_cache,
+                    fields=None, page_size=1000, seq_num=None, time=None):
+    """Event data as numpy arrays, in pages of at most ``page_size`` events
+
+    The server cursor is read in batches of ``page_size``, so only one
+    page is held in memory at a time.
+
+    Parameters
+    ----------
+    descriptor : dict or str
+        The EventDescriptor to get the Events for.  Can be either
+        a dict with a 'uid' key or a uid string
+    fields : iterable, optional
+        The data keys to return; if None (default), all data keys in the
+        descriptor.
+    page_size : int, optional
+        The maximum number of events per page
+    seq_num, time : tuple, optional
+        Half-open ``(start, stop)`` ranges restricting the Events
+        returned; see `get_events_generator`.
+
+    Yields
+    ------
+    columns : dict
+        Same structure as returned by `get_events_columns`.
+    """
+    descriptor_uid = doc_or_uid_to_uid(descriptor)
+    descriptor = descriptor_given_uid(descriptor_uid, descriptor_col,
+                                      descriptor_cache)
+    keys = _column_keys(descriptor, fields)
+    ev_cur = event_col.find(_event_query(descriptor_uid, seq_num, time),
+                            projection=_event_projection(keys),
+                            sort=[('descriptor', pymongo.DESCENDING),
+                                  ('time', pymongo.ASCENDING)])
+    ev_cur.batch_size(page_size)
+    for page in partition_all(page_size, ev_cur):
+        yield _as_columns(_columns_from_events(page, keys))
+
+
 # database INSERTION ###################################################
 
 def bulk_insert_events(event_col, descriptor, events, validate):
@@ -186,7 +284,8 @@ def find_run_stops(stop_col, stop_cache, tz,
     Parameters
     ----------
     run_start : dict or str, optional
-        The RunStart document or uid to get the corresponding run end for
+        The RunStart document or uid to get the corresponding run end for,
+        or a query on the uid such as ``{'$in': [uid1, uid2]}``
     start_time : time-like, optional
         time-like representation of the earliest time that a RunStop
         was created. Valid options are:
@@ -214,8 +313,7 @@ def find_run_stops(stop_col, stop_cache, tz,
     # if trying to find by run_start, there can be only one
     # normalize the input and get the run_start oid
     if run_start:
-        run_start_uid = doc_or_uid_to_uid(run_start)
-        kwargs['run_start'] = run_start_uid
+        kwargs['run_start'] = _run_start_query(run_start)
 
     _format_time(kwargs, tz)
     col = stop_col
@@ -233,7 +331,8 @@ def find_descriptors(descriptor_col, descriptor_cache,
     Parameters
     ----------
     run_start : dict or str, optional
-        The RunStart document or uid to get the corresponding run end for
+        The RunStart document or uid to get the corresponding run end for,
+        or a query on the uid such as ``{'$in': [uid1, uid2]}``
     start_time : time-like, optional
         time-like representation of the earliest time that an EventDescriptor
         was created. Valid options are:
@@ -255,8 +354,7 @@ def find_descriptors(descriptor_col, descriptor_cache,
         The requested EventDescriptor
     """
     if run_start:
-        run_start_uid = doc_or_uid_to_uid(run_start)
-        kwargs['run_start'] = run_start_uid
+        kwargs['run_start'] = _run_start_query(run_start)
 
     _format_time(kwargs, tz)
 
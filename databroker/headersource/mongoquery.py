@@ -1,64 +1,330 @@
 from __future__ import absolute_import
 
+import bisect
 import os
 import json
+import tempfile
 from mongoquery import Query
 from .base import MDSTemplate, MDSROTemplate
-from .core import ASCENDING, DESCENDING
+from .core import ASCENDING, DESCENDING, _project
 from ..utils import ensure_path_exists
 
 
 class JSONCollection(object):
+    """A collection of documents stored in one JSON-lines file
+
+    Each document is appended to the file as one line, and refreshing
+    reads only the lines added since the last refresh. Files in the older
+    format, one JSON array, are still read and are converted the first
+    time something is written to them.
+
+    Queries use the mongo query language (via mongoquery). Equality and
+    ``$in`` queries on the indexed fields and range queries on ``time``
+    are answered from in-memory indexes, and mongoquery is only used for
+    whatever part of the query remains.
+    """
+    _indexed_fields = ('uid', 'run_start', 'scan_id')
+
     def __init__(self, fp):
         self._fp = fp
+        self._reset()
         self.refresh()
 
+    def _reset(self):
+        self._docs = []
+        # what has been read so far: (device, inode), size, mtime
+        self._file_id = None
+        self._offset = 0
+        self._mtime = None
+        # True if the file is a JSON array written by older versions
+        self._legacy = False
+        self._rebuild_indexes()
+
     def refresh(self):
-        if os.path.isfile(self._fp):
-            with open(self._fp, 'r') as f:
-                self._docs= json.load(f)
+        """Read any documents added to the file by other writers"""
+        if not os.path.isfile(self._fp):
+            open(self._fp, 'a').close()
+        st = os.stat(self._fp)
+        if st.st_size == self._offset and st.st_mtime == self._mtime:
+            return
+        if ((st.st_dev, st.st_ino) != self._file_id or
+                st.st_size < self._offset or self._legacy):
+            # replaced (e.g. compacted) or rewritten: start over
+            self._reset()
+        self._file_id = (st.st_dev, st.st_ino)
+        self._mtime = st.st_mtime
+        with open(self._fp, 'rb') as f:
+            if self._offset == 0 and f.read(1) == b'[':
+                f.seek(0)
+                self._legacy = True
+                self._offset = st.st_size
+                for doc in json.loads(f.read().decode('utf-8')):
+                    self._append(doc)
+                return
+            f.seek(self._offset)
+            tail = f.read()
+        # Leave a partly written last line for the next refresh.
+        end = tail.rfind(b'\n') + 1
+        for line in tail[:end].splitlines():
+            if line.strip():
+                self._append(json.loads(line.decode('utf-8')))
+        self._offset += end
+
+    def compact(self):
+        """Rewrite the file with one line per document
+
+        This converts files in the older JSON array format and drops any
+        partly written last line. The new file replaces the old one
+        atomically, and other readers notice and reload it.
+        """
+        self.refresh()
+        # unique, so that concurrent compactions do not write to one file
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self._fp) + '.',
+                                   suffix='.tmp',
+                                   dir=os.path.dirname(self._fp) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(b''.join(_dump_line(doc) for doc in self._docs))
+            # mkstemp makes the file private; keep the original's mode
+            os.chmod(tmp, os.stat(self._fp).st_mode & 0o7777)
+            getattr(os, 'replace', os.rename)(tmp, self._fp)
+        except:
+            os.remove(tmp)
+            raise
+        self.refresh()
+
+    def _write(self, docs):
+        self.refresh()
+        if self._legacy:
+            self.compact()
         else:
-            self._docs = []
-            with open(self._fp, 'w') as f:
-                json.dump([], f)
-
-    def find(self, query, sort=None):
-        match = Query(query).match
-        result = filter(match, self._docs)
-        if sort is None:
-            return result
-        elif len(sort) > 2:
-            raise NotImplementedError("Only one sort key is supported.")
+            # Drop a partly written last line (left by a writer that
+            # crashed) so that the new documents are not glued onto it.
+            with open(self._fp, 'r+b') as f:
+                f.seek(self._offset)
+                tail = f.read()
+                if tail and not tail.endswith(b'\n'):
+                    f.truncate(self._offset + tail.rfind(b'\n') + 1)
+        with open(self._fp, 'ab') as f:
+            f.write(b''.join(_dump_line(doc) for doc in docs))
+        self.refresh()
+
+    def _append(self, doc):
+        self._docs.append(doc)
+        self._index_doc(len(self._docs) - 1, doc)
+
+    def _rebuild_indexes(self):
+        # field -> value -> positions in self._docs
+        self._indexes = {field: {} for field in self._indexed_fields}
+        # fields with values that cannot be indexed, so queries on them
+        # have to be checked by mongoquery
+        self._unindexed = set()
+        # (time, position), sorted
+        self._by_time = []
+        for pos, doc in enumerate(self._docs):
+            self._index_doc(pos, doc)
+
+    def _index_doc(self, pos, doc):
+        for field, index in self._indexes.items():
+            if field not in doc:
+                continue
+            value = doc[field]
+            if _indexable(value):
+                index.setdefault(value, []).append(pos)
+            else:
+                self._unindexed.add(field)
+        t = doc.get('time')
+        if isinstance(t, (int, float)) and not isinstance(t, bool):
+            if not self._by_time or self._by_time[-1] <= (t, pos):
+                self._by_time.append((t, pos))
+            else:
+                bisect.insort(self._by_time, (t, pos))
         else:
+            self._unindexed.add('time')
+
+    def _plan(self, query):
+        """Split a query into candidate positions and a residual query
+
+        Returns ``(positions, residual)`` where positions is a set of
+        positions in ``self._docs``, or None if every document is a
+        candidate.
+        """
+        positions = None
+        residual = {}
+        for field, cond in (query or {}).items():
+            if field == '$and' and isinstance(cond, list):
+                # Searches arrive as {'$and': [kwargs, filters, ...]}:
+                # plan each clause and keep only what is left of them.
+                rest = []
+                for clause in cond:
+                    if not isinstance(clause, dict):
+                        rest.append(clause)
+                        continue
+                    hits, clause_residual = self._plan(clause)
+                    if clause_residual:
+                        rest.append(clause_residual)
+                    if hits is None:
+                        pass
+                    elif positions is None:
+                        positions = hits
+                    else:
+                        positions.intersection_update(hits)
+                if rest:
+                    residual['$and'] = rest
+                continue
+            hits = None
+            if field in self._unindexed:
+                pass
+            elif field in self._indexes:
+                index = self._indexes[field]
+                if _indexable(cond) and cond is not None:
+                    hits = index.get(cond, ())
+                elif (isinstance(cond, dict) and list(cond) == ['$in'] and
+                        all(_indexable(v) and v is not None
+                            for v in cond['$in'])):
+                    hits = [pos for v in cond['$in']
+                            for pos in index.get(v, ())]
+            elif field == 'time':
+                hits = self._time_range(cond)
+            if hits is None:
+                residual[field] = cond
+            elif positions is None:
+                positions = set(hits)
+            else:
+                positions.intersection_update(hits)
+        return positions, residual
+
+    def _time_range(self, cond):
+        "Positions of the documents in a time range, or None"
+        if not isinstance(cond, dict):
+            cond = {'$gte': cond, '$lte': cond}
+        lo, hi = 0, len(self._by_time)
+        for op, t in cond.items():
+            if not isinstance(t, (int, float)) or isinstance(t, bool):
+                return None
+            if op == '$gte':
+                lo = max(lo, bisect.bisect_left(self._by_time, (t, -1)))
+            elif op == '$gt':
+                lo = max(lo, bisect.bisect_right(self._by_time, (t, _INF)))
+            elif op == '$lte':
+                hi = min(hi, bisect.bisect_right(self._by_time, (t, _INF)))
+            elif op == '$lt':
+                hi = min(hi, bisect.bisect_left(self._by_time, (t, -1)))
+            else:
+                return None
+        return [pos for _, pos in self._by_time[lo:hi]]
+
+    def find(self, query, sort=None, projection=None):
+        positions, residual = self._plan(query)
+        if sort is not None:
+            if len(sort) > 2:
+                raise NotImplementedError("Only one sort key is supported.")
             sort, = sort
             # ascending_or_descending is -1 (descending) or 1 (ascending)
             key, ascending_or_descending = sort
             reverse = (ascending_or_descending == DESCENDING)
-            sorted_result = sorted(result, key=lambda x: x[key], reverse=reverse)
-            # Make it a generator so it is the same as the unsorted code path.
-            return (elem for elem in sorted_result)
+        if (sort is not None and key == 'time' and
+                'time' not in self._unindexed):
+            # Walk the time index instead of sorting.
+            order = self._by_time
+            if positions is not None and len(positions) < len(order) // 8:
+                order = sorted((self._docs[pos]['time'], pos)
+                               for pos in positions)
+            elif positions is not None:
+                order = [tp for tp in order if tp[1] in positions]
+            order = reversed(order) if reverse else iter(order)
+            result = (self._docs[pos] for _, pos in order)
+        else:
+            if positions is None:
+                result = self._docs
+            else:
+                result = [self._docs[pos] for pos in sorted(positions)]
+            if sort is not None:
+                result = sorted(result, key=lambda x: x[key],
+                                reverse=reverse)
+        if residual:
+            result = filter(Query(residual).match, result)
+        if projection is not None:
+            return (_project(doc, projection) for doc in result)
+        # Make it a generator so it is the same for every code path.
+        return (elem for elem in result)
+
+    def distinct(self, key, query=None):
+        values = []
+        for doc in self.find(query or {}):
+            if key in doc and doc[key] not in values:
+                values.append(doc[key])
+        return values
 
     def find_one(self, query):
-        match = Query(query).match
-        for doc in self._docs:
-            if match(doc):
-                return doc
-        return None
+        return next(self.find(query), None)
 
     def insert_one(self, doc, fk=None):
         self.refresh()
         if fk is not None:
             if self.find_one({fk: doc[fk]}) is not None:
                 raise RuntimeError('Duplicate {}: {}'.format(fk, doc[fk]))
-        self._docs.append(doc)
-        with open(self._fp, 'w') as f:
-            json.dump(self._docs, f)
+        self._write([doc])
 
     def insert(self, docs):
-        self.refresh()
-        self._docs.extend(docs)
-        with open(self._fp, 'w') as f:
-            json.dump(self._docs, f)
+        self._write(list(docs))
+
+
+_INF = float('inf')
+
+
+def _dump_line(doc):
+    return (json.dumps(doc) + '\n').encode('utf-8')
+
+
+def _indexable(value):
+    # Lists and dicts have mongo semantics (element and sub-document
+    # matching) which a plain dict lookup does not reproduce.
+    if isinstance(value, (list, dict)):
+        return False
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class DescriptorCollection(JSONCollection):
+    """JSONCollection of EventDescriptors, indexed by data key
+
+    Looking up which runs recorded a given data key is answered from an
+    in-memory index (built on first use and kept up to date as
+    descriptors are read) instead of scanning every descriptor.
+    """
+    def _reset(self):
+        self._data_key_index = None
+        super(DescriptorCollection, self)._reset()
+
+    def _append(self, doc):
+        super(DescriptorCollection, self)._append(doc)
+        if self._data_key_index is not None:
+            self._index_data_keys(doc)
+
+    def distinct(self, key, query=None):
+        # fast path for {'data_keys.<key>': {'$exists': True}}
+        if key == 'run_start' and query and len(query) == 1:
+            (path, cond), = query.items()
+            if path.startswith('data_keys.') and cond == {'$exists': True}:
+                data_key = path[len('data_keys.'):]
+                return list(self._index().get(data_key, ()))
+        return super(DescriptorCollection, self).distinct(key, query)
+
+    def _index(self):
+        if self._data_key_index is None:
+            self._data_key_index = {}
+            for doc in self._docs:
+                self._index_data_keys(doc)
+        return self._data_key_index
+
+    def _index_data_keys(self, doc):
+        for data_key in doc['data_keys']:
+            self._data_key_index.setdefault(data_key, set()).add(
+                doc['run_start'])
 
 
 class _CollectionMixin(object):
@@ -102,7 +368,7 @@ class _CollectionMixin(object):
         if self.__descriptor_col is None:
             fp = os.path.join(self.config['directory'],
                               'event_descriptors.json')
-            self.__descriptor_col = JSONCollection(fp)
+            self.__descriptor_col = DescriptorCollection(fp)
         return self.__descriptor_col
 
     @property
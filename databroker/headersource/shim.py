@@ -2,6 +2,7 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 import six  # noqa
 import logging
+from toolz import partition_all
 from ..utils import format_time as _format_time
 
 logger = logging.getLogger(__name__)
@@ -13,10 +14,14 @@ class HeaderSourceShim(object):
     This will presumably be deleted if this API makes it's way back down
     into the implementations
     '''
+    # number of RunStarts whose RunStops are looked up together
+    page_size = 100
+
     def __init__(self, mds):
         self.mds = mds
 
-    def __call__(self, text_search=None, filters=None, **kwargs):
+    def __call__(self, text_search=None, filters=None, data_key=None,
+                 **kwargs):
         if filters is None:
             filters = {}
         else:
@@ -29,8 +34,21 @@ class HeaderSourceShim(object):
             kwargs = dict(kwargs)
             _format_time(kwargs, self.mds.config['timezone'])
             query = {'$and': [kwargs, filters]}
+        if data_key is not None:
+            # Only runs with a descriptor that has this data key.
+            uids = list(self.mds.run_starts_with_data_key(data_key))
+            if not uids:
+                return iter(())
+            # The JSON-backed sources answer this from their uid index.
+            query['$and'].append({'uid': {'$in': uids}})
         starts = self.mds.find_run_starts(**query)
-        return ((s, safe_get_stop(self, s)) for s in starts)
+        return self._with_stops(starts)
+
+    def _with_stops(self, starts):
+        for page in partition_all(self.page_size, starts):
+            stops = bulk_get_stops(self, page)
+            for s in page:
+                yield s, stops.get(s['uid'])
 
     def __getitem__(self, k):
         from ..core import search
@@ -46,6 +64,9 @@ class HeaderSourceShim(object):
     def find_run_starts(self, *args, **kwargs):
         return self.mds.find_run_starts(*args, **kwargs)
 
+    def find_run_stops(self, *args, **kwargs):
+        return self.mds.find_run_stops(*args, **kwargs)
+
     def stop_by_start(self, s):
         return self.mds.stop_by_start(s)
 
@@ -63,3 +84,17 @@ def safe_get_stop(hs, s):
         return hs.stop_by_start(s)
     except hs.NoRunStop:
         return None
+
+
+def bulk_get_stops(hs, starts):
+    """Look up the RunStops of many RunStarts with a single query
+
+    Returns a dict mapping each RunStart uid to its RunStop, omitting runs
+    which have no RunStop.
+    """
+    uids = [s['uid'] for s in starts]
+    stops = {}
+    if uids:
+        for stop in hs.find_run_stops(run_start={'$in': uids}):
+            stops.setdefault(stop['run_start'], stop)
+    return stops
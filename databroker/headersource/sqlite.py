@@ -1,17 +1,43 @@
+import atexit
 import os
+import json
 import sqlite3
+import struct
 import re
-from collections import defaultdict
+import time as ttime
+import weakref
+import six
+import numpy as np
+from collections import defaultdict, OrderedDict
 from contextlib import contextmanager
 from .mongoquery import JSONCollection
+from .mongoquery import DescriptorCollection as _JSONDescriptorCollection
 from .base import MDSTemplate, MDSROTemplate
-from .core import ASCENDING, DESCENDING
+from .core import ASCENDING, DESCENDING, _projected_keys
 from ..utils import ensure_path_exists
 
 LIST_TABLES = "SELECT name FROM sqlite_master WHERE type='table';"
 CREATE_TABLE = "CREATE TABLE %s "
 INSERT = "INSERT INTO ? VALUES "  # the rest is generated by qmarks func below
-SELECT_EVENT_STREAM = "SELECT * FROM %s "
+SELECT_EVENT_COLUMNS = "SELECT %s FROM %s %s ORDER BY time"
+SELECT_EVENTS = "SELECT %s FROM %s %s ORDER BY %s %s"
+CREATE_INDEX = "CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)"
+# number of rows fetched from the database at a time by find
+FETCH_SIZE = 1000
+# column affinity for each JSON-schema dtype in the data_keys. 'number'
+# columns hold both ints and floats and are left untyped: REAL would turn
+# the ints into floats and NUMERIC the integral floats into ints.
+_AFFINITIES = {'integer': 'INTEGER', 'boolean': 'INTEGER', 'string': 'TEXT',
+               'array': 'BLOB'}
+# applied to each connection when writes are batched
+_BATCHED_PRAGMAS = ('PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL')
+# prefixes marking the BLOBs written by encode_value
+_NDARRAY_MAGIC = b'\x93NDA'
+_JSON_MAGIC = b'\x93JSN'
+# what sqlite returns BLOBs as
+_BLOB_TYPES = (bytes, bytearray, type(sqlite3.Binary(b'')))
+# mongo-style range operators supported in event queries
+_RANGE_OPS = {'$gte': '>=', '$gt': '>', '$lte': '<=', '$lt': '<'}
 
 
 @contextmanager
@@ -36,11 +62,91 @@ def cursor(connection):
         c.close()
 
 
+@contextmanager
+def savepoint(connection):
+    """
+    a context manager for a sqlite cursor that does not commit
+
+    The statements are added to the open transaction (beginning one if
+    needed) and all of them are undone if any fails, leaving the earlier
+    statements of the transaction in place.
+
+    Example
+    -------
+    >>> with savepoint(conn) as c:
+    ...     c.executemany(query, rows)
+    """
+    if not connection.in_transaction:
+        # Releasing a savepoint that began the transaction would commit.
+        connection.execute('BEGIN')
+    c = connection.cursor()
+    c.execute('SAVEPOINT batch')
+    try:
+        yield c
+    except:
+        c.execute('ROLLBACK TO batch')
+        raise
+    finally:
+        c.execute('RELEASE batch')
+        c.close()
+
+
 def qmarks(num):
     "Generate string like (?, ?, ?)"
     return '(' + '?, ' * (num - 1) + '?)'
 
 
+def encode_value(value):
+    """Convert a value into something sqlite can store
+
+    Numeric arrays (or lists) become BLOBs holding the raw little-endian
+    data after a short header with the dtype and shape. Other lists become
+    BLOBs holding JSON. Both start with a marker, so `decode_value`
+    recognizes them whatever type was declared for the column.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if not isinstance(value, (list, tuple, np.ndarray)):
+        return value
+    arr = np.asarray(value)
+    if arr.dtype.kind not in 'biufc':
+        return sqlite3.Binary(_JSON_MAGIC +
+                              json.dumps(arr.tolist()).encode('utf-8'))
+    arr = np.ascontiguousarray(arr, dtype=arr.dtype.newbyteorder('<'))
+    dtype = arr.dtype.str.encode('ascii')
+    header = (_NDARRAY_MAGIC + struct.pack('<B', len(dtype)) + dtype +
+              struct.pack('<B%dq' % arr.ndim, arr.ndim, *arr.shape))
+    return sqlite3.Binary(header + arr.tobytes())
+
+
+def decode_value(value):
+    """Read a value stored by `encode_value`
+
+    Arrays are read-only views of ``value``; nothing is copied. Anything
+    not written as a BLOB by `encode_value` is returned unchanged.
+    """
+    if not isinstance(value, _BLOB_TYPES):
+        return value
+    magic = bytes(value[:4])
+    if magic == _JSON_MAGIC:
+        return json.loads(bytes(value[4:]).decode('utf-8'))
+    if magic != _NDARRAY_MAGIC:
+        return value
+    n, = struct.unpack_from('<B', value, 4)
+    dtype = np.dtype(bytes(value[5:5 + n]).decode('ascii'))
+    ndim, = struct.unpack_from('<B', value, 5 + n)
+    shape = struct.unpack_from('<%dq' % ndim, value, 6 + n)
+    offset = 6 + n + 8 * ndim
+    return np.frombuffer(value, dtype=dtype, offset=offset).reshape(shape)
+
+
+def _decode_column(values):
+    "Decode a column of values, skipping the work if none is a BLOB"
+    if any(isinstance(v, _BLOB_TYPES) for v in values):
+        return [decode_value(v) for v in values]
+    return values
+
+
 class RunStartCollection(JSONCollection):
     def __init__(self, event_col, *args, **kwargs):
         self._event_col = event_col
@@ -51,7 +157,7 @@ class RunStartCollection(JSONCollection):
         super(RunStartCollection, self).insert_one(doc, fk='uid')
 
 
-class DescriptorCollection(JSONCollection):
+class DescriptorCollection(_JSONDescriptorCollection):
     def __init__(self, event_col, *args, **kwargs):
         self._event_col = event_col
         super(DescriptorCollection, self).__init__(*args, **kwargs)
@@ -61,40 +167,205 @@ class DescriptorCollection(JSONCollection):
         super(DescriptorCollection, self).insert_one(doc)
 
 
+class RunStopCollection(JSONCollection):
+    def __init__(self, event_col, *args, **kwargs):
+        self._event_col = event_col
+        super(RunStopCollection, self).__init__(*args, **kwargs)
+
+    def insert_one(self, doc, fk=None):
+        # The Events are on disk before the run is marked as complete.
+        self._event_col.flush(doc['run_start'])
+        super(RunStopCollection, self).insert_one(doc, fk=fk)
+
+
+class _ConnectionPool(object):
+    """Open sqlite connections on first use and keep at most ``max_size``
+
+    The least recently used connection is closed when a new one would
+    exceed the limit. Connections that are in use, e.g. by a generator
+    that is still reading from them, are never closed; the pool may grow
+    beyond ``max_size`` until they are released.
+    """
+    def __init__(self, path_func, max_size=64, pragmas=()):
+        self._path_func = path_func
+        self.max_size = max_size
+        self._pragmas = pragmas
+        self._conns = OrderedDict()
+        self._in_use = defaultdict(int)
+
+    def __len__(self):
+        return len(self._conns)
+
+    @contextmanager
+    def connection(self, key):
+        conn = self._conns.pop(key, None)
+        if conn is None:
+            conn = sqlite3.connect(self._path_func(key))
+            # Return rows as objects that support getitem.
+            conn.row_factory = sqlite3.Row
+            for pragma in self._pragmas:
+                conn.execute(pragma)
+        # most recently used last
+        self._conns[key] = conn
+        self._in_use[key] += 1
+        self._evict()
+        try:
+            yield conn
+        finally:
+            self._in_use[key] -= 1
+            if not self._in_use[key]:
+                del self._in_use[key]
+            self._evict()
+
+    def _evict(self):
+        for key in list(self._conns):
+            if len(self._conns) <= self.max_size:
+                break
+            if key not in self._in_use:
+                conn = self._conns.pop(key)
+                # keep any batched writes
+                conn.commit()
+                conn.close()
+
+    def close(self):
+        for conn in self._conns.values():
+            conn.commit()
+            conn.close()
+        self._conns.clear()
+
+
 class EventCollection(object):
-    def __init__(self, dirpath):
-        self._runstarts = {}
+    """The Events of each run, in one sqlite file per run
+
+    Connections to the files are opened on first use and at most
+    ``max_connections`` are kept open. Which run each descriptor belongs
+    to is recorded in an index file in the same directory, so nothing
+    needs to be opened at start-up.
+
+    With ``write_mode='safe'`` (the default) every insert is committed
+    at once. With ``write_mode='batched'`` the files use a write-ahead
+    log with ``synchronous=NORMAL``, and the inserts into each file are
+    committed together once ``flush_count`` Events are waiting or the
+    oldest has waited ``flush_interval`` seconds (checked on the next
+    insert). `flush` commits everything that is waiting; it is called
+    for a run when its RunStop is inserted, and at exit.
+    """
+    INDEX = 'descriptor_runs.json'
+
+    def __init__(self, dirpath, max_connections=64, write_mode='safe',
+                 flush_count=1000, flush_interval=1.0):
+        if write_mode not in ('safe', 'batched'):
+            raise ValueError("write_mode must be 'safe' or 'batched', not "
+                             "{!r}".format(write_mode))
+        self._batched = write_mode == 'batched'
+        self._flush_count = flush_count
+        self._flush_interval = flush_interval
+        # run start uid -> [number of Events waiting, time of the oldest]
+        self._pending = {}
+        self._pid = os.getpid()
         self._descriptors = {}
+        # tables known to have their indexes
+        self._indexed = set()
         self._dirpath = dirpath
+        self._pool = _ConnectionPool(
+            self._path, max_connections,
+            pragmas=_BATCHED_PRAGMAS if self._batched else ())
         self.reconnect()
+        if self._batched:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _path(self, run_start_uid):
+        return os.path.join(self._dirpath, '{}.sqlite'.format(run_start_uid))
 
     def reconnect(self):
+        self._pool.close()
+        self._pending.clear()
+        self._descriptors.clear()
+        self._indexed.clear()
+        fp = os.path.join(self._dirpath, self.INDEX)
+        new_index = not os.path.isfile(fp)
+        self._index = JSONCollection(fp)
+        if new_index:
+            self._index.insert(self._scan())
+
+    def _scan(self):
+        # Rebuild the index of a directory written by older versions by
+        # opening every sqlite file once.
         for fn in os.listdir(self._dirpath):
-            # Cache connections to every sqlite file.
-            match = re.match('([0-9a-z-]+)\.sqlite', fn)
+            match = re.match(r'([0-9a-z-]+)\.sqlite$', fn)
             if match is None:
                 # skip unrecognized file
                 continue
             uid, = match.groups()
-            fp = os.path.join(self._dirpath, fn)
-            conn = sqlite3.connect(fp)
-            # Return rows as objects that support getitem.
-            conn.row_factory = sqlite3.Row
-            self._runstarts[uid] = conn
-
-            # Build a mapping of descriptor uids to run start uids.
-            with cursor(self._runstarts[uid]) as c:
-                c.execute(LIST_TABLES)
-                for descriptor_uid in c.fetchall():
-                    duid = descriptor_uid['name'][5:].replace('_', '-')
-                    self._descriptors[duid] = uid
+            conn = sqlite3.connect(os.path.join(self._dirpath, fn))
+            try:
+                names = conn.execute(LIST_TABLES).fetchall()
+            finally:
+                conn.close()
+            for name, in names:
+                duid = name[5:].replace('_', '-')
+                yield {'uid': duid, 'run_start': uid}
+
+    def _run_start_uid(self, desc_uid):
+        try:
+            return self._descriptors[desc_uid]
+        except KeyError:
+            pass
+        # maybe added by another process
+        self._index.refresh()
+        doc = self._index.find_one({'uid': desc_uid})
+        if doc is None:
+            raise KeyError(desc_uid)
+        self._descriptors[desc_uid] = doc['run_start']
+        return doc['run_start']
+
+    def _connection(self, desc_uid):
+        return self._pool.connection(self._run_start_uid(desc_uid))
+
+    def _write(self, desc_uid, statement, values, many=False):
+        run_start_uid = self._run_start_uid(desc_uid)
+        with self._pool.connection(run_start_uid) as conn:
+            if not self._batched:
+                with cursor(conn) as c:
+                    if many:
+                        c.executemany(statement, values)
+                    else:
+                        c.execute(statement, values)
+                return
+            with savepoint(conn) as c:
+                if many:
+                    c.executemany(statement, values)
+                else:
+                    c.execute(statement, values)
+            pending = self._pending.setdefault(run_start_uid,
+                                               [0, ttime.time()])
+            pending[0] += len(values) if many else 1
+            if (pending[0] >= self._flush_count or
+                    ttime.time() - pending[1] >= self._flush_interval):
+                conn.commit()
+                del self._pending[run_start_uid]
+
+    def flush(self, run_start_uid=None):
+        """Commit the Events waiting to be written
+
+        Parameters
+        ----------
+        run_start_uid : str, optional
+            Only commit the Events of this run. By default, all are.
+        """
+        if run_start_uid is None:
+            keys = list(self._pending)
+        else:
+            keys = [run_start_uid]
+        for key in keys:
+            if self._pending.pop(key, None) is not None:
+                with self._pool.connection(key) as conn:
+                    conn.commit()
 
     def new_runstart(self, doc):
-        uid = doc['uid']
-        fp = os.path.join(self._dirpath, '{}.sqlite'.format(uid))
-        conn = sqlite3.connect(fp)
-        conn.row_factory = sqlite3.Row
-        self._runstarts[uid] = conn
+        # creates the file
+        with self._pool.connection(doc['uid']):
+            pass
 
     @classmethod
     def columns(cls, keys):
@@ -105,43 +376,189 @@ class EventCollection(object):
                         ['timestamps_' + key for key in safe_keys])
         return columns
 
+    @classmethod
+    def column_types(cls, data_keys):
+        """The type affinity of each of the columns for these data_keys
+
+        Arrays stored in the Events are BLOBs (see `encode_value`).
+        Columns of externally stored data, which hold datum ids, and of
+        unknown dtypes are left untyped.
+        """
+        types = []
+        for key in sorted(data_keys):
+            data_key = data_keys[key]
+            if 'external' in data_key:
+                types.append('')
+            else:
+                types.append(_AFFINITIES.get(data_key.get('dtype'), ''))
+        return tuple(['TEXT', 'INTEGER', 'REAL'] + types +
+                     ['REAL'] * len(types))
+
     def new_descriptor(self, doc):
         uid = doc['uid']
         table_name = 'desc_' + uid.replace('-', '_')
         run_start_uid = doc['run_start']
         columns = self.columns(doc['data_keys'])
-        with cursor(self._runstarts[run_start_uid]) as c:
-            c.execute(CREATE_TABLE % table_name
-                      + '(' + ','.join(columns) + ')')
+        types = self.column_types(doc['data_keys'])
+        definitions = [('%s %s' % (column, type_)).strip()
+                       for column, type_ in zip(columns, types)]
+        with self._pool.connection(run_start_uid) as conn:
+            with cursor(conn) as c:
+                c.execute(CREATE_TABLE % table_name
+                          + '(' + ','.join(definitions) + ')')
+            self._create_indexes(conn, table_name)
+        self._index.insert_one({'uid': uid, 'run_start': run_start_uid})
         self._descriptors[uid] = run_start_uid
 
-    def find(self, query, sort=None):
-        if list(query.keys()) != ['descriptor']:
+    def _create_indexes(self, conn, table_name):
+        if table_name in self._indexed:
+            return
+        try:
+            with cursor(conn) as c:
+                for column in ('time', 'seq_num'):
+                    c.execute(CREATE_INDEX % (table_name, column,
+                                              table_name, column))
+        except sqlite3.OperationalError:
+            # e.g. a read-only file written by an older version; the
+            # queries still work, only more slowly
+            pass
+        self._indexed.add(table_name)
+
+    @staticmethod
+    def _where(query):
+        """Translate an event query into a WHERE clause and its parameters
+
+        Only the descriptor uid and ranges (``$gte``, ``$gt``, ``$lte``,
+        ``$lt``) on ``seq_num`` and ``time`` are supported.
+        """
+        if 'descriptor' not in query or not (set(query) <=
+                                             {'descriptor', 'seq_num',
+                                              'time'}):
             raise NotImplementedError("Only queries based on descriptor uid "
-                                      "are supported.")
+                                      "and ranges of seq_num or time are "
+                                      "supported.")
+        clauses = []
+        params = []
+        for key in ('seq_num', 'time'):
+            for op, value in sorted(query.get(key, {}).items()):
+                clauses.append('%s %s ?' % (key, _RANGE_OPS[op]))
+                params.append(value)
+        where = ''
+        if clauses:
+            where = 'WHERE ' + ' AND '.join(clauses)
+        return where, params
+
+    def find(self, query, sort=None, projection=None):
+        where, params = self._where(query)
+        order = 'time', 'ASC'
+        if sort is not None:
+            (key, direction), = sort
+            if key not in ('time', 'seq_num'):
+                raise NotImplementedError("Events can only be sorted by time "
+                                          "or seq_num.")
+            order = key, ('DESC' if direction == DESCENDING else 'ASC')
         desc_uid = query['descriptor']
         table_name = 'desc_' + desc_uid.replace('-', '_')
-        with cursor(self._runstarts[self._descriptors[desc_uid]]) as c:
-            c.execute(SELECT_EVENT_STREAM % table_name)
-            raw = c.fetchall()
-        rows_as_dicts = [dict(row) for row in raw]
-        events = []
-        for row in rows_as_dicts:
-            event = {}
-            event['uid'] = row.pop('uid')
-            event['seq_num'] = row.pop('seq_num')
-            event['time'] = row.pop('time')
-            event['data'] = {}
-            event['timestamps'] = {}
-            for k, v in row.items():
-                if k.startswith('data_'):
-                    new_key = k[len('data_'):]
-                    event['data'][new_key] = v
-                else:
-                    new_key = k[len('timestamps_'):]
-                    event['timestamps'][new_key] = v
-            events.append(event)
-        return (ev for ev in events)
+        if projection is None:
+            selection = '*'
+            names = {}
+        else:
+            keys = _projected_keys(projection)
+            columns = self.columns(keys)
+            selection = ','.join(columns)
+            names = {'data_' + key.replace('-', '_'): key for key in keys}
+        statement = SELECT_EVENTS % ((selection, table_name, where) + order)
+        return self._stream_events(self._connection(desc_uid), table_name,
+                                   statement, params, names)
+
+    def _stream_events(self, connection, table_name, statement, params,
+                       names):
+        with connection as conn:
+            self._create_indexes(conn, table_name)
+            with cursor(conn) as c:
+                # plain tuples are much cheaper to build than sqlite3.Row
+                c.row_factory = None
+                c.execute(statement, params)
+                # Work out once where each column goes.
+                data = []
+                timestamps = []
+                for i, description in enumerate(c.description):
+                    column = description[0]
+                    if column.startswith('data_'):
+                        data.append((names.get(column, column[5:]), i))
+                    elif column.startswith('timestamps_'):
+                        safe_key = column[len('timestamps_'):]
+                        timestamps.append(
+                            (names.get('data_' + safe_key, safe_key), i))
+                while True:
+                    rows = c.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    for row in rows:
+                        # Arrays are recognized by their values, so they
+                        # are read back whatever the column's type.
+                        event = {'uid': row[0],
+                                 'seq_num': row[1],
+                                 'time': row[2],
+                                 'data': {k: decode_value(row[i])
+                                          for k, i in data},
+                                 'timestamps': {k: row[i]
+                                                for k, i in timestamps}}
+                        yield event
+
+    def _select_columns(self, query, keys):
+        "Build the SELECT statement and its parameters for find_columns"
+        where, params = self._where(query)
+        desc_uid = query['descriptor']
+        table_name = 'desc_' + desc_uid.replace('-', '_')
+        safe_keys = [key.replace('-', '_') for key in keys]
+        columns = (['uid', 'seq_num', 'time'] +
+                   ['data_' + key for key in safe_keys] +
+                   ['timestamps_' + key for key in safe_keys])
+        statement = SELECT_EVENT_COLUMNS % (','.join(columns), table_name,
+                                            where)
+        return self._connection(desc_uid), table_name, statement, params
+
+    @staticmethod
+    def _transpose_rows(rows, keys):
+        n = len(keys)
+        if rows:
+            transposed = list(zip(*rows))
+        else:
+            transposed = [()] * (3 + 2 * n)
+        data = {key: _decode_column(values)
+                for key, values in zip(keys, transposed[3:3 + n])}
+        return {'uid': transposed[0],
+                'seq_num': transposed[1],
+                'time': transposed[2],
+                'data': data,
+                'timestamps': dict(zip(keys, transposed[3 + n:]))}
+
+    def find_columns(self, query, keys):
+        (connection, table_name,
+         statement, params) = self._select_columns(query, keys)
+        with connection as conn:
+            self._create_indexes(conn, table_name)
+            with cursor(conn) as c:
+                # plain tuples are much cheaper to build than sqlite3.Row
+                c.row_factory = None
+                c.execute(statement, params)
+                raw = c.fetchall()
+        return self._transpose_rows(raw, keys)
+
+    def find_column_pages(self, query, keys, page_size):
+        (connection, table_name,
+         statement, params) = self._select_columns(query, keys)
+        with connection as conn:
+            self._create_indexes(conn, table_name)
+            with cursor(conn) as c:
+                c.row_factory = None
+                c.execute(statement, params)
+                while True:
+                    rows = c.fetchmany(page_size)
+                    if not rows:
+                        break
+                    yield self._transpose_rows(rows, keys)
 
     def find_one(self, query):
         # not used on event_col
@@ -154,12 +571,12 @@ class EventCollection(object):
         table_name = 'desc_' + desc_uid.replace('-', '_')
 
         values = tuple([doc['uid']] + [doc['seq_num']] + [doc['time']] +
-                        [doc['data'][k] for k in ordered_keys] +
+                        [encode_value(doc['data'][k]) for k in ordered_keys] +
                         [doc['timestamps'][k] for k in ordered_keys])
-        with cursor(self._runstarts[self._descriptors[desc_uid]]) as c:
-            c.execute("INSERT INTO %s (%s) VALUES %s " %
-                      (table_name, ','.join(columns), qmarks(len(columns))),
-                      values)
+        self._write(desc_uid,
+                    "INSERT INTO %s (%s) VALUES %s " %
+                    (table_name, ','.join(columns), qmarks(len(columns))),
+                    values)
 
     def insert(self, docs):
         values = defaultdict(list)
@@ -173,19 +590,31 @@ class EventCollection(object):
                 columns[uid] = self.columns(doc['data'])
 
             value = tuple([doc['uid']] + [doc['seq_num']] + [doc['time']] +
-                          [doc['data'][k] for k in ordered_keys[uid]] +
+                          [encode_value(doc['data'][k])
+                           for k in ordered_keys[uid]] +
                           [doc['timestamps'][k] for k in ordered_keys[uid]])
             values[uid].append(value)
         for desc_uid in values:
             table_name = 'desc_' + desc_uid.replace('-', '_')
             cols = columns[desc_uid]
-            with cursor(self._runstarts[self._descriptors[desc_uid]]) as c:
-                c.executemany("INSERT INTO %s (%s) VALUES %s" %
-                              (table_name, ','.join(cols), qmarks(len(cols))),
-                              values[desc_uid])
+            self._write(desc_uid,
+                        "INSERT INTO %s (%s) VALUES %s" %
+                        (table_name, ','.join(cols), qmarks(len(cols))),
+                        values[desc_uid], many=True)
+
+
+def _flush_at_exit(ref):
+    event_col = ref()
+    # Events written by the process that forked this one are not this
+    # process's to commit.
+    if event_col is not None and event_col._pid == os.getpid():
+        event_col.flush()
 
 
 class _CollectionMixin(object):
+    # id of the process that opened the connections
+    _pid = None
+
     def __init__(self, *args, **kwargs):
         self._config = None
         super(_CollectionMixin, self).__init__(*args, **kwargs)
@@ -202,13 +631,31 @@ class _CollectionMixin(object):
     @config.setter
     def config(self, val):
         self._config = val
+        self._reset_connections()
+
+    def _reset_connections(self):
+        "Drop the collections; they are reopened lazily."
         self.__event_col = None
         self.__descriptor_col = None
         self.__runstart_col = None
         self.__runstop_col = None
 
+    def _check_pid(self):
+        # sqlite connections must not be shared across a fork; drop the
+        # collections so that they reconnect lazily.
+        pid = os.getpid()
+        if self._pid != pid:
+            if self._pid is not None:
+                self._reset_connections()
+            self._pid = pid
+
+    def flush(self):
+        """Commit any Events waiting to be written (see 'write_mode')"""
+        self._event_col.flush()
+
     @property
     def _runstart_col(self):
+        self._check_pid()
         if self.__runstart_col is None:
             fp = os.path.join(self.config['directory'], 'run_starts.json')
             self.__runstart_col = RunStartCollection(self._event_col, fp)
@@ -216,14 +663,15 @@ class _CollectionMixin(object):
 
     @property
     def _runstop_col(self):
+        self._check_pid()
         if self.__runstop_col is None:
             fp = os.path.join(self.config['directory'], 'run_stops.json')
-            self.__runstop_col = JSONCollection(fp)
+            self.__runstop_col = RunStopCollection(self._event_col, fp)
         return self.__runstop_col
 
     @property
     def _descriptor_col(self):
-        self._event_col
+        self._check_pid()
         if self.__descriptor_col is None:
             fp = os.path.join(self.config['directory'],
                               'event_descriptors.json')
@@ -232,8 +680,15 @@ class _CollectionMixin(object):
 
     @property
     def _event_col(self):
+        self._check_pid()
         if self.__event_col is None:
-            self.__event_col = EventCollection(self.config['directory'])
+            config = self.config
+            self.__event_col = EventCollection(
+                config['directory'],
+                max_connections=config.get('max_connections', 64),
+                write_mode=config.get('write_mode', 'safe'),
+                flush_count=config.get('flush_count', 1000),
+                flush_interval=config.get('flush_interval', 1.0))
         return self.__event_col
 
 
@@ -10,14 +10,18 @@ import time as ttime
 import uuid
 from datetime import datetime, date, timedelta
 import itertools
+import pickle
 from databroker import (wrap_in_doct, wrap_in_deprecated_doct,
-                        DeprecatedDoct, Broker, temp_config)
+                        DeprecatedDoct, ReadOnlyDoc, wrap_in_read_only_doc,
+                        Broker, temp_config)
+from databroker._core import _worker_brokers
 import doct
 import copy
 
 import pytest
 import six
 import numpy as np
+from numpy.testing import assert_array_equal
 
 if sys.version_info >= (3, 0):
     from bluesky.examples import (det, det1, det2, Reader, ReaderWithRegistry,
@@ -67,6 +71,24 @@ def test_uid_list_multiple_headers(db, RE):
     assert uids == [h['start']['uid'] for h in headers]
 
 
+@py3
+def test_mixed_key_list(db, RE):
+    RE.subscribe(db.insert)
+    uids = []
+    for scan_id in (101, 102, 103):
+        uid, = RE(count([det]), scan_id=scan_id)
+        uids.append(uid)
+
+    headers = db[[uids[2], 101, uids[1][:8], -1, uids[0]]]
+    assert [h['start']['uid'] for h in headers] == [
+        uids[2], uids[0], uids[1], uids[2], uids[0]]
+    assert all(h['stop']['run_start'] == h['start']['uid']
+               for h in headers)
+
+    with pytest.raises(ValueError):
+        db[[uids[0], str(uuid.uuid4())]]
+
+
 @py3
 def test_no_descriptors(db, RE):
     RE.subscribe(db.insert)
@@ -654,6 +676,43 @@ def test_export(broker_factory, RE):
     image2, = db2.get_images(db2[uid], 'image')
 
 
+@py3
+def test_images_get_frames(broker_factory, RE):
+    from databroker._core import Images
+    db = broker_factory()
+    RE.subscribe(db.insert)
+    db.reg.register_handler('RWFS_NPY', ReaderWithRegistryHandler)
+    counter = itertools.count()
+    detfs = ReaderWithRegistry('detfs',
+                               {'image': lambda: np.full((5, 5),
+                                                         next(counter))},
+                               reg=db.reg, save_path=tempfile.mkdtemp())
+    uid, = RE(count([detfs], num=5))
+    h = db[uid]
+    list(db.get_events(h, fill=True))
+    shared = list(db.reg._handler_cache)
+    assert shared
+
+    instances = []
+
+    class CountingHandler(ReaderWithRegistryHandler):
+        def __init__(self, *args, **kwargs):
+            instances.append(self)
+            super(CountingHandler, self).__init__(*args, **kwargs)
+
+    ims = Images(mds=db.mds, reg=db.reg, es=db.event_sources[0], headers=h,
+                 name='image', handler_override=CountingHandler)
+    frames = ims.get_frames(slice(1, 4))
+    assert frames.shape == (3, 5, 5)
+    for j, i in enumerate(range(1, 4)):
+        assert_array_equal(frames[j], ims[i])
+    assert_array_equal(ims.get_frames([4, 0]), np.stack([ims[4], ims[0]]))
+    # The override keeps its handlers open between frames and leaves the
+    # shared handlers alone.
+    assert len(instances) == len(set(ims._handler_cache))
+    assert list(db.reg._handler_cache) == shared
+
+
 @py3
 def test_export_noroot(broker_factory, RE):
     from bluesky.utils import short_uid
@@ -694,6 +753,48 @@ def test_export_noroot(broker_factory, RE):
         assert np.array_equal(im1, im2)
 
 
+@py3
+def test_export_batches_and_resume(broker_factory, RE):
+    db1 = broker_factory()
+    db2 = broker_factory()
+    RE.subscribe(db1.mds.insert)
+    if not hasattr(db1.fs, 'copy_files'):
+        raise pytest.skip("This Registry does not implement copy_files.")
+
+    dir1 = tempfile.mkdtemp()
+    dir2 = tempfile.mkdtemp()
+    detfs = ReaderWithRegistry('detfs', {'image': lambda: np.ones((5, 5))},
+                               reg=db1.fs, save_path=dir1)
+    uids = [RE(count([det, detfs], num=5))[0] for _ in range(3)]
+    db1.fs.register_handler('RWFS_NPY', ReaderWithRegistryHandler)
+    db2.fs.register_handler('RWFS_NPY', ReaderWithRegistryHandler)
+
+    # Simulate an export interrupted part-way through the second run.
+    db1.export(db1[uids[0]], db2, new_root=dir2, batch_size=2)
+    h = db1[uids[1]]
+    db2.mds.insert_run_start(**dict(h['start']))
+    db2.mds.insert_descriptor(**dict(h.descriptors[0]))
+    first, = itertools.islice(db1.get_events(h), 1)
+    db2.mds.bulk_insert_events(first['descriptor'], [first])
+
+    calls = []
+    headers = [db1[uid] for uid in uids]
+    file_pairs = db1.export(headers, db2, new_root=dir2, batch_size=2,
+                            resume=True,
+                            progress=lambda *args: calls.append(args[:2]))
+    assert calls == [(1, 3), (2, 3), (3, 3)]
+    # only the files of the runs that were not finished are copied
+    assert len(file_pairs) == 2
+    assert set(os.path.dirname(f) for _, f in file_pairs) == {dir2}
+    for uid in uids:
+        assert db2[uid] == db1[uid]
+        events1 = list(db1.get_events(db1[uid], fill=True))
+        events2 = list(db2.get_events(db2[uid], fill=True))
+        assert [ev['uid'] for ev in events2] == [ev['uid'] for ev in events1]
+        for ev1, ev2 in zip(events1, events2):
+            assert_array_equal(ev1['data']['image'], ev2['data']['image'])
+
+
 @py3
 def test_export_size_smoke(broker_factory, RE):
 
@@ -714,6 +815,323 @@ def test_export_size_smoke(broker_factory, RE):
     assert size > 0.
 
 
+@py3
+def test_prefetch(db, RE):
+    RE.subscribe(db.insert)
+    counter = itertools.count()
+    detfs = ReaderWithRegistry(
+        'detfs', {'image': lambda: np.ones((5, 5)) * next(counter)},
+        reg=db.reg, save_path=tempfile.mkdtemp())
+    uid, = RE(count([detfs], num=7))
+    db.reg.register_handler('RWFS_NPY', ReaderWithRegistryHandler)
+    h = db[uid]
+
+    expected = list(h.data('image'))
+    actual = list(h.data('image', prefetch=3))
+    assert len(actual) == len(expected) == 7
+    for a, e in zip(actual, expected):
+        assert_array_equal(a, e)
+
+    events = list(h.events(fill=True, prefetch=2))
+    assert [ev['seq_num'] for ev in events] == list(range(1, 8))
+    assert all(ev['filled']['image'] for ev in events)
+
+    # closing the generator part-way through shuts the pool down cleanly
+    gen = h.data('image', prefetch=2)
+    assert_array_equal(next(gen), expected[0])
+    gen.close()
+
+
+@py3
+def test_seq_num_and_time_ranges(db, RE):
+    RE.subscribe(db.insert)
+    uid, = RE(count([det], num=10))
+    h = db[uid]
+    events = list(h.events())
+
+    assert [ev['seq_num'] for ev in h.events(seq_num=(3, 6))] == [3, 4, 5]
+    assert list(h.table(seq_num=(8, None)).index) == [8, 9, 10]
+    assert len(list(h.data('det', seq_num=(None, 3)))) == 2
+
+    t0, t1 = events[2]['time'], events[5]['time']
+    assert [ev['seq_num'] for ev in h.events(time=(t0, t1))] == [3, 4, 5]
+    assert list(h.table(time=(t0, t1)).index) == [3, 4, 5]
+
+
+@py3
+def test_event_pages(db, RE):
+    RE.subscribe(db.insert)
+    uid, = RE(count([det], num=11))
+    h = db[uid]
+
+    pages = list(h.event_pages(page_size=4))
+    assert [len(p['seq_num']) for p in pages] == [4, 4, 3]
+    assert list(np.concatenate([p['seq_num'] for p in pages])) == \
+        list(range(1, 12))
+    table = h.table()
+    assert list(np.concatenate([p['data']['det'] for p in pages])) == \
+        list(table['det'])
+    assert all(p['descriptor'] == h.descriptors[0]['uid'] for p in pages)
+
+    dfs = list(h.event_pages(fields=['det'], page_size=4, as_dataframe=True))
+    assert [len(df) for df in dfs] == [4, 4, 3]
+    assert list(dfs[0].columns) == ['time', 'det']
+    assert list(dfs[1].index) == [5, 6, 7, 8]
+
+    assert list(h.event_pages(stream_name='not-a-stream')) == []
+
+
+@py3
+def test_header_array(db, RE):
+    RE.subscribe(db.insert)
+    db.reg.register_handler('RWFS_NPY', ReaderWithRegistryHandler)
+    counter = itertools.count()
+    detfs = ReaderWithRegistry(
+        'detfs', {'image': lambda: (np.arange(20.).reshape(4, 5) +
+                                    100 * next(counter))},
+        reg=db.reg, save_path=tempfile.mkdtemp())
+    uid, = RE(count([detfs, det], num=6))
+    h = db[uid]
+    expected = np.stack(list(h.data('image')))
+
+    arr = h.array('image')
+    assert arr.shape == (6, 4, 5)
+    assert len(arr) == 6
+    assert arr.dtype == expected.dtype
+    assert_array_equal(arr[1:4, :, 2:5], expected[1:4, :, 2:5])
+    assert_array_equal(arr[-1, 2], expected[-1, 2])
+    assert_array_equal(arr[[5, 0], ::-1, 1:5:2], expected[[5, 0], ::-1, 1:5:2])
+    assert_array_equal(arr[..., 3], expected[..., 3])
+    assert_array_equal(np.asarray(arr), expected)
+
+    # Cached regions are not read again.
+    db.reg.bulk_retrieve = None
+    assert_array_equal(arr[1:4, :, 2:5], expected[1:4, :, 2:5])
+
+    # Fields stored in the Events are served from memory.
+    scalars = h.array('det')
+    assert scalars.shape == (6,)
+    assert_array_equal(scalars[::2], np.asarray(h.table()['det'])[::2])
+
+    with pytest.raises(IndexError):
+        arr[6]
+    with pytest.raises(IndexError):
+        arr[0, [1, 2]]
+    with pytest.raises(ValueError):
+        h.array('not-a-field')
+
+
+def test_header_array_ad_hdf5(db, tmpdir):
+    import h5py
+    from databroker.assets.handlers import AreaDetectorHDF5Handler
+    db.reg.register_handler('AD_HDF5', AreaDetectorHDF5Handler,
+                            overwrite=True)
+    # two frames per point, so each datum has shape (2, 3, 4)
+    frames = np.arange(6 * 2 * 3 * 4.).reshape(6 * 2, 3, 4)
+    fn = str(tmpdir.join('ad.h5'))
+    with h5py.File(fn, 'w') as f:
+        f.create_dataset('/entry/data/data', data=frames)
+    res = db.reg.insert_resource('AD_HDF5', fn, {'frame_per_point': 2})
+
+    start = {'uid': str(uuid.uuid4()), 'time': ttime.time()}
+    desc = {'uid': str(uuid.uuid4()), 'run_start': start['uid'],
+            'time': ttime.time(), 'name': 'primary',
+            'data_keys': {'img': {'source': 'img', 'dtype': 'array',
+                                  'shape': [2, 3, 4],
+                                  'external': 'FILESTORE:'}}}
+    db.insert('start', start)
+    db.insert('descriptor', desc)
+    for i in range(6):
+        datum_id = str(uuid.uuid4())
+        db.reg.insert_datum(res, datum_id, {'point_number': i})
+        db.insert('event', {'uid': str(uuid.uuid4()),
+                            'descriptor': desc['uid'], 'seq_num': i + 1,
+                            'time': ttime.time(), 'data': {'img': datum_id},
+                            'timestamps': {'img': ttime.time()},
+                            'filled': {'img': False}})
+    db.insert('stop', {'uid': str(uuid.uuid4()), 'run_start': start['uid'],
+                       'time': ttime.time(), 'exit_status': 'success'})
+
+    expected = frames.reshape(6, 2, 3, 4)
+    arr = db[start['uid']].array('img')
+    assert arr.shape == (6, 2, 3, 4)
+    assert_array_equal(arr[1:4, :, 1:3, ::2], expected[1:4, :, 1:3, ::2])
+    assert_array_equal(arr[[5, 0], 1, 2], expected[[5, 0], 1, 2])
+    assert_array_equal(np.asarray(arr), expected)
+
+
+@py3
+def test_column_cache(RE, tmpdir):
+    config = temp_config()
+    config['column_cache'] = {'directory': str(tmpdir)}
+    db = Broker.from_config(config)
+    RE.subscribe(db.insert)
+    uid, = RE(count([det1, det2], num=5))
+    h = db[uid]
+    desc_uid = h.descriptors[0]['uid']
+
+    expected = h.table()
+    assert os.path.exists(os.path.join(str(tmpdir), desc_uid + '.npz'))
+
+    # Completed runs are now served without asking the metadatastore.
+    def fail(*args, **kwargs):
+        raise AssertionError("should have been served from the cache")
+
+    db.hs.mds.get_events_columns = fail
+    assert expected.equals(h.table())
+    assert list(h.table(fields=['det1'], seq_num=(2, 4)).index) == [2, 3]
+    del db.hs.mds.get_events_columns
+
+    # LRU eviction keeps the cache within its budget.
+    cache = db.event_sources[0].column_cache
+    size = os.path.getsize(os.path.join(str(tmpdir), desc_uid + '.npz'))
+    cache.max_bytes = size
+    uid2, = RE(count([det1, det2], num=5))
+    db[uid2].table()
+    assert cache.get(desc_uid) is None
+    assert cache.get(db[uid2].descriptors[0]['uid']) is not None
+
+    # Runs that cannot be cached are read with the selection pushed down.
+    cache.max_bytes = 1
+    uid3, = RE(count([det1, det2], num=5))
+    h3 = db[uid3]
+    expected = h3.table()
+    assert h3.descriptors[0]['uid'] in cache.uncacheable
+    requested = []
+    get_events_columns = db.hs.mds.get_events_columns
+
+    def spy(descriptor, **kwargs):
+        requested.append(kwargs.get('fields'))
+        return get_events_columns(descriptor, **kwargs)
+
+    db.hs.mds.get_events_columns = spy
+    assert expected[['det1']].equals(h3.table(fields=['det1'])[['det1']])
+    assert requested and 'det2' not in requested[0]
+
+
+def _count_events(docs):
+    return sum(1 for name, doc in docs if name == 'event')
+
+
+@py3
+def test_map(RE):
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    db = Broker.from_config(temp_config())
+    RE.subscribe(db.insert)
+    uids = [RE(count([det], num=n))[0] for n in (3, 1, 4)]
+    headers = [db[uid] for uid in uids]
+
+    assert db.map(headers, _count_events) == [3, 1, 4]
+    assert db.map(headers[0], _count_events) == [3]
+    with ThreadPoolExecutor(2) as executor:
+        assert db.map(headers, _count_events, executor=executor) == [3, 1, 4]
+        # the Brokers rebuilt for the call are closed when it returns
+        assert not _worker_brokers
+        assert db.map(headers, _count_events, executor=executor) == [3, 1, 4]
+    with ProcessPoolExecutor(2) as executor:
+        assert db.map(headers, _count_events, executor=executor) == [3, 1, 4]
+
+
+@py3
+def test_map_without_config(db, RE):
+    from concurrent.futures import ThreadPoolExecutor
+    RE.subscribe(db.insert)
+    uids = [RE(count([det], num=n))[0] for n in (2, 5)]
+    with ThreadPoolExecutor(2) as executor:
+        assert db.map([db[uid] for uid in uids], _count_events,
+                      executor=executor, fields=['det']) == [2, 5]
+
+
+@py3
+def test_pickle(RE):
+    db = Broker.from_config(temp_config())
+    RE.subscribe(db.insert)
+    uid, = RE(count([det], num=3))
+    db.add_filter(plan_name='count')
+    h = db[uid]
+    h.descriptors  # populate the cache
+
+    db2 = pickle.loads(pickle.dumps(db))
+    assert db2.filters == db.filters
+    assert db2.prepare_hook is db.prepare_hook
+    assert db2[uid].table().equals(h.table())
+
+    h2 = pickle.loads(pickle.dumps(h))
+    assert h2 == h
+    assert h2._cache['desc'] == h._cache['desc']
+    assert h2.descriptors == h.descriptors
+    assert h2.table().equals(h.table())
+
+    # Headers pickled together share one rebuilt Broker.
+    h3, h4 = pickle.loads(pickle.dumps([h, h]))
+    assert h3.db is h4.db
+
+
+def _insert_interleaved_run(db, t0):
+    # Two streams whose events alternate in time.
+    start = {'uid': str(uuid.uuid4()), 'time': t0, 'scan_id': 1}
+    db.insert('start', start)
+    data_keys = {'x': {'dtype': 'number', 'source': 'x', 'shape': []}}
+    descs = []
+    for name, offset in (('primary', 1), ('baseline', 2)):
+        desc = {'uid': str(uuid.uuid4()), 'time': t0 + offset * 0.1,
+                'run_start': start['uid'], 'name': name,
+                'data_keys': data_keys}
+        db.insert('descriptor', desc)
+        descs.append(desc)
+    for i in range(6):
+        desc = descs[i % 2]
+        db.insert('event', {'uid': str(uuid.uuid4()), 'seq_num': i // 2 + 1,
+                            'time': t0 + 1 + i, 'descriptor': desc['uid'],
+                            'data': {'x': i}, 'timestamps': {'x': t0 + i}})
+    db.insert('stop', {'uid': str(uuid.uuid4()), 'time': t0 + 10,
+                       'run_start': start['uid'], 'exit_status': 'success'})
+    return start['uid']
+
+
+def test_time_ordered_documents(db):
+    t0 = ttime.time()
+    h = db[_insert_interleaved_run(db, t0)]
+
+    names = [name for name, _ in h.documents()]
+    assert names == (['start', 'descriptor'] + ['event'] * 3 +
+                     ['descriptor'] + ['event'] * 3 + ['stop'])
+
+    docs = list(h.documents(ordered='time'))
+    assert [name for name, _ in docs] == (['start'] + ['descriptor'] * 2 +
+                                          ['event'] * 6 + ['stop'])
+    assert [doc['data']['x'] for name, doc in docs
+            if name == 'event'] == list(range(6))
+
+    # merged across headers, too
+    h2 = db[_insert_interleaved_run(db, t0 + 0.5)]
+    docs = list(db.restream([h, h2], ordered='time'))
+    times = [doc['time'] for _, doc in docs]
+    assert times == sorted(times)
+    assert len(docs) == 2 * 10
+
+    with pytest.raises(ValueError):
+        list(db.get_documents(h, ordered='seq_num'))
+
+
+@py3
+def test_results_prefetch_descriptors(db_empty, RE):
+    db = db_empty
+    RE.subscribe(db.insert)
+    uids = [RE(count([det]))[0] for _ in range(5)]
+
+    headers = list(db())
+    assert [h['start']['uid'] for h in headers] == uids[::-1]
+    for h in headers:
+        # stops and descriptors were fetched in bulk for the whole page
+        assert 'desc' in h._cache
+        assert h['stop']['run_start'] == h['start']['uid']
+        assert h.descriptors == db[h['start']['uid']].descriptors
+
+    assert len(list(db(data_key='det'))) == 5
+    assert len(list(db(data_key='not_a_key'))) == 0
+
+
 @py3
 def test_results_multiple_iters(db, RE):
     RE.subscribe(db.insert)
@@ -803,14 +1221,30 @@ def test_prepare_hook_default(db, RE):
     RE.subscribe(db.insert)
     uid, = RE(count([det]))
 
-    # check default -- returning a subclass of doct.Document that warns
-    # when you use getattr for getitem
-    assert db.prepare_hook == wrap_in_deprecated_doct
+    # check default -- returning a read-only dict that warns when you use
+    # getattr for getitem
+    assert db.prepare_hook == wrap_in_read_only_doc
 
     h = db[uid]
     for doc in _get_docs(h):
-        assert isinstance(doc, DeprecatedDoct)
-        assert isinstance(doc, doct.Document)
+        assert isinstance(doc, ReadOnlyDoc)
+        assert isinstance(doc, dict)
+
+    # descriptors are wrapped once per Header
+    assert h.descriptors[0] is h.descriptors[0]
+
+
+@py3
+def test_prepare_hook_deprecated_doct(db, RE):
+    db.prepare_hook = wrap_in_deprecated_doct
+
+    RE.subscribe(db.insert)
+    uid, = RE(count([det]))
+
+    for h in (db[uid], list(db())[0]):
+        for doc in _get_docs(h):
+            assert isinstance(doc, DeprecatedDoct)
+            assert isinstance(doc, doct.Document)
 
 
 @py3
@@ -857,6 +1291,36 @@ def test_prepare_hook_raw(db, RE):
             assert isinstance(doc, dict)
 
 
+def test_read_only_doc():
+    ev = ReadOnlyDoc('Event', {'data': {'det': 1.0}, 'seq_num': 1})
+
+    assert dict(ev) == {'data': {'det': 1.0}, 'seq_num': 1}
+    assert list(ev) == list(ev.keys())
+    assert ev.to_name_dict_pair() == ('Event', dict(ev))
+    assert pickle.loads(pickle.dumps(ev)) == ev
+    assert pickle.loads(pickle.dumps(ev))._name == 'Event'
+    assert copy.deepcopy(ev)._name == 'Event'
+
+    with pytest.warns(UserWarning):
+        assert ev.data == {'det': 1.0}
+
+    with pytest.raises(AttributeError):
+        ev.not_a_key
+
+    for mutate in (lambda: ev.__setitem__('seq_num', 2),
+                   lambda: ev.__delitem__('seq_num'),
+                   lambda: ev.update({}),
+                   lambda: ev.pop('seq_num'),
+                   lambda: setattr(ev, 'seq_num', 2)):
+        with pytest.raises(doct.DocumentIsReadOnly):
+            mutate()
+
+    # copy() gives a plain, mutable dict
+    d = ev.copy()
+    d['seq_num'] = 2
+    assert ev['seq_num'] == 1
+
+
 def test_deprecated_doct():
     ev = DeprecatedDoct('stuff', {
         'data': {'det': 1.0},
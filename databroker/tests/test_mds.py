@@ -306,6 +306,53 @@ def test_bulk_insert(mds_all):
         assert ret['filled'] == {'Z': False}
 
 
+def test_bulk_insert_fields(mds_all):
+    mdsc = mds_all
+    num = 10
+    rs, e_desc, data_keys = setup_syn(mdsc)
+    all_data = syn_data(data_keys, num)
+
+    mdsc.bulk_insert_events(e_desc, all_data, validate=False)
+    mdsc.insert_run_stop(rs, ttime.time(), uid=str(uuid.uuid4()))
+
+    ev_gen = mdsc.get_events_generator(e_desc, fields=['A', 'Z'])
+    for ret, expt in zip(ev_gen, all_data):
+        for k in ['time', 'uid', 'seq_num']:
+            assert ret[k] == expt[k]
+        assert ret['data'] == {k: expt['data'][k] for k in 'AZ'}
+        assert ret['timestamps'] == {k: expt['timestamps'][k] for k in 'AZ'}
+        assert ret['filled'] == {'Z': False}
+
+    ev_gen = mdsc.get_events_generator(e_desc, fields=[])
+    assert [ev['data'] for ev in ev_gen] == [{}] * num
+
+
+def test_events_ranges(mds_all):
+    mdsc = mds_all
+    num = 20
+    rs, e_desc, data_keys = setup_syn(mdsc)
+    all_data = list(syn_data(data_keys, num))
+
+    mdsc.bulk_insert_events(e_desc, all_data, validate=False)
+    mdsc.insert_run_stop(rs, ttime.time(), uid=str(uuid.uuid4()))
+
+    def seq_nums(**kwargs):
+        return [ev['seq_num']
+                for ev in mdsc.get_events_generator(e_desc, **kwargs)]
+
+    assert seq_nums(seq_num=(5, 8)) == [5, 6, 7]
+    assert seq_nums(seq_num=(None, 3)) == [0, 1, 2]
+    assert seq_nums(seq_num=(17, None)) == [17, 18, 19]
+    t0, t1 = all_data[4]['time'], all_data[9]['time']
+    assert seq_nums(time=(t0, t1)) == [4, 5, 6, 7, 8]
+    assert seq_nums(time=(t0, t1), seq_num=(6, None)) == [6, 7, 8]
+    assert seq_nums(seq_num=(100, 200)) == []
+
+    ret = mdsc.get_events_columns(e_desc, fields=['A'], seq_num=(5, 8))
+    assert list(ret['seq_num']) == [5, 6, 7]
+    assert list(ret['data']['A']) == [5., 6., 7.]
+
+
 def test_iterative_insert(mds_all):
     mdsc = mds_all
     num = 50
@@ -372,6 +419,74 @@ def test_bulk_table(mds_all):
         assert all(s == v for s, v in zip(seq_nums, vals))
 
 
+def test_bulk_columns(mds_all):
+    mdsc = mds_all
+    num = 50
+    rs, e_desc, data_keys = setup_syn(mdsc)
+    all_data = list(syn_data(data_keys, num))
+
+    mdsc.bulk_insert_events(e_desc, all_data, validate=False)
+    mdsc.insert_run_stop(rs, ttime.time(), uid=str(uuid.uuid4()))
+    ret = mdsc.get_events_columns(e_desc)
+    assert set(ret['data']) == set(data_keys)
+    assert set(ret['timestamps']) == set(data_keys)
+    for k in ('seq_num', 'time', 'uid'):
+        assert isinstance(ret[k], np.ndarray)
+        assert list(ret[k]) == [ev[k] for ev in all_data]
+    for k, vals in ret['data'].items():
+        assert isinstance(vals, np.ndarray)
+        assert list(vals) == [ev['data'][k] for ev in all_data]
+
+    ret = mdsc.get_events_columns(e_desc, fields=['A', 'B', 'not-a-key'])
+    assert set(ret['data']) == {'A', 'B'}
+    assert len(ret['data']['A']) == num
+
+
+def test_event_pages(mds_all):
+    mdsc = mds_all
+    num = 50
+    rs, e_desc, data_keys = setup_syn(mdsc)
+    all_data = list(syn_data(data_keys, num))
+    # store some events out of time order
+    all_data[10:20] = all_data[10:20][::-1]
+
+    mdsc.bulk_insert_events(e_desc, all_data, validate=False)
+    mdsc.insert_run_stop(rs, ttime.time(), uid=str(uuid.uuid4()))
+    expected = mdsc.get_events_columns(e_desc, fields=['A', 'B'])
+
+    pages = list(mdsc.get_event_pages(e_desc, fields=['A', 'B'],
+                                      page_size=7))
+    assert [len(p['seq_num']) for p in pages] == [7] * 7 + [1]
+    for k in ('seq_num', 'time', 'uid'):
+        assert list(np.concatenate([p[k] for p in pages])) == list(expected[k])
+    for field in ('data', 'timestamps'):
+        for k in ('A', 'B'):
+            joined = np.concatenate([p[field][k] for p in pages])
+            assert list(joined) == list(expected[field][k])
+
+    pages = list(mdsc.get_event_pages(e_desc, page_size=100,
+                                      seq_num=(5, 25)))
+    assert len(pages) == 1
+    assert set(pages[0]['data']) == set(data_keys)
+    assert sorted(pages[0]['seq_num']) == list(range(5, 25))
+
+
+def test_run_starts_with_data_key(mds_all):
+    mdsc = mds_all
+    rs, e_desc, data_keys = setup_syn(mdsc)
+    other = mdsc.insert_run_start(time=ttime.time(), scan_id=2,
+                                  beamline_id='testing',
+                                  uid=str(uuid.uuid4()))
+    mdsc.insert_descriptor(data_keys={'unique-key': data_keys['A']},
+                           time=ttime.time(), run_start=other,
+                           uid=str(uuid.uuid4()))
+
+    assert rs in mdsc.run_starts_with_data_key('A')
+    assert other not in mdsc.run_starts_with_data_key('A')
+    assert list(mdsc.run_starts_with_data_key('unique-key')) == [other]
+    assert list(mdsc.run_starts_with_data_key('not-a-key')) == []
+
+
 def test_cache_clear_lookups(mds_all):
     mdsc = mds_all
     run_start_uid, e_desc_uid, data_keys = setup_syn(mdsc)
@@ -527,6 +642,320 @@ def test_bad_event_desc(mds_all):
                                run_start=rs, uid=str(uuid.uuid4()))
 
 
+def test_json_collection_indexes(tmpdir):
+    from mongoquery import Query
+    from databroker.headersource.mongoquery import JSONCollection
+    from databroker.headersource.core import ASCENDING, DESCENDING
+
+    col = JSONCollection(str(tmpdir.join('docs.json')))
+    docs = [{'uid': str(uuid.uuid4()), 'run_start': 'rs%d' % (i % 3),
+             'scan_id': i % 4, 'time': float((7 * i) % 10), 'plan': i % 2}
+            for i in range(10)]
+    docs.append({'uid': 'no-scan-id', 'time': 3.5, 'plan': 1})
+    col.insert(docs[:5])
+    for doc in docs[5:]:
+        col.insert_one(doc)
+
+    queries = [{}, {'uid': docs[3]['uid']}, {'scan_id': 2},
+               {'scan_id': {'$in': [1, 3]}, 'plan': 1},
+               {'run_start': 'rs1', 'scan_id': 0},
+               {'time': {'$gte': 2, '$lt': 6}},
+               {'time': {'$gt': 2, '$lte': 6}, 'run_start': 'rs2'},
+               {'time': 3.5}, {'scan_id': None},
+               {'scan_id': {'$gt': 1}}, {'plan': {'$ne': 1}},
+               # as sent by searches
+               {'$and': [{'scan_id': {'$in': [1, 3]}}, {'plan': 1}, {}]},
+               {'$and': [{'time': {'$gte': 2}}, {'uid': docs[7]['uid']}],
+                'run_start': 'rs1'},
+               {'$and': [{'run_start': 'rs0'}, {'run_start': 'rs1'}]}]
+    for query in queries:
+        expected = [doc for doc in docs if Query(query).match(doc)]
+        assert list(col.find(query)) == expected
+        for order in (ASCENDING, DESCENDING):
+            result = list(col.find(query, sort=[('time', order)]))
+            assert result == sorted(expected, key=lambda doc: doc['time'],
+                                    reverse=(order == DESCENDING))
+        assert col.find_one(query) == (expected[0] if expected else None)
+
+    # clauses of '$and' are answered from the indexes too
+    positions, residual = col._plan(
+        {'$and': [{'uid': {'$in': [docs[1]['uid'], docs[2]['uid']]}},
+                  {'plan': 1}]})
+    assert positions == {1, 2}
+    assert residual == {'$and': [{'plan': 1}]}
+    # the shape of a data_key search from HeaderSourceShim
+    positions, residual = col._plan(
+        {'$and': [{}, {}, {'uid': {'$in': [docs[3]['uid']]}}]})
+    assert positions == {3}
+    assert not residual
+
+    # a reloaded collection rebuilds its indexes
+    col = JSONCollection(col._fp)
+    assert list(col.find({'scan_id': 3})) == [doc for doc in docs
+                                              if doc.get('scan_id') == 3]
+
+
+def test_json_collection_append_only(tmpdir):
+    import json
+    from databroker.headersource.mongoquery import JSONCollection
+
+    fp = str(tmpdir.join('docs.json'))
+    docs = [{'uid': str(uuid.uuid4()), 'time': float(i)} for i in range(6)]
+    # files written by older versions hold one JSON array
+    with open(fp, 'w') as f:
+        json.dump(docs[:2], f)
+    col = JSONCollection(fp)
+    other = JSONCollection(fp)
+    assert list(col.find({})) == docs[:2]
+
+    # the first write converts the file to one line per document
+    col.insert_one(docs[2])
+    with open(fp) as f:
+        assert [json.loads(line) for line in f] == docs[:3]
+    col.insert(docs[3:5])
+    with open(fp) as f:
+        assert len(f.readlines()) == 5
+
+    # other readers pick up only the new lines
+    other.refresh()
+    assert list(other.find({})) == docs[:5]
+    # a partly written line is left for later
+    with open(fp, 'a') as f:
+        f.write(json.dumps(docs[5])[:10])
+    other.refresh()
+    assert list(other.find({})) == docs[:5]
+    with open(fp, 'a') as f:
+        f.write(json.dumps(docs[5])[10:] + '\n')
+    other.refresh()
+    assert list(other.find({'uid': docs[5]['uid']})) == [docs[5]]
+
+    # compaction replaces the file, and other readers reload it
+    with open(fp, 'a') as f:
+        f.write('{"partial')
+    col.compact()
+    with open(fp) as f:
+        assert [json.loads(line) for line in f] == docs
+    other.refresh()
+    assert list(other.find({})) == docs
+    with pytest.raises(RuntimeError):
+        other.insert_one(docs[0], fk='uid')
+
+    # a line left partly written by a writer that crashed is dropped
+    # before the next document is appended
+    with open(fp, 'a') as f:
+        f.write('{"partial')
+    doc = {'uid': str(uuid.uuid4()), 'time': 6.0}
+    col.insert_one(doc)
+    other.refresh()
+    assert list(other.find({})) == docs + [doc]
+    assert not [fn for fn in os.listdir(str(tmpdir)) if fn.endswith('.tmp')]
+
+
+def test_sqlite_connection_pool(tmpdir):
+    from databroker.headersource.sqlite import MDS, EventCollection
+
+    config = {'directory': str(tmpdir), 'timezone': 'US/Eastern',
+              'version': 1, 'max_connections': 2}
+    mds = MDS(config)
+    runs = []
+    for _ in range(4):
+        rs, e_desc, data_keys = setup_syn(mds)
+        mds.bulk_insert_events(e_desc, syn_data(data_keys, 3))
+        runs.append(e_desc)
+    assert len(mds._event_col._pool) <= 2
+
+    def check(mds):
+        for e_desc in runs:
+            events = list(mds.get_events_generator(e_desc))
+            assert [ev['seq_num'] for ev in events] == [0, 1, 2]
+            assert len(mds._event_col._pool) <= 2
+
+    # Nothing is opened until it is needed.
+    mds = MDS(config)
+    assert len(mds._event_col._pool) == 0
+    check(mds)
+
+    # Directories written without the index are scanned once.
+    os.remove(str(tmpdir.join(EventCollection.INDEX)))
+    check(MDS(config))
+    assert os.path.exists(str(tmpdir.join(EventCollection.INDEX)))
+
+
+def test_sqlite_find_events(tmpdir, monkeypatch):
+    from databroker.headersource import sqlite
+    from databroker.headersource.core import ASCENDING, DESCENDING
+
+    mds = sqlite.MDS({'directory': str(tmpdir), 'timezone': 'US/Eastern',
+                      'version': 1})
+    rs, e_desc, data_keys = setup_syn(mds)
+    all_data = list(syn_data(data_keys, 7))
+    mds.bulk_insert_events(e_desc, all_data[::-1])
+
+    # rows are read a few at a time
+    monkeypatch.setattr(sqlite, 'FETCH_SIZE', 3)
+    col = mds._event_col
+    query = {'descriptor': e_desc}
+    events = col.find(query)
+    assert isinstance(events, GeneratorType)
+    events = list(events)
+    assert [ev['uid'] for ev in events] == [d['uid'] for d in all_data]
+    assert events[2]['data'] == all_data[2]['data']
+    assert events[2]['timestamps'] == all_data[2]['timestamps']
+    for key in ('time', 'seq_num'):
+        for order in (ASCENDING, DESCENDING):
+            events = list(col.find(query, sort=[(key, order)]))
+            expected = sorted(all_data, key=lambda d: d[key],
+                              reverse=(order == DESCENDING))
+            assert [ev['uid'] for ev in events] == [d['uid']
+                                                    for d in expected]
+    with pytest.raises(NotImplementedError):
+        col.find(query, sort=[('uid', ASCENDING)])
+
+    with col._connection(e_desc) as conn:
+        indexes = conn.execute("SELECT name FROM sqlite_master "
+                               "WHERE type='index'").fetchall()
+    assert len(indexes) == 2
+
+
+def test_sqlite_typed_columns(tmpdir):
+    from databroker.headersource import sqlite
+
+    mds = sqlite.MDS({'directory': str(tmpdir), 'timezone': 'US/Eastern',
+                      'version': 1})
+    data_keys = {'x': {'source': 'x', 'dtype': 'number', 'shape': []},
+                 'n': {'source': 'n', 'dtype': 'integer', 'shape': []},
+                 's': {'source': 's', 'dtype': 'string', 'shape': []},
+                 'w': {'source': 'w', 'dtype': 'array', 'shape': [2, 3]},
+                 'img': {'source': 'img', 'dtype': 'array', 'shape': [5, 5],
+                         'external': 'FILESTORE:'}}
+    rs = mds.insert_run_start(time=ttime.time(), uid=str(uuid.uuid4()))
+    e_desc = mds.insert_descriptor(data_keys=data_keys, time=ttime.time(),
+                                   run_start=rs, uid=str(uuid.uuid4()))
+    events = []
+    for i in range(3):
+        # 1.0 * i is integral; it must still come back as a float
+        data = {'x': 1.0 * i, 'n': i, 's': 'label%d' % i,
+                'w': np.arange(6).reshape(2, 3) * i,
+                'img': str(uuid.uuid4())}
+        events.append({'data': data, 'timestamps': {k: ttime.time()
+                                                    for k in data},
+                       'seq_num': i + 1, 'time': ttime.time(),
+                       'uid': str(uuid.uuid4())})
+    mds.bulk_insert_events(e_desc, events[:2])
+    mds.insert_event(descriptor=e_desc, **events[2])
+
+    col = mds._event_col
+    with col._connection(e_desc) as conn:
+        table = 'desc_' + e_desc.replace('-', '_')
+        types = {row[1]: row[2] for row in
+                 conn.execute('PRAGMA table_info(%s)' % table)}
+    assert types['data_x'] == ''
+    assert types['data_n'] == 'INTEGER'
+    assert types['data_s'] == 'TEXT'
+    assert types['data_w'] == 'BLOB'
+    assert types['data_img'] == ''
+    assert types['timestamps_w'] == 'REAL'
+
+    for ev, expected in zip(mds.get_events_generator(e_desc), events):
+        w = ev['data']['w']
+        assert isinstance(w, np.ndarray)
+        assert w.shape == (2, 3)
+        assert w.dtype.kind == 'i'
+        assert np.array_equal(w, expected['data']['w'])
+        for k in ('x', 'n', 's', 'img'):
+            assert ev['data'][k] == expected['data'][k]
+        assert type(ev['data']['x']) is float
+
+    ret = mds.get_events_columns(e_desc, fields=['x', 'n'])
+    assert ret['data']['x'].dtype == np.float64
+    assert ret['data']['n'].dtype.kind == 'i'
+
+    ret = mds.get_events_columns(e_desc, fields=['w'])
+    assert np.array_equal(ret['data']['w'],
+                          [ev['data']['w'] for ev in events])
+
+    # decoding does not copy
+    blob = sqlite.encode_value(np.ones((4, 4)))
+    arr = sqlite.decode_value(blob)
+    assert arr.shape == (4, 4)
+    assert not arr.flags.owndata
+    # arrays that are not numeric are stored as JSON
+    assert sqlite.decode_value(sqlite.encode_value(['a', 'b'])) == ['a', 'b']
+    # other BLOBs are left alone
+    assert sqlite.decode_value(b'raw bytes') == b'raw bytes'
+
+    # Arrays are read back even when the descriptor does not say 'array'.
+    data_keys = {'w': {'source': 'w', 'dtype': 'number', 'shape': [3]},
+                 'v': {'source': 'v', 'dtype': 'integer', 'shape': [2]},
+                 'labels': {'source': 'l', 'dtype': 'number', 'shape': [2]}}
+    e_desc = mds.insert_descriptor(data_keys=data_keys, time=ttime.time(),
+                                   run_start=rs, uid=str(uuid.uuid4()))
+    data = {'w': np.array([1, 2, 3]), 'v': [0.5, 1.5], 'labels': ['a', 'b']}
+    mds.insert_event(descriptor=e_desc, time=ttime.time(), seq_num=1,
+                     uid=str(uuid.uuid4()), data=data,
+                     timestamps={k: ttime.time() for k in data})
+    ev, = mds.get_events_generator(e_desc)
+    ret = mds.get_events_columns(e_desc)
+    for k, v in data.items():
+        assert np.array_equal(ev['data'][k], v)
+        assert np.array_equal(ret['data'][k][0], v)
+
+
+def test_sqlite_batched_writes(tmpdir):
+    import sqlite3
+    from databroker.headersource import sqlite
+
+    mds = sqlite.MDS({'directory': str(tmpdir), 'timezone': 'US/Eastern',
+                      'version': 1, 'write_mode': 'batched',
+                      'flush_count': 5, 'flush_interval': 1000})
+    rs, e_desc, data_keys = setup_syn(mds)
+    fp = os.path.join(str(tmpdir), '{}.sqlite'.format(rs))
+    table = 'desc_' + e_desc.replace('-', '_')
+
+    def committed():
+        # what another process would see
+        conn = sqlite3.connect(fp)
+        try:
+            cur = conn.execute('SELECT COUNT(*) FROM %s' % table)
+            return cur.fetchone()[0]
+        finally:
+            conn.close()
+
+    events = list(syn_data(data_keys, 8))
+    for ev in events[:4]:
+        mds.insert_event(descriptor=e_desc, **ev)
+    assert committed() == 0
+    # but the writer reads its own Events
+    assert len(list(mds.get_events_generator(e_desc))) == 4
+    # flushed by count
+    mds.insert_event(descriptor=e_desc, **events[4])
+    assert committed() == 5
+    mds.insert_event(descriptor=e_desc, **events[5])
+    mds.flush()
+    assert committed() == 6
+    # flushed by the RunStop
+    mds.bulk_insert_events(e_desc, events[6:])
+    assert committed() == 6
+    mds.insert_run_stop(rs, time=ttime.time(), uid=str(uuid.uuid4()))
+    assert committed() == 8
+
+    # a failed bulk insert leaves none of its Events behind
+    mds.insert_event(descriptor=e_desc, **events[0])
+    bad = dict(events[1], data=dict(events[1]['data']))
+    bad['data'][next(iter(data_keys))] = object()
+    with pytest.raises(sqlite3.Error):
+        mds.bulk_insert_events(e_desc, [events[2], bad])
+    mds.flush()
+    assert committed() == 9
+
+    with mds._event_col._connection(e_desc) as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    with pytest.raises(ValueError):
+        sqlite.MDS({'directory': str(tmpdir), 'timezone': 'US/Eastern',
+                    'version': 1, 'write_mode': 'fast'})._event_col
+
+
 def test_reload(mds_portable):
     if 'hdf5' in type(mds_portable).__module__:
         pytest.xfail('know bug in hdf5 backend')